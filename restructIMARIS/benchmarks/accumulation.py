@@ -0,0 +1,52 @@
+""" Compares growing the samples dataframe with pd.concat inside the series loop against the
+FrameAccumulator, for an increasing number of series.
+
+From the folder containing restructIMARIS run:
+    python -m restructIMARIS.benchmarks.accumulation [cells_per_serie]
+"""
+import sys
+import time
+import numpy as np
+import pandas as pd
+from ..common.accumulator import FrameAccumulator
+
+SERIES_COUNTS = [50, 100, 200, 400, 800]
+FEATURES = ['Vesicles', 'Intensity_Mean', 'Intensity_Sum', 'Sphericity', 'Volume']
+
+
+def MakeSerie(nr_cells, rng):
+    serie = pd.DataFrame({feature: rng.random(nr_cells) for feature in FEATURES})
+    serie.index.name = "Cell ID"
+    return serie
+
+
+def ConcatInLoop(series):
+    sample_data = pd.DataFrame()
+    for serie in series:
+        sample_col_df = pd.DataFrame({'Sample': ['SampleA']*serie.shape[0]}, index=serie.index.values)
+        sample_data = pd.concat([sample_data, pd.concat([sample_col_df, serie], axis=1)])
+    return sample_data
+
+
+def Accumulate(series):
+    sample_data = FrameAccumulator(leading=['Sample'])
+    for serie in series:
+        sample_data.Add(serie, Sample='SampleA')
+    return sample_data.Build()
+
+
+def TimeIt(func, series):
+    start = time.perf_counter()
+    func(series)
+    return time.perf_counter() - start
+
+
+if __name__ == "__main__":
+    nr_cells = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    rng = np.random.default_rng(0)
+    print(f"{'series':>8} {'concat in loop [s]':>20} {'accumulator [s]':>16} {'accumulator [ms/serie]':>23}")
+    for nr_series in SERIES_COUNTS:
+        series = [MakeSerie(nr_cells, rng) for _ in range(nr_series)]
+        loop_time = TimeIt(ConcatInLoop, series)
+        accumulator_time = TimeIt(Accumulate, series)
+        print(f"{nr_series:>8} {loop_time:>20.3f} {accumulator_time:>16.3f} {1000*accumulator_time/nr_series:>23.3f}")
@@ -0,0 +1,162 @@
+""" Times every stage of the cells and dendrite pipelines on synthetic experiments (see benchmarks.synthetic)
+and compares them with the stored baselines (benchmarks/baselines.json).
+
+From the folder containing restructIMARIS run:
+    python -m restructIMARIS.benchmarks.pipeline [--scales small medium] [--repeat 3] [--save-baseline]
+
+Exits with status 1 if a stage is slower than its baseline by more than the tolerance.
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import platform
+import tempfile
+import contextlib
+from .synthetic import SyntheticExperiment, PACKAGE_DIR
+
+SCALES = { # samples, series per sample, cells (or dendrites) per series
+    'small': (3, 4, 100),
+    'medium': (4, 8, 1000),
+    'large': (6, 10, 5000),
+}
+BASELINES_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baselines.json')
+DATA_FORMAT = 1 # bump when the generated data changes
+
+
+def PrepareData(scale, data_dir):
+    """PrepareData generates the experiment of a scale, unless it was already generated with the same parameters
+    """
+    root = os.path.join(data_dir, scale)
+    marker = os.path.join(root, 'parameters.json')
+    parameters = {'format': DATA_FORMAT, 'scale': list(SCALES[scale])}
+    if os.path.isfile(marker):
+        with open(marker) as marker_file:
+            if json.load(marker_file) == parameters:
+                return root
+    shutil.rmtree(root, ignore_errors=True)
+    print(f"Generating the {scale} experiment {SCALES[scale]} under {root}")
+    SyntheticExperiment().Write(root, *SCALES[scale])
+    with open(marker, 'w') as marker_file:
+        json.dump(parameters, marker_file)
+    return root
+
+
+def CleanOutputs(directory):
+    """CleanOutputs removes the files written by a previous run (the sample folders are kept)
+    """
+    for entry in os.scandir(directory):
+        if entry.is_file():
+            os.remove(entry.path)
+        elif entry.name.endswith('.parquet'):
+            shutil.rmtree(entry.path)
+
+
+def RunStages(root):
+    """RunStages runs both pipelines once, serially and without cache
+
+    Returns:
+        [dict]: stage name -> seconds
+    """
+    from ..cells.restruct_data import IMARISDataProcessor
+    from ..dendrite.make_summary import IMARISDendriteSumary
+    from ..common.plotting import UseHeadlessBackend
+    UseHeadlessBackend()
+    timings = {}
+
+    @contextlib.contextmanager
+    def Stage(name):
+        start = time.perf_counter()
+        yield
+        timings[name] = time.perf_counter() - start
+
+    cells_dir = os.path.join(root, 'cells') + os.sep
+    dendrite_dir = os.path.join(root, 'dendrite')
+    CleanOutputs(cells_dir)
+    CleanOutputs(dendrite_dir)
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        processor = IMARISDataProcessor(cells_dir, dir_config=PACKAGE_DIR)
+        with Stage('cells.ExtractSamplesData'):
+            cells_df, spots_df = processor.ExtractSamplesData(save_to_excel=True, save_to_pickle=True)
+        with Stage('cells.ExtractMetricsForSamples'):
+            processor.ExtractMetricsForSamples(cells_df, spots_df, save_to_excel=True)
+        with Stage('cells.GenerateBoxPlot'):
+            processor.GenerateBoxPlot(cells_df, 'Volume')
+
+        processor = IMARISDendriteSumary(dendrite_dir, dir_config=PACKAGE_DIR)
+        with Stage('dendrite.ProcessData'):
+            dendrite_df = processor.ProcessData(save_to_pickle=True)
+        with Stage('dendrite.SaveToExcel'):
+            processor.SaveToExcel(dendrite_df)
+        with Stage('dendrite.GenerateBoxPlot'):
+            processor.GenerateBoxPlot(dendrite_df, list(processor.sheets.keys())[0])
+    return timings
+
+
+def Measure(root, repeat):
+    """Measure keeps the best time of every stage over `repeat` runs
+    """
+    best = {}
+    for _ in range(repeat):
+        for stage, seconds in RunStages(root).items():
+            best[stage] = min(seconds, best.get(stage, seconds))
+    return best
+
+
+def LoadBaselines():
+    if not os.path.isfile(BASELINES_FILE):
+        return {}
+    with open(BASELINES_FILE) as json_file:
+        return json.load(json_file)
+
+
+def Machine():
+    return {'platform': platform.platform(terse=True), 'python': platform.python_version(), 'cpus': os.cpu_count()}
+
+
+def Compare(scale, timings, baseline, tolerance, margin):
+    """Compare prints the timings next to the baseline and returns the stages which regressed
+    """
+    regressions = []
+    print(f"--- {scale} {SCALES[scale]}")
+    print(f"{'stage':<32} {'seconds':>9} {'baseline':>9} {'ratio':>7}")
+    for stage, seconds in timings.items():
+        reference = baseline.get(stage)
+        if reference is None:
+            print(f"{stage:<32} {seconds:9.3f} {'-':>9} {'-':>7}")
+            continue
+        regressed = seconds > reference*tolerance + margin
+        if regressed:
+            regressions.append(stage)
+        print(f"{stage:<32} {seconds:9.3f} {reference:9.3f} {seconds/reference:7.2f}" + ("  REGRESSION" if regressed else ""))
+    return regressions
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Time the pipeline stages on synthetic experiments.")
+    parser.add_argument('--scales', nargs='+', choices=SCALES.keys(), default=['small', 'medium'])
+    parser.add_argument('--repeat', type=int, default=3, help="runs per scale, the best time is kept (default: %(default)s)")
+    parser.add_argument('--data-dir', default=os.path.join(tempfile.gettempdir(), 'restruct_benchmarks'),
+                        help="where the synthetic experiments are generated (default: %(default)s)")
+    parser.add_argument('--tolerance', type=float, default=1.5, help="allowed slowdown ratio (default: %(default)s)")
+    parser.add_argument('--margin', type=float, default=0.05, help="allowed slowdown in seconds (default: %(default)s)")
+    parser.add_argument('--save-baseline', action='store_true', help="store the timings as the new baselines")
+    args = parser.parse_args()
+
+    baselines = LoadBaselines()
+    if baselines.get('machine') not in (None, Machine()):
+        print(f"Baselines were measured on {baselines['machine']}, timings may not be comparable.")
+    regressions = []
+    for scale in args.scales:
+        timings = Measure(PrepareData(scale, args.data_dir), args.repeat)
+        regressions += Compare(scale, timings, baselines.get('scales', {}).get(scale, {}), args.tolerance, args.margin)
+        if args.save_baseline:
+            baselines.setdefault('scales', {})[scale] = {stage: round(seconds, 4) for stage, seconds in timings.items()}
+    if args.save_baseline:
+        baselines['machine'] = Machine()
+        with open(BASELINES_FILE, 'w') as json_file:
+            json.dump(baselines, json_file, indent=2)
+        print(f"Baselines saved to {BASELINES_FILE}")
+    sys.exit(1 if regressions and not args.save_baseline else 0)
@@ -0,0 +1,45 @@
+""" Checks that the command line interface and the processors start without loading the plotting and
+GUI libraries, and reports how long the imports take (each measure in a fresh interpreter).
+
+From the folder containing restructIMARIS run:
+    python -m restructIMARIS.benchmarks.startup [max_seconds]
+
+Exits with status 1 if a lazy library is loaded at import time or an import takes longer than max_seconds.
+"""
+import os
+import sys
+import json
+import subprocess
+
+LAZY_MODULES = ['matplotlib', 'seaborn', 'easygui', 'tkinter']
+SUBPACKAGES = ['common', 'cells', 'dendrite', 'benchmarks'] # only importable through restructIMARIS
+IMPORTS = ['restructIMARIS.cli', 'restructIMARIS.cells.restruct_data', 'restructIMARIS.dendrite.make_summary']
+
+PROBE = """
+import sys, time, json
+start = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - start
+print(json.dumps({{'seconds': elapsed, 'loaded': [name for name in {lazy} if name in sys.modules],
+                  'top_level': [name for name in {subpackages} if name in sys.modules]}}))
+"""
+
+
+def MeasureImport(module):
+    parent_dir = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    output = subprocess.run([sys.executable, '-c', PROBE.format(module=module, lazy=LAZY_MODULES, subpackages=SUBPACKAGES)],
+                            cwd=parent_dir, capture_output=True, text=True, check=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+if __name__ == "__main__":
+    max_seconds = float(sys.argv[1]) if len(sys.argv) > 1 else None
+    failed = False
+    print(f"{'import':<40} {'seconds':>8}  lazy libraries loaded")
+    for module in IMPORTS:
+        result = MeasureImport(module)
+        too_slow = max_seconds is not None and result['seconds'] > max_seconds
+        failed = failed or too_slow or bool(result['loaded'])
+        print(f"{module:<40} {result['seconds']:8.3f}  {', '.join(result['loaded']) or '-'}"
+              + ("  (too slow)" if too_slow else ""))
+    sys.exit(1 if failed else 0)
@@ -0,0 +1,206 @@
+""" Generates synthetic IMARIS export trees with the sheet layouts expected by the configuration files:
+
+    ROOT/cells/[sample]/SeriesNN_cells.xls, SeriesNN_spots.xls     (see config_cells.json)
+    ROOT/dendrite/[sample]/SeriesNN.xls                              (see config_dendrite.json)
+
+or, with --ims, the native IMARIS files (HDF5, requires h5py) holding the same statistics:
+
+    ROOT/cells/[sample]/SeriesNN.ims, ROOT/dendrite/[sample]/SeriesNN.ims
+
+or, with --csv, CSV exports: a folder of CSV files (one per sheet) in place of every workbook.
+
+From the folder containing restructIMARIS run:
+    python -m restructIMARIS.benchmarks.synthetic ROOT [samples] [series] [rows] [--ims|--csv]
+"""
+import os
+import sys
+import csv
+import json
+import numpy as np
+from ..common.ims import ImsReader
+
+PACKAGE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MAX_ROWS = 65000 # .xls sheets hold at most 65536 rows
+# tables of the .ims statistics (see common.ims.ImsReader)
+IMS_TYPE = [('ID', '<i8'), ('ID_Category', '<i8'), ('ID_FactorList', '<i8'), ('Name', 'S256'), ('Unit', 'S256')]
+IMS_VALUE = [('ID_Time', '<i8'), ('ID_Object', '<i8'), ('ID_StatisticsType', '<i8'), ('Value', '<f4')]
+IMS_FACTOR = [('ID_List', '<i8'), ('Name', 'S256'), ('Level', 'S256')]
+IMS_CATEGORY = [('ID', '<i8'), ('CategoryName', 'S256'), ('Name', 'S256')]
+
+
+def ReadConfig(filename, config_dir = PACKAGE_DIR):
+    with open(os.path.join(config_dir, filename)) as json_file:
+        return json.load(json_file)
+
+
+class SyntheticExperiment:
+    """ Writes random but well-formed series workbooks: every sheet listed in the configuration, with a
+    title row, a header row and one row per cell (or dendrite). Sample folders are named after the
+    sample labels of the configuration, so the labels are applied as in a real run.
+    With file_format 'ims', the same statistics are written to .ims files instead and with 'csv', each
+    workbook is written as a folder of CSV files, one per sheet, as the CSV export of IMARIS.
+    """
+    FORMATS = ('xls', 'ims', 'csv')
+
+    def __init__(self, cells_config = None, dendrite_config = None, seed = 0, file_format = 'xls'):
+        if file_format not in self.FORMATS:
+            raise ValueError(f"Unknown format {file_format}, expected one of {self.FORMATS}")
+        import xlwt # only needed to generate data
+        self.xlwt = xlwt
+        self.file_format = file_format
+        self.cells_config = cells_config or ReadConfig('config_cells.json')
+        self.dendrite_config = dendrite_config or ReadConfig('config_dendrite.json')
+        self.rng = np.random.default_rng(seed)
+
+    @staticmethod
+    def SampleNames(labels, count, required = ''):
+        names = [name for name in labels if required in name][:count]
+        names += [f'Sample{index:02d}' for index in range(len(names), count)]
+        return names
+
+    def SaveSheets(self, filename, sheets):
+        """SaveSheets writes the sheets [(sheet name, header, columns)] to filename.xls or, in csv format, to
+            filename/[name]_[sheet].csv files
+        """
+        if self.file_format == 'csv':
+            os.makedirs(filename, exist_ok=True)
+            for sheet_name, header, columns in sheets:
+                csv_name = f"{os.path.basename(filename)}_{sheet_name.replace(' ', '_')}.csv"
+                with open(os.path.join(filename, csv_name), 'w', newline='') as csv_file:
+                    csv_file.write(' \n====================\n') # as IMARIS, before the header
+                    writer = csv.writer(csv_file)
+                    writer.writerow(header)
+                    writer.writerows(zip(*columns))
+            return
+        workbook = self.xlwt.Workbook()
+        for sheet_name, header, columns in sheets:
+            self.WriteSheet(workbook, sheet_name, header, columns)
+        workbook.save(filename+'.xls')
+
+    def WriteSheet(self, workbook, sheet_name, header, columns):
+        sheet = workbook.add_sheet(sheet_name[:31]) # longest sheet name allowed in .xls
+        sheet.write(0, 0, sheet_name)
+        for position, (name, values) in enumerate(zip(header, columns)):
+            sheet.write(1, position, name)
+            for row, value in enumerate(values, start=2):
+                sheet.write(row, position, value)
+
+    def WriteCells(self, root, samples, series, cells):
+        """WriteCells writes samples x series cells and spots workbooks of `cells` cells each, or a single
+            .ims file per serie with the Cells and Points (spots) objects in ims format
+
+        Returns:
+            [int]: number of files written
+        """
+        if cells > MAX_ROWS and self.file_format == 'xls':
+            raise ValueError(f"at most {MAX_ROWS} cells per series fit in an .xls sheet")
+        overall_sheet, total_name = self.cells_config['VesiclesOverallSheetColNames']
+        sheets = {} # the same sheet may be used by several features
+        for sheet_name, column_name in self.cells_config['CellSheetColNames'].values():
+            sheets[sheet_name] = column_name
+        written = 0
+        for sample in self.SampleNames(self.cells_config['SampleLabels'], samples):
+            os.makedirs(os.path.join(root, sample), exist_ok=True)
+            for serie in range(1, series+1):
+                ids = list(range(cells))
+                vesicles = self.rng.poisson(1.5, cells)
+                statistics = {} # sheet name -> (column name, values)
+                for sheet_name, column_name in sheets.items():
+                    values = vesicles.tolist() if sheet_name == self.cells_config['CellSheetColNames']['Vesicles'][0] \
+                        else self.rng.lognormal(3, 1, cells).tolist()
+                    statistics[sheet_name] = (column_name, values)
+                spots = int(self.rng.integers(0, max(1, cells//10)+1))
+                diameters = self.rng.random(spots).tolist()
+                filename = os.path.join(root, sample, f'Series{serie:02d}')
+                if self.file_format == 'ims':
+                    self.WriteIms(filename+'.ims', {'Cells0': ({total_name: int(vesicles.sum())}, statistics),
+                                                    'Points0': ({}, {'Diameter': ('Diameter', diameters)})})
+                    written += 1
+                    continue
+
+                self.SaveSheets(filename+'_cells', [(overall_sheet, ['Variable', 'Value', 'Unit'], [[total_name], [int(vesicles.sum())], ['']])]
+                                + [(sheet_name, [column_name, 'Unit', 'ID'], [values, ['']*cells, ids])
+                                   for sheet_name, (column_name, values) in statistics.items()])
+                self.SaveSheets(filename+'_spots', [('Diameter', ['Diameter', 'Unit', 'ID'],
+                                                     [diameters, ['um']*spots, list(range(spots))])])
+                written += 2
+        return written
+
+    def WriteDendrite(self, root, samples, series, dendrites):
+        """WriteDendrite writes samples x series dendrite workbooks of `dendrites` dendrites each
+
+        Returns:
+            [int]: number of files written
+        """
+        if dendrites > MAX_ROWS and self.file_format == 'xls':
+            raise ValueError(f"at most {MAX_ROWS} dendrites per series fit in an .xls sheet")
+        (overall_sheet, total_name), = self.dendrite_config['OverallSheet'].items()
+        written = 0
+        for sample in self.SampleNames(self.dendrite_config['SampleLabels'], samples, required='Sample'):
+            os.makedirs(os.path.join(root, sample), exist_ok=True)
+            for serie in range(1, series+1):
+                filaments = int(self.rng.integers(1, 20))
+                statistics = {sheet_name: (sheet_name, self.rng.lognormal(2, 0.5, dendrites).tolist())
+                              for sheet_name in self.dendrite_config['Sheets']}
+                filename = os.path.join(root, sample, f'Series{serie:02d}')
+                if self.file_format == 'ims':
+                    self.WriteIms(filename+'.ims', {'Filaments0': ({total_name: filaments}, statistics)})
+                else:
+                    self.SaveSheets(filename, [(overall_sheet, ['Variable', 'Value', 'Unit'], [[total_name], [filaments], ['']])]
+                                    + [(sheet_name, [sheet_name, 'Unit', 'ID'], [values, ['um']*dendrites, list(range(dendrites))])
+                                       for sheet_name, (_, values) in statistics.items()])
+                written += 1
+        return written
+
+    @staticmethod
+    def Factors(sheet_name, statistic_name):
+        """Factors splits the end of an export sheet name into the factors of its statistic (see ImsReader.SheetName):
+            "Cell Intensity Mean Ch=2 Img=1" -> [('Channel', '2'), ('Image', '1')]
+        """
+        if not sheet_name.startswith(statistic_name):
+            return []
+        names = {prefix: factor for factor, prefix in ImsReader.FACTOR_PREFIXES.items()}
+        factors = []
+        for level in sheet_name[len(statistic_name):].split():
+            prefix = level[:level.index('=')+1] if '=' in level else ''
+            factors.append((names[prefix], level[len(prefix):]) if prefix in names else ('Type', level))
+        return factors
+
+    def WriteIms(self, filename, objects):
+        """WriteIms writes the statistics tables of an IMARIS .ims file (as read by common.ims.ImsReader)
+
+        Args:
+            objects (dict): object group (e.g. 'Cells0') -> (overall {variable: value}, {sheet name: (statistic name, values)})
+        """
+        import h5py # only needed to generate data
+        with h5py.File(filename, 'w') as ims:
+            content = ims.create_group('Scene8/Content')
+            for group_name, (overall, statistics) in objects.items():
+                types, factors, values = [], [], []
+                for type_id, (sheet_name, (statistic_name, statistic_values)) in enumerate(statistics.items()):
+                    types.append((type_id, 1, type_id, statistic_name, ''))
+                    factors += [(type_id, factor, level) for factor, level in self.Factors(sheet_name, statistic_name)]
+                    values.append(np.rec.fromarrays([np.zeros(len(statistic_values)), np.arange(len(statistic_values)),
+                                                     np.full(len(statistic_values), type_id), statistic_values], dtype=IMS_VALUE))
+                for type_id, (variable, value) in enumerate(overall.items(), start=len(statistics)):
+                    types.append((type_id, 0, -1, variable, ''))
+                    values.append(np.rec.fromarrays([[0], [-1], [type_id], [value]], dtype=IMS_VALUE))
+                group = content.create_group(group_name)
+                group.create_dataset('StatisticsType', data=np.array(types, dtype=IMS_TYPE))
+                group.create_dataset('Factor', data=np.array(factors, dtype=IMS_FACTOR))
+                group.create_dataset('Category', data=np.array([(0, 'Overall', 'Overall'), (1, group_name[:-1], group_name[:-1])],
+                                                              dtype=IMS_CATEGORY))
+                group.create_dataset('StatisticsValue', data=np.concatenate(values), chunks=True)
+
+    def Write(self, root, samples, series, rows):
+        return (self.WriteCells(os.path.join(root, 'cells'), samples, series, rows)
+                + self.WriteDendrite(os.path.join(root, 'dendrite'), samples, series, rows))
+
+
+if __name__ == "__main__":
+    file_format = 'ims' if '--ims' in sys.argv else 'csv' if '--csv' in sys.argv else 'xls'
+    arguments = [argument for argument in sys.argv[1:] if argument not in ('--ims', '--csv')]
+    root = arguments[0]
+    samples, series, rows = [int(value) for value in arguments[1:4]] + [3, 4, 200][len(arguments[1:4]):]
+    written = SyntheticExperiment(file_format=file_format).Write(root, samples, series, rows)
+    print(f"{written} files written under {root} ({samples} samples x {series} series x {rows} rows)")
@@ -1,9 +1,26 @@
 import pandas as pd
+import numpy as np
 import os
+import itertools
+import contextlib
 from datetime import date
-import seaborn as sns
-import matplotlib.pyplot as plt
 import json
+from ..common.parallel import SeriesPool
+from ..common.workbook import WorkbookPlan, OpenWorkbook
+from ..common.cache import SeriesCache
+from ..common.accumulator import FrameAccumulator
+from ..common.schema import FrameSchema
+from ..common.columnar import ColumnarStore
+from ..common.statistics import OnlineStatistics
+from ..common.state_store import StatisticsStore
+from ..common.plotting import BoxPlotRenderer, AggregateBoxPlot
+from ..common.tracing import Tracer
+from ..common.experiment_index import ExperimentIndex
+from ..common.output import OutputWriter
+from ..common.aggregation import MetricPlan
+from ..common.result_store import ResultStore
+from ..common.comparison import SampleComparison
+from ..common.prefetch import Prefetcher
 class IMARISDataProcessor:
     """ This class expects a folder generated by IMARIS with the following format
     (SELECTED FOLDER)>SampleX>
@@ -26,122 +43,242 @@ class IMARISDataProcessor:
     }
 
     SPOTS_OUT_COL_NAME = 'Nr. Spots'
+    SERIE_ROLES = ['cells', 'spots'] # files of every serie (see ExperimentIndex)
 
-    def __init__(self, directory, sample_labels = {}):
+    def __init__(self, directory, sample_labels = {}, parallel = False, workers = None, 
+                 cache_dir = None, cache_size = SeriesCache.DEFAULT_MAX_BYTES, dir_config = None, trace = False,
+                 output_formats = ('xlsx',), constant_memory = False, write_in_background = False, result_store = None,
+                 resamples = 0, prefetch_bytes = 0, approximate_resampling = False):
+        """
+        Args:
+            directory (str): folder containing one sub-folder per sample
+            parallel (bool, optional): parse the series files on a pool of worker processes. Defaults to False.
+            workers (int, optional): number of worker processes in parallel mode. Defaults to the number of cores.
+            cache_dir (str, optional): folder where the data extracted from each series file is cached, so that
+                reruns only parse new or modified files. Defaults to None (no cache).
+            cache_size (int, optional): maximum size of the cache in bytes. Defaults to 2GB.
+            dir_config (str, optional): folder containing config_cells.json. Defaults to None (current folder).
+            trace (bool, optional): record the time spent in each stage and counters (see common.tracing.Tracer);
+                call self.tracer.Report(filename) at the end of the run. Defaults to False.
+            output_formats (list, optional): formats of the per-sample files, any of 'xlsx', 'csv' and 'parquet'.
+                Defaults to ('xlsx',).
+            constant_memory (bool, optional): stream the per-sample xlsx files to disk row by row (requires
+                xlsxwriter). Defaults to False.
+            write_in_background (bool, optional): write the per-sample files on a background thread, while
+                the next sample is processed. Defaults to False.
+            result_store (str, optional): SQLite file where the cells and spots of every run are appended, to query
+                them across experiments (see common.result_store). Defaults to None (no store).
+            resamples (int, optional): number of bootstrap resamples and permutations of the "comparison" sheet of
+                summary.xlsx (see CompareSamples). Defaults to 0 (no comparison).
+            prefetch_bytes (int, optional): read the upcoming series files into memory, up to this many bytes, while
+                the current one is parsed, e.g. for exports on a network share (see common.prefetch); only when
+                the series are parsed in this process. Defaults to 0 (no prefetch).
+            approximate_resampling (bool, optional): resample the large samples by strata, a normal approximation
+                much faster than the exact resampling (see common.comparison). Defaults to False.
+        """
+        self.config_filename_path = os.path.join("." if dir_config is None else dir_config, "config_cells.json")
         self.directory = directory
+        self.pool = SeriesPool(workers if parallel else 1)
+        self.cache = None if cache_dir is None else SeriesCache(cache_dir, cache_size)
+        self.tracer = Tracer(trace)
+        self.writer = OutputWriter(output_formats, constant_memory, write_in_background, tracer=self.tracer) # see common.output
+        self.index = None # ExperimentIndex of the directory, built by IdentifySamples
+        self.results = None if result_store is None else ResultStore(result_store)
+        self.run_id = None # run of the result store, recorded by BeginRun
+        self.comparison = SampleComparison(resamples, approximate=approximate_resampling) if resamples else None
+        self.prefetch_bytes = prefetch_bytes
+        self.prefetcher = None # Prefetcher of the running extraction, see Prefetch
         self.ReadConfigFile()
+        self.schema = FrameSchema(counts=['Vesicles', self.SPOTS_OUT_COL_NAME])
+        # statistics of the "full statistics" sheet plus the totals of the "summary" sheet (see common.aggregation)
+        self.metric_plan = MetricPlan.FromConfig({feature: MetricPlan.DESCRIBE for feature in self.CELLS_SHEET_COLUMN})
+        self.metric_plan.Add('Vesicles', ['sum'])
+        self.metric_plan.AddRatio('%MBP', 'Vesicles', self.SPOTS_OUT_COL_NAME, 100)
+        self.spots_plan = MetricPlan().Add(self.SPOTS_OUT_COL_NAME, ['sum'])
 
     def ReadConfigFile(self):
-        config_filename = "config_cells.json"
+        config_filename = self.config_filename_path
         try:
 
             with open(config_filename) as json_data_file:
                 data=json.load(json_data_file)
+            self.config = data
             self.CELLS_SHEET_COLUMN = data['CellSheetColNames']
             self.sample_labels = data['SampleLabels']
             self.SPOTS_OUT_COL_NAME = data['SpotOutputName']
             self.VESICLES_OVERALL_SHEET = data['VesiclesOverallSheetColNames']
         except:
             raise Exception(f"Could not read config file {config_filename}.")
-        print(f"{config_filename} read successfully.")
-        
-        print(f"Cells sheet column names: {json.dumps(self.CELLS_SHEET_COLUMN, indent=4)}")
-        print(f"Sample labels: {json.dumps(self.sample_labels,indent=4)}")
-        print(f"Spot output column name: {json.dumps(self.SPOTS_OUT_COL_NAME,indent=4)}")
-        print(f"Vesicles overall sheet column names: {json.dumps(self.VESICLES_OVERALL_SHEET,indent=4)}")
+        print(f"{config_filename} read successfully: {len(self.CELLS_SHEET_COLUMN)} features, "
+              f"{len(self.sample_labels)} sample labels.")
         return
 
     
-    def ExtractSamplesData(self, save_to_excel = True, save_to_pickle = False):
+    def ExtractSamplesData(self, save_to_excel = True, save_to_pickle = False, save_to_columnar = False):
         """ExtractSamplesData returns dataframe containing the samples data
         
         Args:
-            save_to_excel (bool, optional): Per sample, save an excel sheet per sample containing the respective series data. Defaults to True.
+            save_to_excel (bool, optional): Per sample, save an excel sheet per sample containing the respective series data
+                (or the other output_formats). Defaults to True.
             save_to_pickle (bool, optional): Save dataframe containing all the samples data. Defaults to False.
+            save_to_columnar (bool, optional): Save dataframe containing all the samples data as a Parquet dataset
+                partitioned by sample (requires pyarrow). Defaults to False.
         
         Returns:
             pd.DataFrame: Samples data
         """
-        print("=====================================")
-        self.samples_name = self.IdentifySamples()
-        print("=====================================")
-        self.VerifySampleNames()
-        print("=====================================")
-        samples_dataframes = pd.DataFrame()
-        samples_spots = pd.DataFrame() 
-        # Iterating over each (sample) folder
-        for sample in self.samples_name:
+        with self.tracer.Span('identify'):
             print("=====================================")
-            print("Processing {}".format(sample))
-            
-            series = self.IdentifySeries(sample) # and getting all the series                        
-            sample_data = pd.DataFrame() # dataframe which will contain all the sample data
-            sample_spots = pd.DataFrame()
-            for serie in series:
-                print("Loading {} ...".format(serie))
-                # Handle spots data              
-                nr_spots = self.ExtractSerieSpotsData(sample, serie) # get the cells which we categorized as "spot"
-                serie_spots = pd.DataFrame({'Sample':[sample],self.SPOTS_OUT_COL_NAME:[nr_spots]}, index=[0])
-                sample_spots = pd.concat([sample_spots,serie_spots])
-
-                # Handle cells data
-                serie_data = self.ExtractSerieCellsData(sample, serie)
-                if serie_data.empty:
-                    print("No Vesicles or No Data|")
-                    continue
-                
-                sample_col_df  = pd.DataFrame(
-                    {'Sample':self.CreateColumnForSerie(value=sample,nr_cells=serie_data.shape[0])}, 
-                    index=serie_data.index.values)
-
-                full_serie_data  = pd.concat([
-                    sample_col_df,
-                    serie_data],
-                    axis=1)
-                        
-                    # concatenating series data to form the overall sample dataframe
-                sample_data = pd.concat([sample_data,full_serie_data])
-            
-            sample_data.reset_index() # remove cell id as index to avoid overriding when concatenating
-            sample_spots.reset_index()
-            samples_dataframes = pd.concat((samples_dataframes,sample_data))
-            samples_spots = pd.concat((samples_spots,sample_spots))
-            if save_to_excel:
-                with pd.ExcelWriter(self.directory+sample+'.xlsx') as writer:
-                    sample_data.to_excel(writer,sheet_name="cell_data", header=True) 
-                    sample_spots.to_excel(writer,sheet_name="spots_data", header=True) 
+            self.samples_name = self.IdentifySamples()
+            print("=====================================")
+            self.VerifySampleNames()
+            print("=====================================")
+            samples_series = [(sample, self.IdentifySeries(sample)) for sample in self.samples_name] # and getting all the series
+        self.BeginRun()
+        samples_dataframes = FrameAccumulator()
+        samples_spots = FrameAccumulator()
+        jobs = [(sample, serie) for sample, series in samples_series for serie in series]
+        with self.Prefetch(jobs):
+            # in the same order as jobs; lazily when writing in the background, so parsing overlaps with writing
+            pool_map = self.pool.IMap if self.writer.background else self.pool.Map
+            series_results = map(self.tracer.Absorb, pool_map(self.tracer.Collect(self.ExtractSerieData), jobs))
+            # Iterating over each (sample) folder
+            for sample, series in samples_series:
+                results = list(itertools.islice(series_results, len(series)))
+                self.StoreSample(sample, zip(series, results))
+                sample_data, sample_spots = self.CollectSample(sample, results)
+                if save_to_excel:
+                    self.writer.Write(self.directory+sample, {"cell_data": sample_data, "spots_data": sample_spots})
+                # only the per-sample outputs keep the float64 values read
+                samples_dataframes.Add(self.schema.Downcast(sample_data))
+                samples_spots.Add(sample_spots)
+        self.writer.Flush() # all the per-sample files are written
+        self.FinishRun()
+        with self.tracer.Span('concat'):
+            samples_dataframes = samples_dataframes.Build()
+            samples_spots = samples_spots.Build()
         print("Data saved to {}".format(self.directory))
         if samples_dataframes.empty:
             return samples_dataframes, samples_spots
 
-        samples_dataframes['Sample']=samples_dataframes.apply(self.ReplaceSampleLabels,axis=1)
-        samples_spots['Sample']=samples_spots.apply(self.ReplaceSampleLabels,axis=1)
+        self.ReplaceSampleLabels(samples_dataframes)
+        self.ReplaceSampleLabels(samples_spots)
 
         if save_to_pickle:
-            samples_dataframes.to_pickle(self.directory+'cells_data_'+ date.today().strftime("%Y%m%d")+ ".pkl")
-            samples_spots.to_pickle(self.directory+'spots_data_'+date.today().strftime("%Y%m%d")+ ".pkl")
+            with self.tracer.Span('write', output='pickle'):
+                samples_dataframes.to_pickle(self.directory+'cells_data_'+ date.today().strftime("%Y%m%d")+ ".pkl")
+                samples_spots.to_pickle(self.directory+'spots_data_'+date.today().strftime("%Y%m%d")+ ".pkl")
+        if save_to_columnar:
+            with self.tracer.Span('write', output='parquet'):
+                ColumnarStore.Save(samples_dataframes, self.directory+'cells_data_'+ date.today().strftime("%Y%m%d")+ ".parquet")
+                ColumnarStore.Save(samples_spots, self.directory+'spots_data_'+ date.today().strftime("%Y%m%d")+ ".parquet")
             
         return samples_dataframes, samples_spots
             
+    def CollectSample(self, sample, series_results):
+        """CollectSample gathers the data of the series of a sample
+        
+        Args:
+            sample (str): sample folder name
+            series_results (iterable): (number of spots, cells data) of each serie, as returned by ExtractSerieData
+        
+        Returns:
+            [tuple]: cells data (pd.DataFrame) and spots data (pd.DataFrame, one row per serie) of the sample
+        """
+        print("=====================================")
+        print("Processing {}".format(sample))
+        
+        sample_data = FrameAccumulator(leading=['Sample'], categorical=True) # will contain all the sample data
+        nr_spots_series = []
+        for nr_spots, serie_data in series_results:
+            # Handle spots data              
+            nr_spots_series.append(nr_spots)
+
+            # Handle cells data
+            if serie_data.empty:
+                print("No Vesicles or No Data|")
+                continue
+            
+            sample_data.Add(serie_data, Sample=sample)
+        
+        with self.tracer.Span('concat', sample=sample):
+            sample_data = sample_data.Build()
+        sample_spots = pd.DataFrame() # one row per serie
+        if nr_spots_series:
+            sample_spots = pd.DataFrame({'Sample':sample, self.SPOTS_OUT_COL_NAME:nr_spots_series}, 
+                                        index=np.zeros(len(nr_spots_series), dtype=np.int64))
+            self.schema.Apply(sample_spots)
+        return sample_data, sample_spots
+
+    def BeginRun(self):
+        """BeginRun records the run in the result store, if any
+        """
+        if self.results is not None:
+            self.run_id = self.results.BeginRun('cells', self.directory, self.config)
+
+    def FinishRun(self):
+        """FinishRun marks the run as complete in the result store, if any, once all its rows were stored
+        """
+        if self.results is not None:
+            self.results.FinishRun(self.run_id)
+
+    def StoreSample(self, sample, series_results):
+        """StoreSample appends the cells and the number of spots of every serie of a sample to the result store, if any
+
+        Args:
+            sample (str): sample folder name
+            series_results (iterable): (serie, (number of spots, cells data)) pairs
+        """
+        if self.results is None:
+            return
+        label = self.sample_labels[sample]
+        with self.tracer.Span('write', sample=sample, output='store'):
+            for serie, (nr_spots, serie_data) in series_results:
+                self.results.Add('spots', self.run_id, sample, label, serie, pd.DataFrame({self.SPOTS_OUT_COL_NAME: [nr_spots]}))
+                self.results.Add('cells', self.run_id, sample, label, serie, serie_data)
+            self.results.Commit()
+
+    def UpdateSamples(self, samples):
+        """UpdateSamples rewrites the per-sample files of the given samples only, e.g. after some of their series
+            changed (see common.watch). Uses the index of the last IdentifySamples; the series are read from
+            the cache when enabled, so only the new or modified ones are parsed.
+        
+        Args:
+            samples (list): sample folder names; the files of those without any serie (e.g. removed) are deleted
+        """
+        for sample in samples:
+            series = self.IdentifySeries(sample)
+            if not series:
+                for filename in self.writer.Remove(self.directory+sample, ["cell_data", "spots_data"]):
+                    print("Removed {}".format(filename))
+                continue
+            jobs = [(sample, serie) for serie in series]
+            with self.Prefetch(jobs):
+                series_results = self.pool.Map(self.tracer.Collect(self.ExtractSerieData), jobs)
+            sample_data, sample_spots = self.CollectSample(sample, map(self.tracer.Absorb, series_results))
+            self.writer.Write(self.directory+sample, {"cell_data": sample_data, "spots_data": sample_spots})
+        self.writer.Flush()
+
     def IdentifySamples(self):
-        """IdentifySamples finds all the samples (each sample has its own folder)  
+        """IdentifySamples finds all the samples (each sample has its own folder) and indexes their series files
+            (see ExperimentIndex), reporting the series which miss their cells or spots file
         
         Returns:
             [list]: contains sample names
         """
-
-        list_samples =[]
-        entries = os.listdir(self.directory) # all files/folder within provided directory
-        print(f"Total number of entries: {len(entries)}")
+        self.index = ExperimentIndex(self.directory, include_sample=self.IsSampleFolder)
+        print(f"Total number of entries: {self.index.entries}")
         print("Will only include folders.")
-        for entry in entries:
-            if os.path.isdir(self.directory+entry): # if it is a folder
-                list_samples.append(entry) # added to the list of samples
-        list_samples.sort() # sort them
+        list_samples = self.index.Samples() # sorted
         print(f"Found{len(list_samples)} samples.")
         print(list_samples)
+        self.index.ReportIncomplete(self.SERIE_ROLES)
         return list_samples  
 
+    @staticmethod
+    def IsSampleFolder(name):
+        return not name.startswith('.') and not name.endswith('.parquet') # hidden ones, e.g. the cache, and output datasets are skipped
+
     def VerifySampleNames(self):
         if not self.sample_labels:
             self.sample_labels= dict(zip(self.samples_name,self.samples_name))
@@ -157,14 +294,69 @@ class IMARISDataProcessor:
         Returns:
             [list]: contains the list of series existing for a given sample
         """
-        list_series = []
-        entries = os.listdir(os.path.join(self.directory,sample_name))
-        for entry in entries:
-            splitted = os.path.splitext(entry) 
-            if splitted[-1]==".xls" and 'spots' in splitted[0].lower(): # we are expecting per series to exist a "spots" excel
-                list_series.append(splitted[0].split('_')[0])
-        list_series.sort()
-        return list_series  
+        return self.index.Series(sample_name, self.SERIE_ROLES) # we are expecting per series a "cells" and a "spots" excel
+
+    def ExtractSerieData(self, sample_name, serie_name):
+        """ExtractSerieData loads both the spots and the cells data of a serie. This is the unit of work
+            handed to the worker processes in parallel mode.
+        
+        Returns:
+            [tuple]: number of spots (int) and cells data (pd.DataFrame)
+        """
+        print("Loading {} ...".format(serie_name))
+        with self.tracer.Span('parse', sample=sample_name, serie=serie_name):
+            nr_spots = self.ExtractSerieSpotsData(sample_name, serie_name) # get the cells which we categorized as "spot"
+            serie_data = self.ExtractSerieCellsData(sample_name, serie_name)
+        self.tracer.Count('series')
+        return nr_spots, serie_data
+
+    def SerieFile(self, sample_name, serie_name, role):
+        """SerieFile returns the "Series[XX]_cells.xls" (role 'cells') or "Series[XX]_spots.xls" (role 'spots') 
+            file of the index, which IMARIS sometimes exports capitalized, else the native "Series[XX].ims" file.
+
+        Returns:
+            [SeriesFile]: path, size and mtime_ns of the file
+        """
+        source = self.index.File(sample_name, serie_name, role)
+        if source is None:
+            raise Exception(f"No {role} file for serie {serie_name} of sample {sample_name}.")
+        return source
+
+    def CacheConfig(self, role):
+        """CacheConfig returns the configuration which drives the extraction of the file of a role (see SeriesCache)
+        """
+        if role == 'spots':
+            return 'Diameter'
+        return [self.CELLS_SHEET_COLUMN, self.VESICLES_OVERALL_SHEET]
+
+    @contextlib.contextmanager
+    def Prefetch(self, jobs):
+        """Prefetch reads ahead, within the block, the files of the series of jobs which are not in the cache,
+            in the order ExtractSerieData parses them (see common.prefetch). Nothing is prefetched when disabled
+            or when the series are parsed by worker processes.
+        """
+        if not self.prefetch_bytes or (self.pool.workers > 1 and len(jobs) > 1):
+            yield
+            return
+        sources = []
+        for sample, serie in jobs:
+            for role in ['spots', 'cells']:
+                source = self.SerieFile(sample, serie, role)
+                if self.cache is None or not self.cache.Has(source.path, self.CacheConfig(role), stat=source[1:]):
+                    sources.append(source)
+        self.prefetcher = Prefetcher(self.prefetch_bytes, tracer=self.tracer)
+        try:
+            self.prefetcher.Schedule(sources)
+            yield
+        finally:
+            self.prefetcher.Close()
+            self.prefetcher = None
+
+    def ReadSerieFile(self, source):
+        """ReadSerieFile opens the reader of a series file, from its prefetched contents if any
+        """
+        contents = None if self.prefetcher is None else self.prefetcher.Take(source)
+        return OpenWorkbook(source.path, contents)
 
     def ExtractSerieSpotsData(self, sample_name, serie_name):
         """ExtractSeriesSpotsData from the provided filename, it extracts the number of spots by checking 
@@ -176,16 +368,35 @@ class IMARISDataProcessor:
         Returns:
             [int]: number of spots in serie 
         """
-        filename = os.path.join(self.directory, sample_name, serie_name)
-        if (os.path.isfile(filename+'_Spots.xls')):
-            xls = pd.ExcelFile(filename+'_Spots.xls')
-        else:
-            xls = pd.ExcelFile(filename+'_spots.xls')
+        source = self.SerieFile(sample_name, serie_name, 'spots')
+        if self.cache is None:
+            return self.CountSpots(source)
+        spots = self.cache.Fetch(source.path, self.CacheConfig('spots'), 
+                                 lambda filename: pd.DataFrame({'Spots': [self.CountSpots(source)]}), stat=source[1:])
+        return int(spots['Spots'].values[0])
 
+    def CountSpots(self, source):
+        """CountSpots counts the rows of data of the "Diameter" sheet (below its title and header rows)
+            from the dimensions of the sheet, without reading its cells (see WorkbookReader.CountRows)
+
+        Args:
+            source (SeriesFile): spots file
+
+        Returns:
+            [int]: number of spots, 0 if the file has no "Diameter" sheet
+        """
+        filename = source.path
+        self.tracer.Count('bytes read', source.size)
         try:
-            return pd.read_excel(xls,sheet_name='Diameter',skiprows=1).shape[0] 
-        except:
-            return 0
+            with self.ReadSerieFile(source) as workbook:
+                if 'Diameter' not in workbook.SheetNames():
+                    print(f"No 'Diameter' sheet in {filename}, 0 spots counted.")
+                    return 0
+                rows = workbook.CountRows('Diameter')
+        except Exception as exception:
+            raise Exception(f"Could not count the spots of {filename}: {exception}") from exception
+        self.tracer.Count('sheets parsed', workbook.sheets_parsed)
+        return max(0, rows-2)
 
     def ExtractSerieCellsData(self, sample_name, serie_name):
         """ExtractCellsData extracts serie's cells data from the "Series[XX]_cells.xls" file
@@ -197,109 +408,309 @@ class IMARISDataProcessor:
             [pd.DataFrame]: dataframe with columns Number of Vesicles, Intensity Mean, Sphericity,
                 Volume and ID. Only the cells with at least a vesicles were left in the DataFrame
         """
-        filename = os.path.join(self.directory, sample_name, serie_name)
-        if (os.path.isfile(filename+'_Cells.xls')):
-            xls = pd.ExcelFile(filename+'_Cells.xls')
-        else:
-            xls = pd.ExcelFile(filename+'_cells.xls')
-        if not self.CheckIfVesicles(xls):
-            return pd.DataFrame()
+        source = self.SerieFile(sample_name, serie_name, 'cells')
+        if self.cache is None:
+            return self.ReadCellsWorkbook(source)
+        return self.cache.Fetch(source.path, self.CacheConfig('cells'), 
+                                lambda filename: self.ReadCellsWorkbook(source), stat=source[1:])
+
+    def ReadCellsWorkbook(self, source):
+        """ReadCellsWorkbook reads the configured features of every cell containing vesicles from a cells workbook
+            (SeriesFile of the index)
+        """
+        self.tracer.Count('bytes read', source.size)
+        with self.ReadSerieFile(source) as workbook:
+            if not self.CheckIfVesicles(workbook):
+                self.tracer.Count('sheets parsed', workbook.sheets_parsed)
+                return pd.DataFrame()
+            plan = WorkbookPlan()
+            for sheet_col_name in self.CELLS_SHEET_COLUMN.values():
+                plan.Add(sheet_col_name[0], sheet_col_name[1], skiprows=1)
+            columns = workbook.Read(plan)
+        self.tracer.Count('sheets parsed', workbook.sheets_parsed)
         data_dict = {}
         for assigned_name, sheet_col_name in self.CELLS_SHEET_COLUMN.items():
-            data_dict[assigned_name] = pd.read_excel(xls,
-                                sheet_name=sheet_col_name[0],
-                                skiprows=1)[sheet_col_name[1]]
-            # data_dict[assigned_name] = df[sheet_col_name[1]].rename(
-            #                             columns = {sheet_col_name[1]:assigned_name}
-            #                         )
-        # remove nr of vesicles <1
-        indices = data_dict['Vesicles']>0
+            data_dict[assigned_name] = columns[tuple(sheet_col_name)]
 
-        try:
-            sample_data = pd.concat([data[indices.values] for data in data_dict.values()],
-                                    axis=1)
-        except:
+        if len(set(len(data) for data in data_dict.values())) > 1:
             error_str = "Could not concatenate data from different sheets."
             # iterate over each key of data_Dict and print their length
             for key in data_dict.keys():
                 error_str += f"\n{key}: {len(data_dict[key])}"
             raise Exception(error_str)
-        for assigned_name, sheet_col_name in self.CELLS_SHEET_COLUMN.items():
-            sample_data.rename(columns = {sheet_col_name[1]:assigned_name},inplace=True)
-        sample_data.index.name="Cell ID"
-        
-
+        # remove nr of vesicles <1
+        with self.tracer.Span('filter'):
+            indices = data_dict['Vesicles']>0
+            sample_data = pd.DataFrame({assigned_name: data[indices] for assigned_name, data in data_dict.items()},
+                                        index=np.flatnonzero(indices))
+            sample_data.index.name="Cell ID"
+            sample_data = self.schema.Apply(sample_data)
+        self.tracer.Count('cells read', len(indices))
+        self.tracer.Count('cells kept', len(sample_data))
         return sample_data
 
-    def CheckIfVesicles(self, xls_file):
-        data = pd.read_excel(xls_file, sheet_name=self.VESICLES_OVERALL_SHEET[0],
-                            skiprows=1)
-        total = data['Value'].loc[data['Variable']==self.VESICLES_OVERALL_SHEET[1]].values[0]
+    def CheckIfVesicles(self, workbook):
+        """CheckIfVesicles reads, from the overall sheet, the total number of vesicles of the serie
+        
+        Args:
+            workbook (WorkbookReader): opened cells workbook
+        
+        Returns:
+            [bool]: whether the serie contains any vesicle
+        """
+        overall_sheet, total_name = self.VESICLES_OVERALL_SHEET
+        data = workbook.Read(WorkbookPlan().Add(overall_sheet, 'Variable').Add(overall_sheet, 'Value'))
+        total = data[(overall_sheet, 'Value')][data[(overall_sheet, 'Variable')]==total_name][0]
         if total == 0:
             return False
 
         return True
         
-    def CreateColumnForSerie(self, value, nr_cells):
-        """CreateColumnForSerie Generate column nr_cells long containing only value or having only the first cell with value and the remainder filled with zero.
+    def ExtractMetricsForSamples(self, cells_df, spots_df, save_to_excel=True):
+        """ExtractMetricsForSamples groups dataframe by Sample and extracts statistical information on each of the features.
         
         Args:
-            value ([str, int, float]): value to be added present in the column
-            nr_cells ([int]): number of cells the column contains
-            only_first (bool, optional): Whehter the column is filled with the same value or just the first cell bears the value whereas the remainder are set to zero. Defaults to True.
+            df (pd.DataFrame): input dataframe with the full information on the cells
+            save_to_excel (bool, optional): whether metrics should be exported as an excel file. Defaults to True.
         
         Returns:
-            [list]: list containing value (in every cell or only the first)
+            [pd.DataFrame]: contains statistics per sample type of the input dataframe
         """
 
-        new_col=[value]*nr_cells
-        return new_col
+        with self.tracer.Span('aggregate'):
+            metrics = self.metric_plan.Aggregate(cells_df, 'Sample') # as describe(percentiles=[]), plus the sums
+            sum_vesicles = metrics.pop(('Vesicles', 'sum')).rename('Vesicles')
         
+        if save_to_excel:
+            with self.tracer.Span('aggregate'):
+                sum_spots = self.spots_plan.Aggregate(spots_df, 'Sample')[self.SPOTS_OUT_COL_NAME, 'sum'].rename(self.SPOTS_OUT_COL_NAME)
+            comparison = None if self.comparison is None else self.CompareSamples(cells_df, sum_spots)
+            metrics = self.SaveSummaryToExcel(metrics, sum_vesicles, sum_spots, comparison)
 
-    def ExtractMetricsForSamples(self, cells_df, spots_df, save_to_excel=True):
-        """ExtractMetricsForSamples groups dataframe by Sample and extracts statistical information on each of the features.
+        return metrics
+
+    def CompareSamples(self, cells_df, sum_spots):
+        """CompareSamples computes, per sample, the bootstrap confidence interval of the mean of each feature and of
+            %MBP (for the number of spots found), and compares the means of every pair of samples with permutation
+            tests (see common.comparison)
+
+        Args:
+            cells_df (pd.DataFrame): cells data
+            sum_spots (pd.Series): total number of spots per sample
+
+        Returns:
+            [tuple]: intervals and tests (pd.DataFrame)
+        """
+        features = list(self.CELLS_SHEET_COLUMN.keys())
+        with self.tracer.Span('compare', resamples=self.comparison.resamples):
+            intervals = self.comparison.Intervals(cells_df, 'Sample', features)
+            tests = self.comparison.Tests(cells_df, 'Sample', features)
+        counts = cells_df.groupby('Sample', observed=True)['Vesicles'].count()
+        for name, numerator, denominator, scale in self.metric_plan.ratios: # %MBP = 100 * mean * cells / spots
+            factor = (counts*scale/sum_spots).reindex(intervals.index).to_numpy()
+            for statistic in ['mean', self.comparison.Label('CI low'), self.comparison.Label('CI high')]:
+                intervals[(name, statistic)] = intervals[(numerator, statistic)].to_numpy()*factor
+        return intervals, tests
+
+    def SaveSummaryToExcel(self, metrics, sum_vesicles, sum_spots, comparison = None):
+        """SaveSummaryToExcel writes summary.xlsx, with a "summary" sheet (mean of each feature, total of vesicles and 
+            spots and %MBP per sample), a "full statistics" sheet and, if given, a "comparison" sheet.
         
         Args:
-            df (pd.DataFrame): input dataframe with the full information on the cells
-            save_to_excel (bool, optional): whether metrics should be exported as an excel file. Defaults to True.
+            metrics (pd.DataFrame): per sample (rows), statistics of each feature as returned by describe
+            sum_vesicles (pd.Series): total number of vesicles per sample
+            sum_spots (pd.Series): total number of spots per sample
+            comparison (tuple, optional): intervals and tests, as returned by CompareSamples. Defaults to None.
         
         Returns:
-            [pd.DataFrame]: contains statistics per sample type of the input dataframe
+            [pd.DataFrame]: metrics without the counts and the vesicles statistics
         """
+        with self.tracer.Span('write', output='summary'), pd.ExcelWriter(self.directory+'summary.xlsx',mode = 'w') as writer:  # doctest: +SKIP
+            temp = metrics.unstack(1)[:,'mean'].unstack(0)
+            sum_vesicles_spots = pd.concat([sum_vesicles, sum_spots],axis=1)
+            temp['Vesicles'] = sum_vesicles_spots['Vesicles']
+            temp[self.SPOTS_OUT_COL_NAME] = sum_vesicles_spots[self.SPOTS_OUT_COL_NAME]
+            self.metric_plan.Derive(temp) # %MBP
+            metrics = metrics.drop(columns = 'count', level=1)
+            metrics = metrics.drop(columns = 'Vesicles')
+            temp.to_excel(writer, sheet_name= 'summary')
+            metrics.unstack(1).to_excel(writer, sheet_name="full statistics")
+            if comparison is not None:
+                SampleComparison.WriteSheet(writer, *comparison)
+        
+        print("Created a summary of the results under {}".format(self.directory+'summary.xlsx'))
+        return metrics
 
-        metrics = cells_df.groupby('Sample').describe(percentiles=[])
+    def StreamSamplesData(self, save_to_csv = True, save_to_excel = True):
+        """StreamSamplesData is the bounded-memory version of ExtractSamplesData followed by ExtractMetricsForSamples:
+            each serie is appended to disk as soon as it is parsed and only the per-sample statistics
+            (OnlineStatistics, with an approximate median) are kept in memory.
+        
+        Args:
+            save_to_csv (bool, optional): Per sample, append the series data to [sample]_cell_data.csv and 
+                [sample]_spots_data.csv. Defaults to True.
+            save_to_excel (bool, optional): save summary.xlsx, with the same sheets as ExtractMetricsForSamples. Defaults to True.
         
+        Returns:
+            [pd.DataFrame]: contains statistics per sample type (as ExtractMetricsForSamples)
+        """
+        with self.tracer.Span('identify'):
+            print("=====================================")
+            self.samples_name = self.IdentifySamples()
+            print("=====================================")
+            self.VerifySampleNames()
+            print("=====================================")
+            samples_series = [(sample, self.IdentifySeries(sample)) for sample in self.samples_name]
+        self.BeginRun()
+        features = list(self.CELLS_SHEET_COLUMN.keys())
+        statistics = {} # sample label -> feature -> OnlineStatistics
+        spots = {} # sample label -> total number of spots
+        jobs = [(sample, serie) for sample, series in samples_series for serie in series]
+        with self.Prefetch(jobs):
+            series_results = map(self.tracer.Absorb, self.pool.IMap(self.tracer.Collect(self.ExtractSerieData), jobs)) # lazily, in the same order as jobs
+            for sample, series in samples_series:
+                print("=====================================")
+                print("Processing {}".format(sample))
+                label = self.sample_labels[sample]
+                cells_filename = self.directory+sample+'_cell_data.csv'
+                spots_filename = self.directory+sample+'_spots_data.csv'
+                for filename in [cells_filename, spots_filename]:
+                    if save_to_csv and os.path.isfile(filename):
+                        os.remove(filename)
+                for serie in series:
+                    nr_spots, serie_data = next(series_results)
+                    self.StoreSample(sample, [(serie, (nr_spots, serie_data))])
+                    spots[label] = spots.get(label, 0) + nr_spots
+                    if save_to_csv:
+                        with self.tracer.Span('write', sample=sample, serie=serie, output='csv'):
+                            pd.DataFrame({'Sample':[sample],self.SPOTS_OUT_COL_NAME:[nr_spots]}, index=[0]).to_csv(
+                                spots_filename, mode='a', header=not os.path.isfile(spots_filename))
+                    if serie_data.empty:
+                        print("No Vesicles or No Data|")
+                        continue
+                    with self.tracer.Span('aggregate', sample=sample, serie=serie):
+                        sample_statistics = statistics.setdefault(label, {feature: OnlineStatistics() for feature in features})
+                        for feature in features:
+                            sample_statistics[feature].Update(serie_data[feature].values)
+                    if save_to_csv:
+                        with self.tracer.Span('write', sample=sample, serie=serie, output='csv'):
+                            serie_data.insert(0, 'Sample', sample)
+                            serie_data.to_csv(cells_filename, mode='a', header=not os.path.isfile(cells_filename))
+        self.FinishRun()
+        if not statistics:
+            return pd.DataFrame()
+
+        with self.tracer.Span('aggregate'):
+            metrics = OnlineStatistics.ToMetrics(statistics, percentiles=self.metric_plan.Quantiles())
         if save_to_excel:
+            sum_vesicles = pd.Series({label: statistics[label]['Vesicles'].sum for label in statistics}, name='Vesicles')
+            sum_spots = pd.Series(spots, name=self.SPOTS_OUT_COL_NAME)
+            metrics = self.SaveSummaryToExcel(metrics, sum_vesicles, sum_spots)
+        return metrics
 
-            with pd.ExcelWriter(self.directory+'summary.xlsx',mode = 'w') as writer:  # doctest: +SKIP
-                temp = metrics.unstack(1)[:,'mean'].unstack(0)
-                sum_vesicles = cells_df.groupby('Sample').sum()['Vesicles']
-                sum_spots = spots_df.groupby('Sample').sum()[self.SPOTS_OUT_COL_NAME]
-                sum_vesicles_spots = pd.concat([sum_vesicles, sum_spots],axis=1)
-                temp['Vesicles'] = sum_vesicles_spots['Vesicles']
-                temp[self.SPOTS_OUT_COL_NAME] = sum_vesicles_spots[self.SPOTS_OUT_COL_NAME]
-                temp['%MBP']=temp.apply(self.DetermineMBP, axis=1)
-                metrics = metrics.drop(columns = 'count', level=1)
-                metrics = metrics.drop(columns = 'Vesicles')
-                temp.to_excel(writer, sheet_name= 'summary')
-                metrics.unstack(1).to_excel(writer, sheet_name="full statistics")
-            
-            print("Created a summary of the results under {}".format(self.directory+'summary.xlsx'))
+    def ExtractSerieState(self, sample_name, serie_name):
+        """ExtractSerieState parses a serie and reduces it to a mergeable state: number of spots and, per feature,
+            an OnlineStatistics state.
+        """
+        nr_spots, serie_data = self.ExtractSerieData(sample_name, serie_name)
+        state = {'spots': nr_spots, 'cells': {}}
+        with self.tracer.Span('aggregate', sample=sample_name, serie=serie_name):
+            for feature in self.CELLS_SHEET_COLUMN.keys():
+                if not serie_data.empty:
+                    feature_statistics = OnlineStatistics(StatisticsStore.SKETCH_SIZE).Update(serie_data[feature].values)
+                    state['cells'][feature] = feature_statistics.ToDict()
+        return state
 
+    def UpdateSummary(self, save_to_excel = True, state_filename = None):
+        """UpdateSummary regenerates summary.xlsx from per-serie statistics states stored next to the data: only
+            the series which are new or were modified since the last update are parsed, the states of the series
+            which disappeared are dropped and the remaining ones are merged per sample.
+        
+        Args:
+            save_to_excel (bool, optional): save summary.xlsx, with the same sheets as ExtractMetricsForSamples. Defaults to True.
+            state_filename (str, optional): file storing the states. Defaults to [directory]/.restruct_state_cells.json.
+        
+        Returns:
+            [pd.DataFrame]: contains statistics per sample type (as ExtractMetricsForSamples)
+        """
+        if state_filename is None:
+            state_filename = os.path.join(self.directory, '.restruct_state_cells.json')
+        store = StatisticsStore(state_filename)
+        with self.tracer.Span('identify'):
+            self.samples_name = self.IdentifySamples()
+            self.VerifySampleNames()
+            samples_series = [(sample, self.IdentifySeries(sample)) for sample in self.samples_name]
+        store.Retain(samples_series)
+
+        config = [self.CELLS_SHEET_COLUMN, self.VESICLES_OVERALL_SHEET]
+        fingerprints = {}
+        jobs = []
+        for sample, series in samples_series:
+            for serie in series:
+                fingerprints[(sample, serie)] = StatisticsStore.Fingerprint(
+                    [self.SerieFile(sample, serie, 'cells'), self.SerieFile(sample, serie, 'spots')], config)
+                if store.Get(sample, serie, fingerprints[(sample, serie)]) is None:
+                    jobs.append((sample, serie))
+        print(f"{len(jobs)} new or modified series out of {len(fingerprints)}.")
+        with self.Prefetch(jobs):
+            states = map(self.tracer.Absorb, self.pool.IMap(self.tracer.Collect(self.ExtractSerieState), jobs))
+            for (sample, serie), state in zip(jobs, states):
+                store.Put(sample, serie, fingerprints[(sample, serie)], state)
+        with self.tracer.Span('write', output='states'):
+            store.Save()
+
+        cells_states = {} # sample label -> list of per-serie states
+        spots = {} # sample label -> total number of spots
+        for sample, series in samples_series:
+            label = self.sample_labels[sample]
+            for serie in series:
+                state = store.Get(sample, serie, fingerprints[(sample, serie)])
+                spots[label] = spots.get(label, 0) + state['spots']
+                if state['cells']:
+                    cells_states.setdefault(label, []).append(state['cells'])
+        if not cells_states:
+            return pd.DataFrame()
+
+        with self.tracer.Span('aggregate'):
+            statistics = {label: OnlineStatistics.MergeStates(states) for label, states in cells_states.items()}
+            metrics = OnlineStatistics.ToMetrics(statistics, percentiles=self.metric_plan.Quantiles())
+        if save_to_excel:
+            sum_vesicles = pd.Series({label: statistics[label]['Vesicles'].sum for label in statistics}, name='Vesicles')
+            sum_spots = pd.Series(spots, name=self.SPOTS_OUT_COL_NAME)
+            metrics = self.SaveSummaryToExcel(metrics, sum_vesicles, sum_spots)
         return metrics
-    
+
     def DetermineMBP(self,data):
-        return data['Vesicles']/data[self.SPOTS_OUT_COL_NAME]*100
+        """DetermineMBP returns %MBP (100 * Vesicles / Nr. Spots) of a summary table or row, as derived by the metric plan
+        """
+        return self.metric_plan.Derive(dict(data))['%MBP']
+
+    def ReplaceSampleLabels(self,dataframe):
+        """ReplaceSampleLabels replaces, in place, the sample folder names by their labels (see config file)
+        """
+        dataframe['Sample'] = self.schema.Relabel(dataframe['Sample'], self.sample_labels)
 
-    def ReplaceSampleLabels(self,datarow):
-        return self.sample_labels[datarow['Sample']]
+    def GenerateBoxPlot(self,dataframe, feature, x_range = [], swarmplot=True, visualize = False, point_budget = None,
+                        strip_layer = 'points'):
+        """GenerateBoxPlot plots feature per sample (box + points)
 
-    def GenerateBoxPlot(self,dataframe, feature, x_range = [], swarmplot=True, visualize = False):
+        Args:
+            point_budget (int, optional): if the data has more rows, the boxes are computed from per-sample
+                statistics and the strip layer is rasterised (see common.plotting.AggregateBoxPlot).
+                Defaults to None (every point is drawn by seaborn).
+            strip_layer (str, optional): strip layer above point_budget rows, 'points' (at most point_budget
+                points) or 'density' (per-sample histogram of every value). Defaults to 'points'.
+        """
+        import matplotlib.pyplot as plt # plotting libraries are only loaded when plots are made
         if x_range == []:
             x_range = [dataframe[feature].min(), dataframe[feature].max()]
         f, ax = plt.subplots(figsize=( 20 , len(dataframe['Sample'].unique())*1.5)) # Figure size is set here, you can adjust it
-        sns.boxplot(x=feature, y="Sample", data=dataframe)
-        sns.stripplot(x=feature, y="Sample", data=dataframe, alpha=0.75, color="0.3")
+        if point_budget is not None and len(dataframe) > point_budget:
+            AggregateBoxPlot(point_budget, layer=strip_layer).Draw(ax, dataframe, feature)
+        else:
+            import seaborn as sns
+            sns.boxplot(x=feature, y="Sample", data=dataframe)
+            sns.stripplot(x=feature, y="Sample", data=dataframe, alpha=0.75, color="0.3")
         ax.xaxis.grid(True)
         ax.set(ylabel="")
         plt.tight_layout()
@@ -307,8 +718,30 @@ class IMARISDataProcessor:
             plt.show()
         else:
             f.savefig(self.directory+feature+date.today().strftime('%Y%m%d')+".pdf")
+            plt.close(f)
 
         return
+
+    def GenerateBoxPlots(self, dataframe, features, workers = None, point_budget = None, strip_layer = 'points'):
+        """GenerateBoxPlots saves the box plots of several features to PDF, rendered without display
+            on a pool of worker processes (see common.plotting.BoxPlotRenderer)
+
+        Args:
+            dataframe (pd.DataFrame): samples data
+            features ([list]): columns to plot
+            workers (int, optional): number of worker processes. Defaults to None (one per core).
+            point_budget (int, optional): see GenerateBoxPlot. Defaults to None.
+            strip_layer (str, optional): see GenerateBoxPlot. Defaults to 'points'.
+
+        Returns:
+            [dict]: feature -> rendering time in seconds
+        """
+        features = list(features)
+        with self.tracer.Span('plot', features=len(features)):
+            timings = BoxPlotRenderer(workers).Render(self, dataframe, features, point_budget=point_budget,
+                                                      strip_layer=strip_layer)
+        self.tracer.Count('plots', len(features))
+        return timings
             
 
 
@@ -0,0 +1,321 @@
+""" Command line interface of restructIMARIS, for headless use (no folder/file selection windows).
+
+    restruct-imaris cells ingest FOLDER [--plot]      extract every series, save the data and summary.xlsx
+    restruct-imaris cells summarise FOLDER            update summary.xlsx from the stored per-series statistics
+    restruct-imaris cells watch FOLDER                keep the outputs up to date while the series are exported
+    restruct-imaris cells plot FILE                   box plots from a saved .pkl file or .parquet folder
+    restruct-imaris cells batch ROOT... [--jobs N]    ingest many experiment folders (resumable)
+    restruct-imaris cells query STORE [--labels L...] summary or rows of the result store (--result-store)
+
+and the same for dendrite. Plotting libraries are only imported by the commands which make plots.
+Without installing the package, run `python -m restructIMARIS.cli ...` from the folder containing restructIMARIS.
+"""
+import argparse
+import os
+import sys
+
+PACKAGE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+CONFIG_FILES = {'cells': 'config_cells.json', 'dendrite': 'config_dendrite.json'}
+
+
+def ConfigDir(args):
+    """ConfigDir returns the folder of the configuration file: --config-dir, else the current folder
+        (as the scripts), else the configuration shipped with the package
+    """
+    if args.config_dir is not None:
+        return args.config_dir
+    if os.path.isfile(CONFIG_FILES[args.data]):
+        return "."
+    return PACKAGE_DIR
+
+
+def CreateProcessor(args, directory):
+    options = dict(parallel=getattr(args, 'parallel', False), workers=getattr(args, 'workers', None),
+                   dir_config=ConfigDir(args), trace=getattr(args, 'trace', False),
+                   output_formats=getattr(args, 'formats', ['xlsx']), constant_memory=getattr(args, 'constant_memory', False),
+                   write_in_background=getattr(args, 'background_writer', False),
+                   result_store=getattr(args, 'result_store', None), resamples=getattr(args, 'resamples', 0),
+                   approximate_resampling=getattr(args, 'approximate_resampling', False),
+                   prefetch_bytes=int(getattr(args, 'prefetch', 0)*1024**2))
+    if getattr(args, 'cache', False):
+        options['cache_dir'] = os.path.join(directory, '.restruct_cache')
+    if args.data == 'cells':
+        from .cells.restruct_data import IMARISDataProcessor
+        return IMARISDataProcessor(os.path.join(directory, ''), **options)
+    from .dendrite.make_summary import IMARISDendriteSumary
+    return IMARISDendriteSumary(os.path.normpath(directory), **options)
+
+
+def TraceFile(args, directory):
+    return os.path.join(directory, f'restruct_trace_{args.data}.json')
+
+
+def ExistingDirectory(path):
+    if not os.path.isdir(path):
+        raise argparse.ArgumentTypeError(f"{path} is not a folder")
+    return path
+
+
+def NumericFeatures(dataframe):
+    import pandas as pd
+    return [feature for feature in dataframe.columns.values if pd.api.types.is_numeric_dtype(dataframe[feature].dtype)]
+
+
+def PlotOptions(args):
+    options = {'point_budget': args.point_budget}
+    if args.data == 'cells': # the dendrite plots have no strip layer
+        options['strip_layer'] = args.strip_layer
+    return options
+
+
+def PlotFeatures(args, processor, dataframe):
+    features = processor.CELLS_SHEET_COLUMN.keys() if args.data == 'cells' else NumericFeatures(dataframe)
+    processor.GenerateBoxPlots(dataframe, features, workers=args.plot_workers, **PlotOptions(args))
+
+
+def Ingest(args):
+    processor = CreateProcessor(args, args.directory)
+    try:
+        return ExtractData(args, processor)
+    finally:
+        processor.tracer.Report(TraceFile(args, args.directory))
+
+
+def ExtractData(args, processor):
+    if args.data == 'cells':
+        if args.streaming:
+            metrics = processor.StreamSamplesData(save_to_csv=True, save_to_excel=True)
+            return NoData(args) if metrics.empty else 0
+        samples_data, samples_spots = processor.ExtractSamplesData(save_to_excel=True, save_to_pickle=True,
+                                                                   save_to_columnar=args.columnar)
+        if samples_data.empty:
+            return NoData(args)
+        processor.ExtractMetricsForSamples(samples_data, samples_spots, save_to_excel=True)
+    else:
+        samples_data = processor.ProcessData(save_to_columnar=args.columnar)
+        if samples_data.empty:
+            return NoData(args)
+        processor.SaveToExcel(samples_data)
+    if args.plot:
+        PlotFeatures(args, processor, samples_data)
+    return 0
+
+
+def Summarise(args):
+    processor = CreateProcessor(args, args.directory)
+    metrics = processor.UpdateSummary()
+    processor.tracer.Report(TraceFile(args, args.directory))
+    return NoData(args) if metrics.empty else 0
+
+
+def Watch(args):
+    from .common.watch import WatchProcessor
+    processor = CreateProcessor(args, args.directory)
+    try:
+        WatchProcessor(processor, interval=args.interval, settle=args.settle, duration=args.duration)
+    finally:
+        processor.tracer.Report(TraceFile(args, args.directory))
+    return 0
+
+
+def Plot(args):
+    file_path = args.file.rstrip(os.sep)
+    directory = os.path.dirname(os.path.abspath(file_path))
+    processor = CreateProcessor(args, directory)
+    try:
+        return PlotData(args, processor, file_path)
+    finally:
+        processor.tracer.Report(TraceFile(args, directory))
+
+
+def PlotData(args, processor, file_path):
+    if os.path.isdir(file_path): # columnar dataset: only read the plotted feature
+        from .common.columnar import ColumnarStore
+        features = (processor.CELLS_SHEET_COLUMN.keys() if args.data == 'cells'
+                    else ColumnarStore.NumericColumns(file_path))
+        for feature in features:
+            samples_data = ColumnarStore.Load(file_path, columns=[feature])
+            processor.GenerateBoxPlots(samples_data, [feature], **PlotOptions(args))
+        return 0
+    import pandas as pd
+    samples_data = pd.read_pickle(file_path)
+    if samples_data.empty:
+        return NoData(args)
+    PlotFeatures(args, processor, samples_data)
+    return 0
+
+
+def Batch(args):
+    from .common.batch import BatchRunner, ExpandRoots, ReadRootsFile
+    patterns = list(args.roots) + (ReadRootsFile(args.roots_file) if args.roots_file else [])
+    roots = ExpandRoots(patterns)
+    if not roots:
+        print("No experiment folder matches the given roots.", file=sys.stderr)
+        return 1
+    args.config_dir = os.path.abspath(ConfigDir(args)) # the jobs do not depend on the current folder
+    if args.result_store is not None:
+        args.result_store = os.path.abspath(args.result_store)
+    jobs = {}
+    for root in roots:
+        job_args = argparse.Namespace(**vars(args))
+        job_args.directory = root
+        job_args.plot_workers = 1 # the folders are already processed in parallel
+        jobs[f"{args.data}:{root}"] = job_args
+    records = BatchRunner(args.manifest, args.jobs).Run(BatchJob, jobs, force=args.force)
+    BatchRunner.PrintSummary(records)
+    return 0 if all(record['status'] == BatchRunner.DONE for record in records.values()) else 1
+
+
+def BatchJob(args):
+    """BatchJob ingests one folder of a batch, writing the progress messages to restruct_[data].log in it
+    """
+    import contextlib
+    with open(os.path.join(args.directory, f'restruct_{args.data}.log'), 'w') as log_file:
+        with contextlib.redirect_stdout(log_file), contextlib.redirect_stderr(log_file):
+            return Ingest(args)
+
+
+STORE_TABLES = {'cells': ['cells', 'spots'], 'dendrite': ['dendrites']}
+
+
+def Query(args):
+    """Query prints, per sample label, the statistics of the features stored by the latest finished run of every experiment,
+        or saves the stored rows to a .csv/.pkl file with --output
+    """
+    from .common.result_store import ResultStore
+    store = ResultStore(args.store)
+    filters = dict(labels=args.labels, series=args.series, latest=not args.all_runs)
+    try:
+        for table in STORE_TABLES[args.data]:
+            columns = store.Features(table)
+            features = columns if args.features is None else [feature for feature in args.features if feature in columns]
+            if args.output is not None:
+                rows = store.Query(table, columns=features, **filters)
+                stem, extension = os.path.splitext(args.output)
+                filename = f"{stem}_{table}{extension}" if len(STORE_TABLES[args.data]) > 1 else args.output
+                if extension.lower() == '.pkl':
+                    rows.to_pickle(filename)
+                else:
+                    rows.to_csv(filename, index=False)
+                print(f"{len(rows)} {table} rows saved to {filename}")
+                continue
+            if not features:
+                continue
+            summary = store.Summary(table, features, by=args.by, **filters)
+            print(f"{table}:")
+            print(summary.stack(0)[list(store.STATISTICS)].to_string())
+    finally:
+        store.Close()
+    return 0
+
+
+def NoData(args):
+    print("No data. Are you sure you provided the correct path?", file=sys.stderr)
+    return 1
+
+
+def BuildParser():
+    parser = argparse.ArgumentParser(prog='restruct-imaris', description="Restructure and summarise IMARIS exports.")
+    data_parsers = parser.add_subparsers(dest='data', required=True)
+    for data in CONFIG_FILES:
+        data_parser = data_parsers.add_parser(data, help=f"{data} data")
+        commands = data_parser.add_subparsers(dest='command', required=True)
+
+        configuration = argparse.ArgumentParser(add_help=False)
+        configuration.add_argument('--config-dir', help=f"folder containing {CONFIG_FILES[data]} "
+                            "(default: current folder, else the one shipped with the package)")
+        configuration.add_argument('--trace', action='store_true',
+                                   help=f"print the time spent in every stage and save it to restruct_trace_{data}.json")
+
+        folder = argparse.ArgumentParser(add_help=False)
+        folder.add_argument('directory', type=ExistingDirectory, help="folder containing one sub-folder per sample")
+
+        extraction = argparse.ArgumentParser(add_help=False)
+        extraction.add_argument('--parallel', action='store_true', help="parse the series files on a pool of processes")
+        extraction.add_argument('--workers', type=int, help="number of worker processes (default: one per core)")
+        extraction.add_argument('--cache', action='store_true',
+                                help="cache the data extracted from each series file under .restruct_cache in the folder, "
+                                     "so reruns only parse new or modified files")
+        extraction.add_argument('--prefetch', type=float, default=0, metavar='MB',
+                                help="read up to this many MB of upcoming series files while parsing, e.g. on a network share")
+
+        plotting = argparse.ArgumentParser(add_help=False)
+        plotting.add_argument('--plot-workers', type=int, help="number of processes rendering the plots (default: one per core)")
+        plotting.add_argument('--point-budget', type=int, default=None,
+                              help="plot datasets with more rows from per-sample statistics, with a rasterised strip layer "
+                                   "(default: every point is drawn by seaborn; e.g. 20000)")
+        plotting.add_argument('--strip-layer', choices=['points', 'density'], default='points',
+                              help="strip layer of the cells plots above --point-budget rows: at most that many points "
+                                   "or a per-sample histogram of every value")
+
+        outputs = argparse.ArgumentParser(add_help=False)
+        outputs.add_argument('--columnar', action='store_true', help="also save Parquet datasets (requires pyarrow)")
+        outputs.add_argument('--plot', action='store_true', help="also save the box plots")
+        outputs.add_argument('--resamples', type=int, default=0,
+                             help="add to summary.xlsx bootstrap intervals and permutation tests of the means with this many resamples (e.g. 10000)")
+        outputs.add_argument('--approximate-resampling', action='store_true',
+                             help="resample the large samples by strata: much faster, but a normal approximation (labelled approx.)")
+        outputs.add_argument('--result-store', help="SQLite file where the rows and metadata of the run are appended (see query)")
+
+        files = argparse.ArgumentParser(add_help=False) # per-sample files
+        files.add_argument('--formats', nargs='+', choices=['xlsx', 'csv', 'parquet'], default=['xlsx'],
+                           help="formats of the per-sample files (default: %(default)s)")
+        files.add_argument('--constant-memory', action='store_true',
+                           help="stream the per-sample xlsx files to disk row by row (requires xlsxwriter)")
+        files.add_argument('--background-writer', action='store_true',
+                           help="write the per-sample files on a background thread while the next sample is processed")
+        if data == 'cells':
+            outputs.add_argument('--streaming', action='store_true',
+                                 help="write per-sample CSV files while parsing, keeping only statistics in memory")
+
+        ingest = commands.add_parser('ingest', parents=[configuration, folder, extraction, outputs, files, plotting],
+                                     help="extract every series and save the data and summary.xlsx")
+        ingest.set_defaults(handler=Ingest)
+
+        batch = commands.add_parser('batch', parents=[configuration, extraction, outputs, files, plotting],
+                                    help="ingest many experiment folders, resuming an interrupted batch")
+        batch.add_argument('roots', nargs='*', help="experiment folders or glob patterns (e.g. 'exports/2019*')")
+        batch.add_argument('--roots-file', help="text file listing one experiment folder or glob pattern per line")
+        batch.add_argument('--manifest', default=f'restruct_batch_{data}.json',
+                           help="JSON file recording the status and duration of every job (default: %(default)s)")
+        batch.add_argument('--jobs', type=int, help="number of folders processed at the same time (default: one per core)")
+        batch.add_argument('--force', action='store_true', help="also process the folders completed in a previous batch")
+        batch.set_defaults(handler=Batch)
+
+        summarise = commands.add_parser('summarise', parents=[configuration, folder, extraction],
+                                        help="update summary.xlsx from stored per-series statistics")
+        summarise.set_defaults(handler=Summarise)
+
+        watch = commands.add_parser('watch', parents=[configuration, folder, extraction, files],
+                                    help="update summary.xlsx and the per-sample files as series files are added or modified")
+        watch.add_argument('--interval', type=float, default=2.0, help="seconds between two scans of the folder (default: %(default)s)")
+        watch.add_argument('--settle', type=float, default=5.0,
+                           help="seconds without any change before updating, so files being written are not read (default: %(default)s)")
+        watch.add_argument('--duration', type=float, help="stop after this many seconds (default: until Ctrl+C)")
+        watch.set_defaults(handler=Watch)
+
+        query = commands.add_parser('query', help="statistics or rows of a result store, across experiments")
+        query.add_argument('store', help="SQLite file given to --result-store")
+        query.add_argument('--labels', nargs='+', help="sample labels (default: all)")
+        query.add_argument('--series', nargs='+', help="series names (default: all)")
+        query.add_argument('--features', nargs='+', help="feature columns (default: all)")
+        query.add_argument('--by', nargs='+', default=['label'], choices=['root', 'run_date', 'run_id', 'sample', 'label', 'series'],
+                           help="grouping of the statistics (default: %(default)s)")
+        query.add_argument('--all-runs', action='store_true', help="also the earlier and unfinished runs of every experiment folder")
+        query.add_argument('--output', help="save the rows to this .csv or .pkl file instead of printing statistics")
+        query.set_defaults(handler=Query)
+
+        plot = commands.add_parser('plot', parents=[configuration, plotting], help="save the box plots of saved data")
+        plot.add_argument('file', help=f"{data} .pkl file or .parquet folder")
+        plot.set_defaults(handler=Plot)
+    return parser
+
+
+def main(argv = None):
+    args = BuildParser().parse_args(argv)
+    return args.handler(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,79 @@
+import numpy as np
+import pandas as pd
+from pandas.api.types import union_categoricals
+
+
+class FrameAccumulator:
+    """ Collects per-series (or per-sample) chunks and assembles the final dataframe once.
+
+    Growing a dataframe with pd.concat inside a loop copies everything gathered so far at every
+    iteration (quadratic in the number of series). Here the chunks are only kept in a list and
+    concatenated in a single pass by Build.
+
+    Columns holding the same value for a whole chunk (e.g. 'Sample', 'Series') are not built per chunk:
+    only the value is recorded in Add and the column is expanded with np.repeat in Build, either in
+    front of the chunk columns (leading) or after them (trailing). With categorical=True, they are
+    built directly as categoricals from the repeated codes.
+
+    Categorical columns of the chunks are merged with union_categoricals, so they stay categorical
+    even when the chunks have different categories.
+    """
+
+    def __init__(self, leading = [], trailing = [], categorical = False):
+        self.leading = list(leading)
+        self.trailing = list(trailing)
+        self.categorical = categorical
+        self.chunks = []
+        self.lengths = []
+        self.constants = {name: [] for name in self.leading + self.trailing}
+
+    def Add(self, frame, **constants):
+        """Add appends a chunk
+
+        Args:
+            frame (pd.DataFrame): chunk data
+            **constants: value of every leading/trailing column for this chunk
+        """
+        self.chunks.append(frame)
+        self.lengths.append(frame.shape[0])
+        for name, values in self.constants.items():
+            values.append(constants[name])
+
+    def Build(self):
+        """Build concatenates all the chunks
+
+        Returns:
+            [pd.DataFrame]: chunks concatenated along the rows, with the constant columns added
+        """
+        if not self.chunks:
+            return pd.DataFrame()
+        if len(self.chunks) == 1:
+            data = self.chunks[0].copy()
+        else:
+            data = pd.concat(self.chunks, sort=False)
+            self.MergeCategoricals(data)
+        for position, name in enumerate(self.leading):
+            data.insert(position, name, self.ConstantColumn(name))
+        for name in self.trailing:
+            data[name] = self.ConstantColumn(name)
+        return data
+
+    def ConstantColumn(self, name):
+        values = self.constants[name]
+        if not self.categorical:
+            return np.repeat(np.asarray(values, dtype=object), self.lengths)
+        categories = {value: code for code, value in enumerate(dict.fromkeys(values))}
+        codes = np.asarray([categories[value] for value in values], dtype=np.int32)
+        return pd.Categorical.from_codes(np.repeat(codes, self.lengths), list(categories))
+
+    def MergeCategoricals(self, data):
+        chunks = [chunk for chunk in self.chunks if chunk.shape[1] > 0]
+        for column in data.columns:
+            if isinstance(data[column].dtype, pd.CategoricalDtype):
+                continue
+            dtypes = [chunk[column].dtype if column in chunk.columns else None for chunk in chunks]
+            if all(isinstance(dtype, pd.CategoricalDtype) for dtype in dtypes):
+                data[column] = union_categoricals([chunk[column] for chunk in chunks])
+
+    def __len__(self):
+        return len(self.chunks)
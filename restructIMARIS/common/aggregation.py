@@ -0,0 +1,150 @@
+import numpy as np
+import pandas as pd
+
+
+class MetricPlan:
+    """ Compiles the statistics wanted per column (named as in describe: count, mean, std, min, max,
+    percentiles such as '25%', plus sum) into a single grouped pass: the rows are grouped once and
+    each statistic is computed only for the columns which need it (one pass per statistic, one for
+    all the percentiles), instead of describing every column and grouping again for every sum.
+
+    Ratios (e.g. %MBP = 100 * Vesicles / Nr. Spots) are derived from the columns of a summary table
+    with Derive.
+    """
+    DESCRIBE = ['count', 'mean', 'std', 'min', '50%', 'max'] # describe(percentiles=[])
+    REDUCTIONS = ('count', 'mean', 'std', 'min', 'max', 'sum')
+
+    def __init__(self):
+        self.metrics = [] # (column, statistic), in the output order
+        self.ratios = [] # (name, numerator, denominator, scale)
+
+    @classmethod
+    def FromConfig(cls, columns):
+        """FromConfig builds a plan from a configuration section such as "Sheets" of config_dendrite.json
+
+        Args:
+            columns (dict): column -> list of statistics
+        """
+        plan = cls()
+        for column, statistics in columns.items():
+            plan.Add(column, statistics)
+        return plan
+
+    @staticmethod
+    def Percentile(statistic):
+        """Percentile returns the quantile of a statistic such as '25%', None for the other statistics
+        """
+        if isinstance(statistic, str) and statistic.endswith('%'):
+            try:
+                return float(statistic[:-1])/100
+            except ValueError:
+                return None
+        return None
+
+    def Add(self, column, statistics):
+        for statistic in statistics:
+            if statistic not in self.REDUCTIONS and self.Percentile(statistic) is None:
+                raise ValueError(f"Unknown statistic '{statistic}' for {column}, expected one of "
+                                 f"{', '.join(self.REDUCTIONS)} or a percentile such as '25%'")
+            if (column, statistic) not in self.metrics:
+                self.metrics.append((column, statistic))
+        return self
+
+    def AddRatio(self, name, numerator, denominator, scale = 1):
+        self.ratios.append((name, numerator, denominator, scale))
+        return self
+
+    def Quantiles(self):
+        """Quantiles returns the quantiles of the percentile statistics of the plan (e.g. [0.25, 0.5] for '25%' and
+            '50%'), sorted, as expected by OnlineStatistics.ToMetrics
+        """
+        return sorted(set(self.Percentile(statistic) for _, statistic in self.metrics) - {None})
+
+    def Columns(self):
+        """Columns returns the (column, statistic) pairs of the plan, in order
+        """
+        return list(self.metrics)
+
+    def Aggregate(self, dataframe, by):
+        """Aggregate computes the statistics of the plan per group of rows
+
+        Args:
+            dataframe (pd.DataFrame): data
+            by (str): grouping column (e.g. 'Sample' or 'Series')
+
+        Returns:
+            [pd.DataFrame]: one row per group (sorted by value), columns (column, statistic) as laid out by describe.
+                The statistics are float64 as in describe, except the sums which keep the type of the data.
+        """
+        # with observed=True the groups of a categorical column come in order of appearance, whatever sort says:
+        # the table is put in order at the end
+        grouped = dataframe.groupby(by, observed=True, sort=True)
+        columns_of = {} # statistic -> columns, in order
+        for column, statistic in self.metrics:
+            columns_of.setdefault(statistic, []).append(column)
+
+        results = {}
+        percentiles = {statistic: self.Percentile(statistic) for statistic in columns_of
+                       if self.Percentile(statistic) is not None}
+        for statistic, columns in columns_of.items():
+            if statistic in percentiles:
+                continue
+            values = getattr(grouped[columns], statistic)()
+            if statistic != 'sum':
+                values = values.astype(np.float64)
+            for column in columns:
+                results[(column, statistic)] = values[column]
+        if percentiles:
+            columns = list(dict.fromkeys(column for statistic in percentiles for column in columns_of[statistic]))
+            values = self.Percentiles(grouped, dataframe[columns], list(percentiles.values()))
+            for position, statistic in enumerate(percentiles):
+                for column in columns_of[statistic]:
+                    results[(column, statistic)] = values[column][:, position]
+            index = grouped.size().index
+            for key, result in results.items():
+                if isinstance(result, np.ndarray):
+                    results[key] = pd.Series(result, index=index, name=key[0])
+
+        table = pd.concat([results[metric] for metric in self.metrics], axis=1)
+        # levels kept in the plan order, as in describe (from_tuples would sort them)
+        names = list(dict.fromkeys(column for column, _ in self.metrics))
+        statistics = list(dict.fromkeys(statistic for _, statistic in self.metrics))
+        table.columns = pd.MultiIndex(levels=[names, statistics],
+                                      codes=[[names.index(column) for column, _ in self.metrics],
+                                             [statistics.index(statistic) for _, statistic in self.metrics]])
+        return table.iloc[np.argsort(np.asarray(table.index, dtype=object), kind='stable')]
+
+    @staticmethod
+    def Percentiles(grouped, dataframe, quantiles):
+        """Percentiles computes quantiles per group with linear interpolation, ignoring NaN, as describe does.
+            groupby.quantile is several times slower than describe itself, so the rows are sorted by group once
+            (shared by all the columns) and the quantiles are taken on each group's slice.
+
+        Returns:
+            [dict]: column -> np.ndarray (groups x quantiles)
+        """
+        codes = grouped.ngroup().to_numpy() # group number of each row, in the order of the groups, -1 if none
+        order = np.argsort(codes, kind='stable')
+        counts = np.bincount(codes[codes >= 0], minlength=grouped.ngroups)
+        bounds = np.concatenate([[0], np.cumsum(counts)]) + np.count_nonzero(codes < 0)
+        percentiles = {}
+        for column in dataframe.columns:
+            values = dataframe[column].to_numpy()
+            if values.dtype.kind != 'f': # floats keep their precision, as in describe
+                values = dataframe[column].to_numpy(dtype=np.float64, na_value=np.nan)
+            values = values[order]
+            result = np.full((grouped.ngroups, len(quantiles)), np.nan)
+            for group in range(grouped.ngroups):
+                segment = values[bounds[group]:bounds[group+1]]
+                segment = segment[~np.isnan(segment)]
+                if segment.size:
+                    result[group] = np.quantile(segment, quantiles)
+            percentiles[column] = result
+        return percentiles
+
+    def Derive(self, table):
+        """Derive adds, in place, the ratio columns of the plan to a table holding their numerators and denominators
+        """
+        for name, numerator, denominator, scale in self.ratios:
+            table[name] = table[numerator]/table[denominator]*scale
+        return table
@@ -0,0 +1,153 @@
+import os
+import glob
+import json
+import time
+import tempfile
+from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+
+def ExpandRoots(patterns):
+    """ExpandRoots resolves folder paths and glob patterns (e.g. exports/2019*/cells) to absolute folders
+
+    Returns:
+        [list]: folders, sorted, without duplicates
+    """
+    roots = set()
+    for pattern in patterns:
+        for path in glob.glob(os.path.expanduser(pattern)):
+            if os.path.isdir(path):
+                roots.add(os.path.abspath(path))
+    return sorted(roots)
+
+
+def ReadRootsFile(filename):
+    """ReadRootsFile reads one folder or glob pattern per line, ignoring empty lines and # comments
+    """
+    with open(filename) as roots_file:
+        lines = [line.split('#', 1)[0].strip() for line in roots_file]
+    return [line for line in lines if line]
+
+
+def _RunJob(func, argument):
+    """_RunJob runs one job in a worker process
+
+    Returns:
+        [tuple]: (exit code, start time, duration in seconds, error message or None)
+    """
+    started = datetime.now().isoformat(timespec='seconds')
+    start = time.perf_counter()
+    try:
+        code, error = func(argument), None
+    except Exception as exception:
+        code, error = 1, f"{type(exception).__name__}: {exception}"
+    return code or 0, started, time.perf_counter() - start, error
+
+
+class BatchRunner:
+    """ Runs independent jobs (e.g. one per experiment folder) on a bounded pool of worker processes and
+    records the status, start time and duration of every job in a JSON manifest.
+
+    The manifest is rewritten after each job, so an interrupted batch can be resumed: jobs already
+    completed are skipped, failed ones and those still queued when it stopped are run again.
+    """
+    FORMAT_VERSION = 1
+    QUEUED = 'queued'
+    DONE = 'done'
+    FAILED = 'failed'
+
+    def __init__(self, manifest_path, workers = None):
+        """
+        Args:
+            manifest_path (str): JSON file where the jobs status is recorded
+            workers (int, optional): number of jobs run at the same time. Defaults to the number of cores.
+                1 runs the jobs one after another in the current process.
+        """
+        self.manifest_path = manifest_path
+        if workers is None:
+            workers = os.cpu_count() or 1
+        self.workers = max(1, int(workers))
+        self.jobs = {}
+        self.Load()
+
+    def Load(self):
+        if not os.path.isfile(self.manifest_path):
+            return
+        try:
+            with open(self.manifest_path) as json_file:
+                data = json.load(json_file)
+        except (OSError, ValueError):
+            print(f"Could not read {self.manifest_path}, all the jobs will be run.")
+            return
+        if data.get('version') == self.FORMAT_VERSION:
+            self.jobs = data['jobs']
+
+    def Save(self):
+        directory = os.path.dirname(os.path.abspath(self.manifest_path))
+        handle, temp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+        with os.fdopen(handle, 'w') as json_file:
+            json.dump({'version': self.FORMAT_VERSION, 'jobs': self.jobs}, json_file, indent=2)
+        os.replace(temp_path, self.manifest_path)
+
+    def Pending(self, keys, force = False):
+        """Pending returns the keys of the jobs which still have to run (all of them if force)
+        """
+        return [key for key in keys if force or self.jobs.get(key, {}).get('status') != self.DONE]
+
+    def Run(self, func, jobs, force = False):
+        """Run calls func(argument) for every job not completed yet. A job fails if func raises an
+            exception or returns a non-zero exit code.
+
+        Args:
+            func (callable): picklable function run in the worker processes
+            jobs (dict): job key (e.g. cells:/path/to/folder) -> argument of func
+            force (bool, optional): also run the jobs completed in a previous batch. Defaults to False.
+
+        Returns:
+            [dict]: job key -> record (status, started, duration, error) of the jobs run now
+        """
+        pending = self.Pending(jobs.keys(), force)
+        skipped = len(jobs) - len(pending)
+        if skipped:
+            print(f"Skipping {skipped} job(s) already completed (see {self.manifest_path}).")
+        records = {}
+        if not pending:
+            return records
+        for key in pending:
+            self.jobs[key] = {'status': self.QUEUED}
+        self.Save()
+
+        if self.workers == 1 or len(pending) == 1:
+            for key in pending:
+                records[key] = self.Record(key, lambda: _RunJob(func, jobs[key]), len(records)+1, len(pending))
+            return records
+
+        with ProcessPoolExecutor(max_workers=min(self.workers, len(pending))) as executor:
+            futures = {executor.submit(_RunJob, func, jobs[key]): key for key in pending}
+            for future in as_completed(futures):
+                key = futures[future]
+                records[key] = self.Record(key, future.result, len(records)+1, len(pending))
+        return records
+
+    def Record(self, key, outcome, position, total):
+        """Record stores the outcome of a job (see _RunJob) in the manifest
+        """
+        try:
+            code, started, duration, error = outcome()
+        except Exception as exception: # e.g. the worker process was killed
+            code, started, duration, error = 1, None, 0.0, f"{type(exception).__name__}: {exception}"
+        if code and error is None:
+            error = f"exit code {code}"
+        record = {'status': self.FAILED if code else self.DONE, 'started': started,
+                  'duration': round(duration, 3), 'error': error}
+        self.jobs[key] = record
+        self.Save()
+        print(f"[{position}/{total}] {record['status']:<6} {key} ({duration:.1f}s)" + (f" - {error}" if error else ""))
+        return record
+
+    @staticmethod
+    def PrintSummary(records):
+        done = sum(record['status'] == BatchRunner.DONE for record in records.values())
+        print("==============")
+        print(f"{done} job(s) completed, {len(records)-done} failed, "
+              f"{sum(record['duration'] for record in records.values()):.1f}s of processing")
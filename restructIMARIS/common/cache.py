@@ -0,0 +1,153 @@
+import os
+import json
+import hashlib
+import tempfile
+import numpy as np
+import pandas as pd
+
+
+class SeriesCache:
+    """ On-disk cache of the dataframes extracted from the series files.
+
+    An entry is keyed on the source file (absolute path, size and modification time) and on the
+    part of the configuration which drives the extraction, so editing e.g. the sample labels does
+    not invalidate anything while touching a series file or the sheet/column names does.
+
+    Entries are stored column by column in .npz files. The size of the cache is scanned once when it
+    is opened and then kept up to date as entries are stored; when it grows above max_bytes, the least
+    recently used entries are removed until it is back under EVICT_TO of max_bytes, so the folder is
+    only rescanned every few stored entries however many it holds.
+    """
+    FORMAT_VERSION = 3
+    DEFAULT_MAX_BYTES = 2*1024**3
+    EVICT_TO = 0.9
+
+    def __init__(self, cache_dir, max_bytes = DEFAULT_MAX_BYTES):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        os.makedirs(self.cache_dir, exist_ok=True)
+        self.total_bytes = sum(size for _, size, _ in self.Entries())
+
+    def Fetch(self, filename, config, extract, stat = None):
+        """Fetch returns the cached dataframe for filename, extracting and storing it on a miss.
+
+        Args:
+            filename (str): series file
+            config: json-serialisable configuration section used by extract
+            extract (callable): extract(filename) -> pd.DataFrame
+            stat (tuple, optional): (size, mtime_ns) of filename when already known, e.g. from the
+                ExperimentIndex. Defaults to None (os.stat).
+
+        Returns:
+            [pd.DataFrame]: extracted data
+        """
+        key = self.Key(filename, config, stat)
+        frame = self.Get(key)
+        if frame is None:
+            frame = extract(filename)
+            self.Put(key, frame)
+        return frame
+
+    def Has(self, filename, config, stat = None):
+        """Has tells whether Fetch would find the data of filename in the cache, without loading it
+        """
+        return os.path.isfile(self.EntryPath(self.Key(filename, config, stat)))
+
+    def Key(self, filename, config, stat = None):
+        if stat is None:
+            stat = os.stat(filename)
+            stat = (stat.st_size, stat.st_mtime_ns)
+        fingerprint = json.dumps([self.FORMAT_VERSION, os.path.abspath(filename), *stat, config],
+                                 sort_keys=True, default=str)
+        return hashlib.sha1(fingerprint.encode('utf-8')).hexdigest()
+
+    def EntryPath(self, key):
+        return os.path.join(self.cache_dir, key+'.npz')
+
+    def Get(self, key):
+        path = self.EntryPath(key)
+        try:
+            with np.load(path, allow_pickle=False) as entry:
+                frame = self.FromArrays(entry)
+            os.utime(path) # mark as recently used
+        except (OSError, ValueError, KeyError):
+            return None
+        return frame
+
+    def Put(self, key, frame):
+        path = self.EntryPath(key)
+        # write to a temporary file first so concurrent workers never see a partial entry
+        handle, temp_path = tempfile.mkstemp(dir=self.cache_dir, suffix='.tmp')
+        try:
+            with os.fdopen(handle, 'wb') as temp_file:
+                np.savez(temp_file, **self.ToArrays(frame))
+            size = os.path.getsize(temp_path)
+            replaced = os.path.getsize(path) if os.path.isfile(path) else 0
+            os.replace(temp_path, path)
+        except OSError:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            return
+        self.total_bytes += size - replaced
+        if self.total_bytes > self.max_bytes:
+            self.Evict()
+
+    def Entries(self):
+        """Entries lists the stored entries
+
+        Returns:
+            [list]: (last use time, size in bytes, path) of every entry
+        """
+        entries = []
+        for entry in os.scandir(self.cache_dir):
+            if entry.name.endswith('.npz'):
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError: # removed by another worker
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+        return entries
+
+    def Evict(self):
+        """Evict removes the least recently used entries until the cache fits in EVICT_TO of max_bytes.
+            The folder is rescanned, so entries stored or removed by other workers are accounted for.
+        """
+        entries = self.Entries()
+        total = sum(size for _, size, _ in entries)
+        if total > self.max_bytes:
+            for _, size, path in sorted(entries):
+                if total <= self.max_bytes * self.EVICT_TO:
+                    break
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+                total -= size
+        self.total_bytes = total
+
+    def Clear(self):
+        for entry in os.scandir(self.cache_dir):
+            if entry.name.endswith('.npz'):
+                os.remove(entry.path)
+        self.total_bytes = 0
+
+    @staticmethod
+    def ToArrays(frame):
+        arrays = {'__columns__': np.asarray([str(column) for column in frame.columns], dtype=str)}
+        if not (isinstance(frame.index, pd.RangeIndex) and frame.index.start == 0 and frame.index.step == 1):
+            arrays['__index__'] = frame.index.values
+            arrays['__index_name__'] = np.asarray([frame.index.name or ''], dtype=str)
+        for position, column in enumerate(frame.columns):
+            arrays[f'c{position}'] = frame[column].values
+        return arrays
+
+    @staticmethod
+    def FromArrays(entry):
+        columns = list(entry['__columns__'])
+        if not columns:
+            return pd.DataFrame()
+        index = None
+        if '__index__' in entry.files:
+            index = pd.Index(entry['__index__'], name=str(entry['__index_name__'][0]) or None)
+        return pd.DataFrame({column: entry[f'c{position}'] for position, column in enumerate(columns)},
+                            index=index)
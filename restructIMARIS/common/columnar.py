@@ -0,0 +1,77 @@
+import os
+import shutil
+
+
+def _ImportArrow():
+    try:
+        import pyarrow
+        import pyarrow.dataset
+        import pyarrow.fs
+    except ImportError:
+        raise ImportError("The columnar format requires pyarrow: pip install pyarrow")
+    return pyarrow
+
+
+class ColumnarStore:
+    """ Saves dataframes as Parquet datasets partitioned by sample (one folder per sample label) and
+    loads them back reading only the requested columns and samples, with the files memory-mapped.
+
+    Unlike the pickles, replotting one feature does not deserialise the whole dataset.
+    """
+    PARTITION_COLUMN = 'Sample'
+
+    @classmethod
+    def Save(cls, dataframe, path):
+        """Save writes dataframe to the dataset folder path, replacing any previous content
+
+        Args:
+            dataframe (pd.DataFrame): data containing a 'Sample' column
+            path (str): dataset folder (e.g. cells_data_20191030.parquet)
+        """
+        pa = _ImportArrow()
+        if os.path.isdir(path):
+            shutil.rmtree(path)
+        table = pa.Table.from_pandas(dataframe, preserve_index=True)
+        pa.dataset.write_dataset(table, path, format='parquet',
+                                 partitioning=[cls.PARTITION_COLUMN], partitioning_flavor='hive')
+
+    @classmethod
+    def Dataset(cls, path):
+        pa = _ImportArrow()
+        partitioning = pa.dataset.HivePartitioning.discover(infer_dictionary=True) # 'Sample' read back as categorical
+        return pa.dataset.dataset(path, format='parquet', partitioning=partitioning,
+                                  filesystem=pa.fs.LocalFileSystem(use_mmap=True))
+
+    @classmethod
+    def Load(cls, path, columns = None, samples = None):
+        """Load reads a dataset written by Save
+
+        Args:
+            path (str): dataset folder
+            columns ([list], optional): feature columns to read; the 'Sample' column is always included.
+                Defaults to None (all the columns, with the original index).
+            samples ([list], optional): sample labels to read. Defaults to None (all the samples).
+
+        Returns:
+            [pd.DataFrame]: requested data
+        """
+        pa = _ImportArrow()
+        dataset = cls.Dataset(path)
+        if columns is not None:
+            columns = [cls.PARTITION_COLUMN] + [column for column in columns if column != cls.PARTITION_COLUMN]
+        row_filter = None
+        if samples is not None:
+            row_filter = pa.dataset.field(cls.PARTITION_COLUMN).isin(list(samples))
+        return dataset.to_table(columns=columns, filter=row_filter).to_pandas()
+
+    @classmethod
+    def NumericColumns(cls, path):
+        """NumericColumns lists the numeric feature columns of a dataset without reading any data
+        """
+        pa = _ImportArrow()
+        schema = cls.Dataset(path).schema
+        index_columns = [column for column in (schema.pandas_metadata or {}).get('index_columns', [])
+                         if isinstance(column, str)]
+        return [field.name for field in schema
+                if (pa.types.is_integer(field.type) or pa.types.is_floating(field.type))
+                and field.name not in index_columns]
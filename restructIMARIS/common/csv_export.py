@@ -0,0 +1,201 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import pandas as pd
+
+
+class CsvExportReader:
+    """ Reads a series exported by IMARIS as CSV files: a folder (e.g. "Series10_cells") holding one
+    "[object]_[statistic].csv" file per statistic, named as the sheets of the .xls export with the
+    spaces replaced by '_' ("Series10_cells_Cell_Intensity_Mean_Ch=2_Img=1.csv", "..._Overall.csv").
+
+    It has the interface of WorkbookReader, each file being a sheet: a title block (a blank line and a
+    '=====' line in the IMARIS exports) standing for the title row of the .xls sheet, a header line, then
+    one line per object. The skiprows of the plan count the rows of the .xls sheet, so they are taken
+    from the line before the header. Only the requested columns of each file are parsed (pandas C
+    parser, usecols) and the files of a plan are read concurrently on a pool of threads.
+    """
+    EXTENSION = '.csv'
+    SHEET_NAME_LENGTH = 31 # sheet names of the .xls configurations may be cut
+    THREADS = None # threads reading the files of a plan, None: one per core
+    PREAMBLE_LINES = 32 # lines searched for the header
+
+    def __init__(self, folder):
+        self.filename = folder
+        self.sheets_parsed = 0
+        self.files = None # sheet name -> csv path
+
+    def __enter__(self):
+        self.Open()
+        return self
+
+    def __exit__(self, *args):
+        self.Close()
+
+    def Open(self):
+        if self.files is not None:
+            return
+        with os.scandir(self.filename) as entries:
+            stems = sorted(entry.name[:-len(self.EXTENSION)] for entry in entries
+                           if entry.name.lower().endswith(self.EXTENSION) and entry.is_file())
+        prefix = os.path.basename(os.path.normpath(self.filename)) + '_' # the object name
+        if not all(stem.startswith(prefix) for stem in stems):
+            prefix = os.path.commonprefix(stems) if len(stems) > 1 else ''
+            prefix = prefix[:prefix.rfind('_')+1]
+        self.files = {stem[len(prefix):].replace('_', ' '): os.path.join(self.filename, stem+self.EXTENSION)
+                      for stem in stems}
+
+    def Close(self):
+        return
+
+    def SheetNames(self):
+        self.Open()
+        return list(self.files)
+
+    @staticmethod
+    def Normalize(name):
+        return ' '.join(name.replace('_', ' ').split()).lower()
+
+    def SheetFile(self, sheet):
+        """SheetFile returns the csv file of a sheet, matched ignoring the case and '_' for spaces, else the shortest
+            file name ending with the sheet name, else, for the sheet names cut to 31 characters, the only file
+            name starting with it
+        """
+        self.Open()
+        if sheet in self.files:
+            return self.files[sheet]
+        names = {self.Normalize(name): path for name, path in self.files.items()}
+        key = self.Normalize(sheet)
+        if key in names:
+            return names[key]
+        # the object name could not be told from the file names: the shortest file name ending with the sheet name
+        stems = {self.Normalize(os.path.basename(path)[:-len(self.EXTENSION)]): path for path in self.files.values()}
+        matches = sorted((len(stem), path) for stem, path in stems.items() if stem.endswith(' '+key))
+        if matches:
+            return matches[0][1]
+        if len(sheet) == self.SHEET_NAME_LENGTH:
+            matches = [path for name, path in names.items() if name.startswith(key)]
+            if len(matches) == 1:
+                return matches[0]
+        raise ValueError(f"Worksheet named '{sheet}' not found in {self.filename}")
+
+    @classmethod
+    def HeaderLine(cls, filename, skiprows = 1, names = ()):
+        """HeaderLine locates the line standing for row skiprows of the .xls sheet, the title block (ending with a
+            line of '=' in the IMARIS exports, else the first line) being its row 0. When that line does not hold
+            every name in names, the header is the next line which does, else the first one.
+
+        Args:
+            filename (str): csv file
+            skiprows (int, optional): row of the header in the .xls sheet. Defaults to 1.
+            names (iterable, optional): column names the header must hold. Defaults to ().
+
+        Returns:
+            [tuple]: (position of the line, its fields)
+        """
+        names = set(names)
+        with open(filename, newline='', encoding='utf-8', errors='replace') as csv_file:
+            lines = [line.rstrip('\r\n') for _, line in zip(range(cls.PREAMBLE_LINES), csv_file)]
+        separators = [position for position, line in enumerate(lines) if line.strip() and not line.strip().strip('=')]
+        position = (separators[0] if separators else 0) + skiprows
+        header = [name.strip() for name in lines[position].split(',')] if position < len(lines) else []
+        if names.issubset(header):
+            return position, header
+        for position in [*range(position + 1, len(lines)), *range(min(position, len(lines)))]:
+            header = [name.strip() for name in lines[position].split(',')]
+            if names.issubset(header):
+                return position, header
+        found = {name.strip() for line in lines for name in line.split(',')}
+        missing = sorted(names - found) or sorted(names) # else not on the same line
+        raise KeyError(f"Column '{missing[0]}' not found in the header")
+
+    def CountRows(self, sheet):
+        """CountRows returns the number of rows the sheet has in the .xls export (title and header rows included),
+            counting the non-empty lines after the header without parsing them
+
+        Returns:
+            [int]: number of rows
+        """
+        filename = self.SheetFile(sheet)
+        skip, _ = self.HeaderLine(filename)
+        rows = 0
+        with open(filename, 'rb') as csv_file:
+            for position, line in enumerate(csv_file):
+                if position > skip and line.strip():
+                    rows += 1
+        self.sheets_parsed += 1
+        return rows + 2
+
+    def ReadSheetColumns(self, sheet, columns):
+        """ReadSheetColumns parses the requested columns of a sheet's file
+
+        Args:
+            sheet (str): sheet name
+            columns (dict): column (name looked up in the header, or position) -> number of skipped rows of the .xls sheet
+
+        Returns:
+            [dict]: column -> np.ndarray
+        """
+        filename = self.SheetFile(sheet)
+        starts = {} # first data line -> {column: position}
+        for skiprows in set(columns.values()):
+            names = [column for column, rows in columns.items() if rows == skiprows and isinstance(column, str)]
+            try:
+                position, header = self.HeaderLine(filename, skiprows, names)
+            except KeyError as error:
+                raise KeyError(f"{error.args[0]} of sheet '{sheet}' of {self.filename}") from None
+            for column, rows in columns.items():
+                if rows != skiprows:
+                    continue
+                if isinstance(column, str): # data right after the header
+                    starts.setdefault(position + 1, {})[column] = header.index(column)
+                else: # data right after the skipped rows
+                    starts.setdefault(position, {})[column] = column
+        data = {}
+        for start, positions in starts.items():
+            frame = pd.read_csv(filename, skiprows=start, header=None, usecols=sorted(set(positions.values())),
+                                skip_blank_lines=True, encoding='utf-8', encoding_errors='replace')
+            for column, position in positions.items():
+                data[column] = self.ToArray(frame[position].to_numpy() if position in frame.columns
+                                            else np.full(len(frame), np.nan))
+        return data
+
+    def Read(self, plan):
+        """Read loads every (sheet, column) of the plan, the files being parsed concurrently
+
+        Args:
+            plan (WorkbookPlan): sheets and columns to load
+
+        Returns:
+            [dict]: (sheet, column) -> np.ndarray
+        """
+        self.Open()
+        for sheet in plan.sheets:
+            self.SheetFile(sheet) # fails before parsing anything
+        sheets = list(plan.sheets.items())
+        threads = min(len(sheets), self.THREADS or os.cpu_count() or 1)
+        if threads > 1:
+            with ThreadPoolExecutor(max_workers=threads) as executor:
+                results = list(executor.map(lambda item: self.ReadSheetColumns(*item), sheets))
+        else:
+            results = [self.ReadSheetColumns(sheet, columns) for sheet, columns in sheets]
+        data = {}
+        for (sheet, _), columns in zip(sheets, results):
+            for column, values in columns.items():
+                data[(sheet, column)] = values
+        self.sheets_parsed += len(sheets)
+        return data
+
+    @staticmethod
+    def ToArray(values):
+        """ToArray types the values as WorkbookReader does: int64 when every value is integral, float64 for numbers
+            (empty cells become NaN), object otherwise
+        """
+        if values.dtype.kind in 'iub':
+            return values.astype(np.int64)
+        if values.dtype.kind == 'f':
+            values = values.astype(np.float64)
+            if values.size and not np.isnan(values).any() and np.array_equal(values, np.floor(values)):
+                return values.astype(np.int64)
+            return values
+        return values.astype(object)
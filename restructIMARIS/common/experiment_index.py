@@ -0,0 +1,130 @@
+import os
+from collections import namedtuple
+
+SeriesFile = namedtuple('SeriesFile', ['path', 'size', 'mtime_ns'])
+
+
+class ExperimentIndex:
+    """ Lists an experiment folder in a single pass: one os.scandir of the root and one per sample
+    folder, keeping the size and modification time of every series file, so the processors never
+    probe the file system again to find a series file or to fingerprint it.
+
+    Series files are indexed by sample, serie (the file name up to the first '_') and role, matched
+    case-insensitively: "Series10_cells.xls"/"Series10_Cells.xls" -> 'cells',
+    "Series10_spots.xls" -> 'spots', any other "Series10*.xls" -> 'dendrite'.
+    A native "Series10.ims" file holds the statistics of all the objects of the serie: it stands for any
+    role the serie has no .xls export for (see common.ims). A folder of CSV files ("Series10_cells/"...)
+    is a CSV export, with the role of its name (see common.csv_export): its size is the total size of
+    its files and its modification time the latest one, so rewriting any of them is noticed.
+    """
+    ROLES = ('spots', 'cells') # looked for in the lowercase file name, any other .xls is a 'dendrite' file
+    DEFAULT_ROLE = 'dendrite'
+    NATIVE_ROLE = 'ims'
+    EXTENSIONS = {'.xls': None, '.ims': NATIVE_ROLE} # extension -> role, None: from the file name
+
+    def __init__(self, directory, include_sample = None):
+        """
+        Args:
+            directory (str): experiment folder, containing one sub-folder per sample
+            include_sample (callable, optional): include_sample(folder name) -> bool, selects the sample
+                folders. Defaults to None (every folder).
+        """
+        self.directory = directory
+        self.include_sample = include_sample
+        self.entries = 0
+        self.samples = {} # sample -> serie -> role -> SeriesFile
+        self.Scan()
+
+    @classmethod
+    def Role(cls, stem):
+        stem = stem.lower()
+        for role in cls.ROLES:
+            if role in stem:
+                return role
+        return cls.DEFAULT_ROLE
+
+    def Scan(self):
+        self.samples = {}
+        with os.scandir(self.directory) as entries:
+            entries = sorted(entries, key=lambda entry: entry.name)
+        self.entries = len(entries)
+        for entry in entries:
+            if entry.is_dir() and (self.include_sample is None or self.include_sample(entry.name)):
+                self.samples[entry.name] = self.ScanSample(entry.path)
+        return self
+
+    def ScanSample(self, path):
+        series = {}
+        with os.scandir(path) as entries:
+            # sorted, so "Series10_Cells.xls" is preferred to "Series10_cells.xls" as before
+            for entry in sorted(entries, key=lambda entry: entry.name):
+                stem, extension = os.path.splitext(entry.name)
+                if entry.is_dir() and not entry.name.startswith('.'):
+                    source = self.ScanExport(entry.path)
+                    stem, role = entry.name, self.Role(entry.name)
+                elif extension.lower() in self.EXTENSIONS and entry.is_file():
+                    stat = entry.stat()
+                    source = SeriesFile(entry.path, stat.st_size, stat.st_mtime_ns)
+                    role = self.EXTENSIONS[extension.lower()] or self.Role(stem)
+                else:
+                    continue
+                if source is not None:
+                    series.setdefault(stem.split('_')[0], {}).setdefault(role, source)
+        return series
+
+    @staticmethod
+    def ScanExport(path):
+        """ScanExport returns the SeriesFile of a CSV export folder, None if it holds no CSV file
+        """
+        size, mtime_ns, found = 0, os.stat(path).st_mtime_ns, False # the folder changes when a file is removed
+        with os.scandir(path) as entries:
+            for entry in entries:
+                if entry.name.lower().endswith('.csv') and entry.is_file():
+                    stat = entry.stat()
+                    size, mtime_ns, found = size + stat.st_size, max(mtime_ns, stat.st_mtime_ns), True
+        return SeriesFile(path, size, mtime_ns) if found else None
+
+    def Samples(self):
+        """Samples returns the sample folder names, sorted
+        """
+        return sorted(self.samples)
+
+    def Series(self, sample, roles = ()):
+        """Series returns the series of a sample, sorted
+
+        Args:
+            roles (list, optional): only the series having a file of each of these roles. Defaults to () (all).
+        """
+        return sorted(serie for serie, files in self.samples.get(sample, {}).items()
+                      if all(self.Has(files, role) for role in roles))
+
+    @classmethod
+    def Has(cls, files, role):
+        return role in files or cls.NATIVE_ROLE in files
+
+    def File(self, sample, serie, role):
+        """File returns the SeriesFile (path, size, mtime_ns) of a serie: its .xls file of this role, else its .ims
+            file, None if it has neither
+        """
+        files = self.samples.get(sample, {}).get(serie, {})
+        return files.get(role, files.get(self.NATIVE_ROLE))
+
+    def Incomplete(self, roles):
+        """Incomplete lists the series missing some of the files of the given roles
+
+        Returns:
+            [list]: (sample, serie, missing roles) tuples
+        """
+        incomplete = []
+        for sample in self.Samples():
+            for serie in self.Series(sample):
+                missing = [role for role in roles if not self.Has(self.samples[sample][serie], role)]
+                if missing:
+                    incomplete.append((sample, serie, missing))
+        return incomplete
+
+    def ReportIncomplete(self, roles):
+        incomplete = self.Incomplete(roles)
+        for sample, serie, missing in incomplete:
+            print(f"Warning: {sample}/{serie} has no {' or '.join(missing)} file, skipped.")
+        return incomplete
@@ -0,0 +1,229 @@
+import numpy as np
+
+
+def _ImportH5py():
+    try:
+        import h5py
+    except ImportError:
+        raise ImportError("Reading .ims files requires h5py: pip install h5py")
+    return h5py
+
+
+class ImsReader:
+    """ Reads the statistics stored by IMARIS in its native .ims (HDF5) files, presented as the sheets of
+    the .xls export so the WorkbookPlans of the processors apply unchanged (same interface as
+    WorkbookReader):
+    - every statistic of the objects (cells, spots, filaments...) is a sheet named as in the export,
+      the statistic name followed by its factors (e.g. "Cell Intensity Mean Ch=2 Img=1"), cut to the
+      31 characters of a sheet name. Its values, one per object sorted by object ID, are the column
+      named after the statistic (or column 0), the object IDs are the 'ID' column.
+    - the statistics of the objects as a whole are the rows of the 'Overall' sheet, with the
+      'Variable' (0) and 'Value' (1) columns.
+
+    Each object group of the scene (Scene8/Content/Cells0, Points0...) holds a StatisticsType table
+    (ID, ID_Category, ID_FactorList, Name), a Factor table (ID_List, Name, Level), a Category table
+    (ID, CategoryName, Name) and the StatisticsValue table (ID_Time, ID_Object, ID_StatisticsType, Value)
+    with the values of all its statistics. Only the fields needed are read from StatisticsValue,
+    BLOCK_ROWS rows at a time, keeping only the rows of the requested statistics.
+    """
+    CONTENT = ('Scene8/Content', 'Scene/Content')
+    OVERALL_SHEET = 'Overall'
+    OVERALL_CATEGORY = 'Overall'
+    SHEET_NAME_LENGTH = 31
+    FACTOR_PREFIXES = {'Channel': 'Ch=', 'Image': 'Img='} # other factors (e.g. vesicle type) appear as their level
+    BLOCK_ROWS = 1 << 20
+
+    def __init__(self, filename):
+        self.filename = filename
+        self.file = None
+        self.sheets_parsed = 0
+        self.statistics = None # sheet name (full and cut) -> (object group, statistic type ID, statistic name)
+        self.overall = None # [(object group, statistic type ID, variable name)]
+
+    def __enter__(self):
+        self.Open()
+        return self
+
+    def __exit__(self, *args):
+        self.Close()
+
+    def Open(self):
+        if self.file is not None:
+            return
+        h5py = _ImportH5py()
+        self.file = h5py.File(self.filename, 'r')
+        if self.statistics is None:
+            self.Index()
+
+    def Close(self):
+        if self.file is None:
+            return
+        self.file.close()
+        self.file = None
+
+    @staticmethod
+    def Text(value):
+        return value.decode('utf-8', 'replace').rstrip('\x00') if isinstance(value, bytes) else str(value)
+
+    @classmethod
+    def SheetName(cls, name, factors):
+        """SheetName names a statistic as the .xls export: its name followed by its factors
+
+        Args:
+            name (str): statistic name (e.g. "Cell Intensity Mean")
+            factors (list): (factor name, level) pairs (e.g. [('Channel', '2'), ('Image', '1')])
+        """
+        levels = [cls.FACTOR_PREFIXES.get(factor, '') + level for factor, level in factors if factor != 'Time' and level]
+        return ' '.join([name] + levels)
+
+    def ObjectGroups(self):
+        for path in self.CONTENT:
+            if path in self.file:
+                content = self.file[path]
+                return [content[name] for name in sorted(content) if 'StatisticsValue' in content[name]]
+        return []
+
+    def Index(self):
+        """Index lists the statistics of every object group from their (small) type, factor and category tables
+        """
+        self.statistics, self.overall = {}, []
+        for group in self.ObjectGroups():
+            factors = {}
+            if 'Factor' in group:
+                for row in group['Factor'][()]:
+                    factors.setdefault(int(row['ID_List']), []).append((self.Text(row['Name']), self.Text(row['Level'])))
+            overall_categories = set()
+            if 'Category' in group:
+                overall_categories = set(int(row['ID']) for row in group['Category'][()]
+                                         if self.Text(row['CategoryName']) == self.OVERALL_CATEGORY)
+            for row in group['StatisticsType'][()]:
+                name = self.Text(row['Name'])
+                sheet = self.SheetName(name, factors.get(int(row['ID_FactorList']), []))
+                if int(row['ID_Category']) in overall_categories:
+                    self.overall.append((group, int(row['ID']), sheet))
+                    continue
+                for key in [sheet, sheet[:self.SHEET_NAME_LENGTH]]: # the first object group wins
+                    self.statistics.setdefault(key, (group, int(row['ID']), name))
+
+    def SheetNames(self):
+        self.Open()
+        names = list(dict.fromkeys(sheet[:self.SHEET_NAME_LENGTH] for sheet in self.statistics))
+        return ([self.OVERALL_SHEET] if self.overall else []) + names
+
+    def CheckSheet(self, sheet):
+        if sheet not in self.statistics and not (sheet == self.OVERALL_SHEET and self.overall):
+            raise ValueError(f"Worksheet named '{sheet}' not found in {self.filename}")
+
+    def CountRows(self, sheet):
+        """CountRows returns the number of rows the sheet has in the .xls export (title and header rows included),
+            reading only the statistic type of the values
+
+        Returns:
+            [int]: number of rows
+        """
+        self.Open()
+        self.CheckSheet(sheet)
+        if sheet == self.OVERALL_SHEET:
+            return len(self.overall) + 2
+        group, type_id, _ = self.statistics[sheet]
+        dataset = group['StatisticsValue']
+        rows = 0
+        for start in range(0, dataset.shape[0], self.BLOCK_ROWS):
+            rows += int(np.count_nonzero(dataset.fields('ID_StatisticsType')[start:start+self.BLOCK_ROWS] == type_id))
+        self.sheets_parsed += 1
+        return rows + 2
+
+    def ReadValues(self, group, type_ids, overall = False):
+        """ReadValues reads the values of some statistics of an object group, BLOCK_ROWS rows at a time
+
+        Args:
+            overall (bool, optional): only the values of the objects as a whole (ID_Object -1). Defaults to False.
+
+        Returns:
+            [dict]: statistic type ID -> (object IDs, values), sorted by object ID
+        """
+        dataset = group['StatisticsValue']
+        wanted = np.array(sorted(type_ids), dtype=np.int64)
+        parts = {type_id: [] for type_id in type_ids}
+        for start in range(0, dataset.shape[0], self.BLOCK_ROWS):
+            types = dataset.fields('ID_StatisticsType')[start:start+self.BLOCK_ROWS]
+            selected = np.isin(types, wanted)
+            if not selected.any():
+                continue
+            objects = dataset.fields('ID_Object')[start:start+self.BLOCK_ROWS][selected]
+            values = dataset.fields('Value')[start:start+self.BLOCK_ROWS][selected]
+            types = types[selected]
+            for type_id in type_ids:
+                rows = (types == type_id) & ((objects < 0) if overall else (objects >= 0))
+                parts[type_id].append((objects[rows], values[rows]))
+        result = {}
+        for type_id, blocks in parts.items():
+            objects = np.concatenate([objects for objects, _ in blocks]) if blocks else np.empty(0, dtype=np.int64)
+            values = np.concatenate([values for _, values in blocks]) if blocks else np.empty(0)
+            order = np.argsort(objects, kind='stable')
+            result[type_id] = (objects[order].astype(np.int64), self.ToArray(values[order]))
+        return result
+
+    def Read(self, plan):
+        """Read loads every (sheet, column) of the plan, the statistics of an object group in one pass over its values
+
+        Args:
+            plan (WorkbookPlan): sheets and columns to load
+
+        Returns:
+            [dict]: (sheet, column) -> np.ndarray
+        """
+        self.Open()
+        requested = {} # object group name -> (group, {statistic type IDs})
+        for sheet in plan.sheets:
+            self.CheckSheet(sheet)
+            if sheet == self.OVERALL_SHEET:
+                continue
+            group, type_id, _ = self.statistics[sheet]
+            requested.setdefault(group.name, (group, set()))[1].add(type_id)
+        values = {}
+        for group_name, (group, type_ids) in requested.items():
+            for type_id, result in self.ReadValues(group, type_ids).items():
+                values[(group_name, type_id)] = result
+
+        data = {}
+        for sheet, columns in plan.sheets.items():
+            if sheet == self.OVERALL_SHEET:
+                variables, overall_values = self.ReadOverall()
+                sheet_columns = {'Variable': variables, 0: variables, 'Value': overall_values, 1: overall_values}
+            else:
+                group, type_id, name = self.statistics[sheet]
+                objects, sheet_values = values[(group.name, type_id)]
+                sheet_columns = {name: sheet_values, 0: sheet_values, 'ID': objects}
+            for column in columns:
+                if column not in sheet_columns:
+                    raise KeyError(f"Column '{column}' not found in sheet '{sheet}' of {self.filename}")
+                data[(sheet, column)] = sheet_columns[column]
+            self.sheets_parsed += 1
+        return data
+
+    def ReadOverall(self):
+        """ReadOverall returns the names (object array) and values of the statistics of the objects as a whole
+        """
+        groups = {}
+        for group, type_id, _ in self.overall:
+            groups.setdefault(group.name, (group, []))[1].append(type_id)
+        values = {}
+        for group_name, (group, type_ids) in groups.items():
+            for type_id, (_, type_values) in self.ReadValues(group, type_ids, overall=True).items():
+                values[(group_name, type_id)] = type_values
+        variables, overall_values = [], []
+        for group, type_id, variable in self.overall:
+            for value in values[(group.name, type_id)][:1]: # a single time point, as the export
+                variables.append(variable)
+                overall_values.append(value)
+        return np.asarray(variables, dtype=object), self.ToArray(np.asarray(overall_values, dtype=np.float64))
+
+    @staticmethod
+    def ToArray(values):
+        """ToArray types the values as WorkbookReader does: int64 when every value is integral, float64 otherwise
+        """
+        values = np.asarray(values, dtype=np.float64)
+        if values.size and np.isfinite(values).all() and np.array_equal(values, np.floor(values)):
+            return values.astype(np.int64)
+        return values
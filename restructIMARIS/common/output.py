@@ -0,0 +1,211 @@
+import os
+import math
+import queue
+import threading
+import pandas as pd
+from .tracing import Tracer
+
+XLSX_MAX_ROWS = 1048576
+XLSX_MAX_COLS = 16384
+
+
+def _ImportXlsxWriter():
+    try:
+        import xlsxwriter
+    except ImportError:
+        raise ImportError("The constant-memory xlsx output requires xlsxwriter: pip install xlsxwriter")
+    return xlsxwriter
+
+
+class StreamingExcelWriter:
+    """ Writes dataframes to an .xlsx file with xlsxwriter in constant_memory mode: each row is flushed
+    to disk as soon as the next one is started, so memory does not grow with the size of the sheets.
+
+    DataFrame.to_excel hands the cells over column by column, which constant_memory mode cannot take,
+    so the sheets are written row by row here, with the same cells as to_excel (header and index
+    in bold, NaN as empty cells, infinities as 'inf'/'-inf'). Merged header cells are not merged, their
+    value is written in the first cell.
+    """
+    HEADER_FORMAT = {'bold': True, 'border': 1, 'align': 'center', 'valign': 'top'} # as pandas
+
+    def __init__(self, filename):
+        xlsxwriter = _ImportXlsxWriter()
+        self.filename = filename
+        self.book = xlsxwriter.Workbook(filename, {'constant_memory': True, 'strings_to_urls': False})
+        self.header_format = self.book.add_format(self.HEADER_FORMAT)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.Close()
+
+    def Close(self):
+        self.book.close()
+
+    @staticmethod
+    def Cell(value):
+        if isinstance(value, float):
+            if math.isnan(value):
+                return None
+            if math.isinf(value):
+                return 'inf' if value > 0 else '-inf'
+        return value
+
+    def WriteSheet(self, sheet_name, dataframe):
+        """WriteSheet writes dataframe (with its index) to a new sheet, as dataframe.to_excel(writer, sheet_name)
+        """
+        rows, columns = dataframe.shape[0] + dataframe.columns.nlevels, dataframe.shape[1] + dataframe.index.nlevels
+        if rows > XLSX_MAX_ROWS or columns > XLSX_MAX_COLS:
+            raise ValueError(f"This sheet is too large! Your sheet size is: {rows}, {columns} "
+                             f"Max sheet size is: {XLSX_MAX_ROWS}, {XLSX_MAX_COLS}")
+        worksheet = self.book.add_worksheet(sheet_name)
+        if isinstance(dataframe.columns, pd.MultiIndex) or isinstance(dataframe.index, pd.MultiIndex):
+            self.WriteFormattedCells(worksheet, dataframe)
+            return
+        if dataframe.index.name is not None:
+            worksheet.write(0, 0, dataframe.index.name, self.header_format)
+        for position, name in enumerate(dataframe.columns, start=1):
+            worksheet.write(0, position, self.Cell(name), self.header_format)
+        cell = self.Cell
+        values = [dataframe[name].tolist() for name in dataframe.columns] if dataframe.columns.is_unique \
+            else [dataframe.iloc[:, position].tolist() for position in range(dataframe.shape[1])]
+        for row, (index, *cells) in enumerate(zip(dataframe.index.tolist(), *values), start=1):
+            worksheet.write(row, 0, cell(index), self.header_format)
+            worksheet.write_row(row, 1, [cell(value) for value in cells])
+
+    def WriteFormattedCells(self, worksheet, dataframe):
+        """WriteFormattedCells writes the cells of a dataframe with a MultiIndex (e.g. describe()
+            statistics) as laid out by pandas, sorted by row
+        """
+        from pandas.io.formats.excel import ExcelFormatter
+        cells = sorted(ExcelFormatter(dataframe, merge_cells=True).get_formatted_cells(), key=lambda cell: (cell.row, cell.col))
+        for cell in cells:
+            value = None if isinstance(cell.val, str) and cell.val == '' else self.Cell(cell.val)
+            worksheet.write(cell.row, cell.col, value, self.header_format if cell.style else None)
+
+
+class OutputWriter:
+    """ Writes the per-sample outputs: every sheet of a sample goes to [base].xlsx and, for machine
+    consumers, to [base]_[sheet].csv and/or [base]_[sheet].parquet files.
+
+    With background=True, the files are written by a thread fed through a bounded queue, so writing
+    sample N overlaps with the parsing of sample N+1 while at most queue_size samples wait in memory.
+    Errors of the thread are raised by the next Write or by Flush, which has to be called once all
+    the samples were submitted.
+    """
+    FORMATS = ('xlsx', 'csv', 'parquet')
+
+    def __init__(self, formats = ('xlsx',), constant_memory = False, background = False, queue_size = 2, tracer = None):
+        """
+        Args:
+            formats (list, optional): any of 'xlsx', 'csv' and 'parquet' (requires pyarrow). Defaults to ('xlsx',).
+            constant_memory (bool, optional): write the xlsx files row by row with StreamingExcelWriter
+                (requires xlsxwriter) instead of pd.ExcelWriter. Defaults to False.
+            background (bool, optional): write on a background thread. Defaults to False.
+            queue_size (int, optional): number of samples waiting to be written before Write blocks. Defaults to 2.
+            tracer (Tracer, optional): records a 'write' span per file. Defaults to None.
+        """
+        unknown = set(formats) - set(self.FORMATS)
+        if unknown:
+            raise ValueError(f"Unknown output format(s) {sorted(unknown)}, expected some of {self.FORMATS}")
+        self.formats = list(formats)
+        self.constant_memory = constant_memory
+        self.background = background
+        self.queue_size = max(1, queue_size)
+        self.tracer = tracer or Tracer()
+        self.queue = None
+        self.thread = None
+        self.error = None
+
+    def __getstate__(self):
+        # the processors are sent to the worker processes, which never write: the thread stays here
+        state = self.__dict__.copy()
+        state.update(queue=None, thread=None, error=None)
+        return state
+
+    def Write(self, base, sheets):
+        """Write saves the sheets of a sample
+
+        Args:
+            base (str): output path without extension (e.g. [directory]/SampleA)
+            sheets (dict): sheet name -> pd.DataFrame, not modified afterwards
+        """
+        if not self.background:
+            return self.WriteFiles(base, sheets)
+        if self.error is not None:
+            self.Flush() # stops the thread and raises its error
+        if self.thread is None:
+            self.queue = queue.Queue(maxsize=self.queue_size)
+            self.thread = threading.Thread(target=self.Consume, name='OutputWriter', daemon=True)
+            self.thread.start()
+        self.queue.put((base, sheets))
+
+    def Consume(self):
+        while True:
+            job = self.queue.get()
+            if job is None:
+                return
+            if self.error is None: # after an error, the remaining samples are dropped
+                try:
+                    self.WriteFiles(*job)
+                except Exception as exception:
+                    self.error = exception
+
+    def Flush(self):
+        """Flush waits until every submitted sample is written and raises the error of the thread, if any
+        """
+        if self.thread is not None:
+            self.queue.put(None)
+            self.thread.join()
+            self.queue, self.thread = None, None
+        self.RaiseError()
+
+    def RaiseError(self):
+        if self.error is not None:
+            error, self.error = self.error, None
+            raise Exception(f"Could not write the outputs: {error}") from error
+
+    def WriteFiles(self, base, sheets):
+        for output in self.formats:
+            with self.tracer.Span('write', output=output, file=base):
+                if output == 'xlsx':
+                    self.WriteExcel(base+'.xlsx', sheets)
+                elif output == 'csv':
+                    for sheet_name, dataframe in sheets.items():
+                        dataframe.to_csv(f'{base}_{sheet_name}.csv')
+                else:
+                    for sheet_name, dataframe in sheets.items():
+                        dataframe.to_parquet(f'{base}_{sheet_name}.parquet')
+
+    def Files(self, base, sheet_names):
+        """Files returns the files written by Write for a sample, in the formats of the writer
+        """
+        files = []
+        for output in self.formats:
+            if output == 'xlsx':
+                files.append(base+'.xlsx')
+            else:
+                files += [f'{base}_{sheet_name}.{output}' for sheet_name in sheet_names]
+        return files
+
+    def Remove(self, base, sheet_names):
+        """Remove deletes the files of a sample written by Write, e.g. once its series were removed
+
+        Returns:
+            [list]: deleted files
+        """
+        removed = [filename for filename in self.Files(base, sheet_names) if os.path.isfile(filename)]
+        for filename in removed:
+            os.remove(filename)
+        return removed
+
+    def WriteExcel(self, filename, sheets):
+        if self.constant_memory:
+            with StreamingExcelWriter(filename) as writer:
+                for sheet_name, dataframe in sheets.items():
+                    writer.WriteSheet(sheet_name, dataframe)
+            return
+        with pd.ExcelWriter(filename, mode='w') as writer:
+            for sheet_name, dataframe in sheets.items():
+                dataframe.to_excel(writer, sheet_name=sheet_name, header=True)
@@ -0,0 +1,61 @@
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+
+class SeriesPool:
+    """ Runs a per-series extraction function over a list of jobs, either one after
+    another or fanned out across a pool of worker processes.
+
+    Results are always returned in the order of the jobs, so merging them afterwards
+    gives exactly the same dataframes as a serial run.
+    """
+
+    def __init__(self, workers=None):
+        """
+        Args:
+            workers (int, optional): number of worker processes. Defaults to the number of cores.
+                1 runs the jobs serially in the current process.
+        """
+        if workers is None:
+            workers = os.cpu_count() or 1
+        self.workers = max(1, int(workers))
+
+    def Map(self, func, jobs):
+        """Map calls func(*job) for every job.
+
+        Args:
+            func (callable): picklable function (e.g. a processor's bound method)
+            jobs ([list]): list of argument tuples
+
+        Returns:
+            [list]: results, in the same order as jobs
+        """
+        jobs = list(jobs)
+        if self.workers == 1 or len(jobs) < 2:
+            return [func(*job) for job in jobs]
+
+        workers = min(self.workers, len(jobs))
+        chunksize = max(1, len(jobs) // (workers * 4))
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            return list(executor.map(func, *zip(*jobs), chunksize=chunksize))
+
+    def IMap(self, func, jobs):
+        """IMap is the lazy version of Map: results are yielded one at a time, in the order of the jobs,
+            and at most two jobs per worker are in flight, so memory stays bounded by a few series.
+        """
+        jobs = list(jobs)
+        if self.workers == 1 or len(jobs) < 2:
+            for job in jobs:
+                yield func(*job)
+            return
+
+        window = 2*self.workers
+        with ProcessPoolExecutor(max_workers=min(self.workers, len(jobs))) as executor:
+            pending = deque()
+            for job in jobs:
+                pending.append(executor.submit(func, *job))
+                if len(pending) >= window:
+                    yield pending.popleft().result()
+            while pending:
+                yield pending.popleft().result()
@@ -0,0 +1,247 @@
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+
+# state of each plotting worker process, set once by _InitWorker
+_worker_processor = None
+_worker_dataframe = None
+_worker_options = {}
+
+
+def UseHeadlessBackend():
+    """UseHeadlessBackend makes matplotlib render to files only (Agg), without opening any window
+    """
+    import matplotlib
+    matplotlib.use('Agg', force=True)
+    import matplotlib.pyplot as plt
+    plt.switch_backend('Agg')
+
+
+def _InitWorker(processor, dataframe, options):
+    global _worker_processor, _worker_dataframe, _worker_options
+    UseHeadlessBackend()
+    _worker_processor = processor
+    _worker_dataframe = dataframe
+    _worker_options = options
+
+
+def _RenderFeature(feature):
+    start = time.perf_counter()
+    _worker_processor.GenerateBoxPlot(_worker_dataframe, feature, visualize=False, **_worker_options)
+    return time.perf_counter() - start
+
+
+class BoxPlotRenderer:
+    """ Saves the box plots of several features at once, forcing the non-interactive Agg backend
+    (no display needed) and spreading the features over a pool of worker processes.
+
+    The dataframe is handed to each worker once, when the pool starts, rather than with every plot.
+    """
+
+    def __init__(self, workers = None):
+        """
+        Args:
+            workers (int, optional): number of worker processes. Defaults to the number of cores.
+                1 renders the plots in the current process.
+        """
+        if workers is None:
+            workers = os.cpu_count() or 1
+        self.workers = max(1, int(workers))
+
+    def Render(self, processor, dataframe, features, **options):
+        """Render calls processor.GenerateBoxPlot(dataframe, feature) for every feature and reports the time
+            taken by each plot.
+
+        Args:
+            processor: IMARISDataProcessor or IMARISDendriteSumary
+            dataframe (pd.DataFrame): samples data
+            features ([list]): columns to plot
+            options: extra keyword arguments of GenerateBoxPlot (e.g. point_budget)
+
+        Returns:
+            [dict]: feature -> rendering time in seconds
+        """
+        features = list(features)
+        start = time.perf_counter()
+        workers = min(self.workers, len(features))
+        if workers <= 1:
+            _InitWorker(processor, dataframe, options)
+            timings = [_RenderFeature(feature) for feature in features]
+        else:
+            with ProcessPoolExecutor(max_workers=workers, initializer=_InitWorker,
+                                     initargs=(processor, dataframe, options)) as executor:
+                timings = list(executor.map(_RenderFeature, features))
+        timings = dict(zip(features, timings))
+        self.PrintTimings(timings, time.perf_counter() - start, workers)
+        return timings
+
+    @staticmethod
+    def PrintTimings(timings, total, workers):
+        print("==============")
+        print(f"{len(timings)} plots rendered in {total:.2f}s with {max(1, workers)} process(es)")
+        for feature, seconds in timings.items():
+            print(f"  {feature:<40} {seconds:8.2f}s")
+
+
+class AggregateBoxPlot:
+    """ Box plot drawn from per-sample aggregates instead of the full data, for datasets too large
+    for seaborn (which draws one vector marker per cell).
+
+    The values are grouped by sample once; the quartiles and whiskers of every sample are computed
+    on its slice (linear-time partial sorts) and drawn with Axes.bxp. The strip layer is either a
+    deterministic random subsample of at most point_budget values, shared out evenly between the
+    samples ('points'), or the histogram of every value of each sample drawn as a shaded band
+    ('density'). Both are rasterised so the PDF size does not depend on the number of rows.
+    """
+    DEFAULT_POINT_BUDGET = 20000
+    LAYERS = ('points', 'density')
+    DENSITY_BINS = 512
+
+    def __init__(self, point_budget = DEFAULT_POINT_BUDGET, seed = 0, layer = 'points'):
+        """
+        Args:
+            point_budget (int, optional): most points drawn by the 'points' layer. Defaults to 20000.
+            seed (int, optional): seed of the subsample and of the jitter. Defaults to 0.
+            layer (str, optional): strip layer, 'points' or 'density'. Defaults to 'points'.
+        """
+        if layer not in self.LAYERS:
+            raise Exception(f"Unknown strip layer {layer!r}, expected one of {self.LAYERS}")
+        self.point_budget = int(point_budget)
+        self.seed = seed
+        self.layer = layer
+
+    @staticmethod
+    def Groups(labels):
+        """Groups returns the group code of every row and the group labels, in the order used by
+            seaborn (categories order for categoricals, order of appearance otherwise)
+        """
+        if isinstance(labels.dtype, pd.CategoricalDtype):
+            return labels.cat.codes.to_numpy(), list(labels.cat.categories)
+        codes, uniques = pd.factorize(labels)
+        return codes, list(uniques)
+
+    def Prepare(self, dataframe, feature, by = 'Sample'):
+        """Prepare groups the non-missing values of feature
+
+        Returns:
+            [tuple]: (values sorted by group, start of every group in values plus the end, group labels)
+        """
+        codes, labels = self.Groups(dataframe[by])
+        values = dataframe[feature].to_numpy(dtype=np.float64)
+        keep = (codes >= 0) & ~np.isnan(values)
+        values, codes = values[keep], codes[keep]
+        values = values[np.argsort(codes, kind='stable')]
+        starts = np.concatenate([[0], np.cumsum(np.bincount(codes, minlength=len(labels)))])
+        return values, starts, labels
+
+    @staticmethod
+    def BoxStatistics(values, starts, labels):
+        """BoxStatistics computes the box of every group with data, as matplotlib's boxplot but without fliers
+
+        Returns:
+            [list]: dicts in the format of matplotlib.cbook.boxplot_stats, with the group position
+        """
+        from matplotlib import cbook
+        boxes = []
+        for position, label in enumerate(labels):
+            group = values[starts[position]:starts[position+1]]
+            if group.size == 0:
+                continue
+            box = cbook.boxplot_stats(group)[0]
+            box.update(label=str(label), position=position, fliers=np.empty(0))
+            boxes.append(box)
+        return boxes
+
+    def Subsample(self, values, starts):
+        """Subsample picks about point_budget values (plus the minimum and maximum of every group), as evenly
+            as possible between the groups (small groups are kept whole and their unused share goes to the others)
+
+        Returns:
+            [tuple]: (values, group positions) of the picked points
+        """
+        counts = np.diff(starts)
+        quotas = np.zeros(counts.size, dtype=np.int64)
+        budget, remaining = self.point_budget, np.count_nonzero(counts)
+        for group in np.argsort(counts, kind='stable'):
+            if counts[group] == 0:
+                continue
+            quotas[group] = min(counts[group], budget // remaining)
+            budget -= quotas[group]
+            remaining -= 1
+        rng = np.random.default_rng(self.seed)
+        picked, positions = [], []
+        for group in np.flatnonzero(quotas):
+            group_values = values[starts[group]:starts[group+1]]
+            # the extremes are always drawn, so the axis covers the same range as the full data
+            chosen = np.union1d(rng.choice(counts[group], quotas[group], replace=False),
+                                [group_values.argmin(), group_values.argmax()])
+            picked.append(group_values[chosen])
+            positions.append(np.full(chosen.size, group))
+        if not picked:
+            return np.empty(0), np.empty(0, dtype=np.int64)
+        return np.concatenate(picked), np.concatenate(positions)
+
+    def Density(self, values, starts, bins = DENSITY_BINS):
+        """Density counts the values of every group in bins shared by all the groups
+
+        Returns:
+            [tuple]: (counts of every group scaled to a maximum of 1, shape (groups, bins), bin edges)
+        """
+        low, high = (values.min(), values.max()) if values.size else (0.0, 1.0)
+        if high <= low:
+            low, high = low - 0.5, high + 0.5
+        edges = np.linspace(low, high, bins + 1)
+        density = np.zeros((starts.size - 1, bins))
+        for group in range(starts.size - 1):
+            counts, _ = np.histogram(values[starts[group]:starts[group+1]], bins=edges)
+            if counts.any():
+                density[group] = counts / counts.max()
+        return density, edges
+
+    def DrawDensity(self, ax, values, starts):
+        """DrawDensity shades the band of every group in proportion to the number of values in each bin"""
+        density, edges = self.Density(values, starts)
+        for position, row in enumerate(density):
+            if not row.any():
+                continue
+            band = np.zeros((1, row.size, 4))
+            band[..., :3] = 0.3
+            band[..., 3] = 0.75 * row
+            ax.imshow(band, extent=(edges[0], edges[-1], position + 0.2, position - 0.2), aspect='auto',
+                      interpolation='nearest', zorder=3)
+
+    def Draw(self, ax, dataframe, feature, by = 'Sample', colors = None, strip = True):
+        """Draw plots the boxes of feature per sample on ax, samples from top to bottom as seaborn
+
+        Args:
+            ax (matplotlib.axes.Axes): target axes
+            dataframe (pd.DataFrame): data
+            feature (str): column to plot
+            by (str, optional): grouping column. Defaults to 'Sample'.
+            colors ([list], optional): box colors. Defaults to None (matplotlib color cycle).
+            strip (bool, optional): draw the strip layer over the boxes. Defaults to True.
+        """
+        values, starts, labels = self.Prepare(dataframe, feature, by)
+        boxes = self.BoxStatistics(values, starts, labels)
+        if colors is None:
+            colors = [f'C{position % 10}' for position in range(len(labels))]
+        if boxes:
+            artists = ax.bxp(boxes, positions=[box['position'] for box in boxes], vert=False, widths=0.8,
+                             showfliers=False, patch_artist=True, manage_ticks=False,
+                             medianprops={'color': '0.25'})
+            for patch, box in zip(artists['boxes'], boxes):
+                patch.set_facecolor(colors[box['position'] % len(colors)])
+                patch.set_edgecolor('0.25')
+        if strip and values.size and self.layer == 'density':
+            self.DrawDensity(ax, values, starts)
+        elif strip and values.size:
+            points, positions = self.Subsample(values, starts)
+            jitter = np.random.default_rng(self.seed).uniform(-0.2, 0.2, points.size)
+            ax.scatter(points, positions + jitter, s=25, color='0.3', alpha=0.75, linewidths=0,
+                       zorder=3, rasterized=True)
+        ax.set_yticks(range(len(labels)))
+        ax.set_yticklabels([str(label) for label in labels])
+        ax.set_ylim(len(labels) - 0.5, -0.5)
+        ax.set_xlabel(feature)
@@ -0,0 +1,147 @@
+import os
+import time
+import threading
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+
+
+class Prefetcher:
+    """ Reads the upcoming series files into memory on a few threads while the current one is parsed, so
+    that with the exports on a network share (SMB/NFS) the parsing no longer waits for every transfer and
+    the network no longer waits for the parsing.
+
+    The files are read in the order they were scheduled, as long as the files read but not taken yet fit
+    in max_bytes (a larger file is read alone). Take returns the contents of a file, waiting for it if it
+    is still being read; the files scheduled before it and never taken (e.g. found in the cache) are
+    dropped. Only the workbook exports are prefetched: the parsers read them whole, whereas only some
+    statistics of the .ims files and some files of the CSV exports are read, from their path.
+
+    The time spent reading in the background and waiting for the files is printed by Close, and recorded
+    by the tracer as 'read' and 'io wait' spans next to the 'parse' ones.
+    """
+    DEFAULT_MAX_BYTES = 256*1024**2
+    THREADS = 4
+    EXTENSIONS = ('.xls', '.xlsx')
+
+    def __init__(self, max_bytes = DEFAULT_MAX_BYTES, threads = THREADS, tracer = None):
+        """
+        Args:
+            max_bytes (int, optional): maximum size of the files read ahead and not taken yet. Defaults to 256MB.
+            threads (int, optional): number of files read at the same time. Defaults to 4.
+            tracer (Tracer, optional): records the reads and the waits (see common.tracing). Defaults to None.
+        """
+        self.max_bytes = max_bytes
+        self.tracer = tracer
+        self.executor = ThreadPoolExecutor(max_workers=threads, thread_name_prefix='prefetch')
+        self.lock = threading.Lock()
+        self.queue = deque() # SeriesFile scheduled, not read yet
+        self.pending = OrderedDict() # path -> (future, size) of the files read or being read, not taken yet
+        self.held = 0 # bytes of the pending files
+        self.files = 0
+        self.bytes_read = 0
+        self.read_time = 0.0
+        self.wait_time = 0.0
+        self.waits = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.Close()
+
+    @classmethod
+    def Accepts(cls, source):
+        return os.path.splitext(source.path)[-1].lower() in cls.EXTENSIONS
+
+    def Schedule(self, sources):
+        """Schedule adds files to read, in the order they will be taken
+
+        Args:
+            sources (iterable): SeriesFile (path, size, mtime_ns) of the index; the files which are not
+                workbook exports are ignored
+        """
+        with self.lock:
+            self.queue.extend(source for source in sources if self.Accepts(source))
+            self.Fill()
+
+    def Fill(self):
+        """Fill starts reading the next scheduled files within the byte budget (called with the lock held)
+        """
+        while self.queue and (not self.pending or self.held + self.queue[0].size <= self.max_bytes):
+            source = self.queue.popleft()
+            if source.path in self.pending:
+                continue
+            self.pending[source.path] = (self.executor.submit(self.ReadFile, source), source.size)
+            self.held += source.size
+
+    def ReadFile(self, source):
+        start = time.perf_counter()
+        with open(source.path, 'rb') as series_file:
+            contents = series_file.read()
+        duration = time.perf_counter() - start
+        if self.tracer is not None and self.tracer.enabled:
+            self.tracer.Record('read', start, duration, {'file': os.path.basename(source.path), 'bytes': len(contents)})
+        with self.lock:
+            self.files += 1
+            self.bytes_read += len(contents)
+            self.read_time += duration
+        return contents
+
+    def Drop(self, path):
+        future, size = self.pending.pop(path)
+        future.cancel()
+        self.held -= size
+
+    def Take(self, source):
+        """Take returns the contents of a scheduled file, waiting for the end of its reading if needed
+
+        Args:
+            source (SeriesFile): file of the index
+
+        Returns:
+            [bytes]: contents of the file, None if it was not scheduled (to be read from its path)
+        """
+        with self.lock:
+            if source.path not in self.pending:
+                if not any(queued.path == source.path for queued in self.queue):
+                    return None
+                for path in list(self.pending): # all scheduled before it
+                    self.Drop(path)
+                while self.queue[0].path != source.path:
+                    self.queue.popleft()
+                self.Fill()
+            for path in list(self.pending):
+                if path == source.path:
+                    break
+                self.Drop(path)
+            future, size = self.pending[source.path]
+        start = time.perf_counter()
+        waited = not future.done()
+        try:
+            contents = future.result() # errors of the reading (e.g. a missing file) are raised here
+        finally:
+            duration = time.perf_counter() - start
+            with self.lock:
+                self.pending.pop(source.path, None)
+                self.held -= size
+                if waited:
+                    self.waits += 1
+                    self.wait_time += duration
+                self.Fill()
+        if waited and self.tracer is not None and self.tracer.enabled:
+            self.tracer.Record('io wait', start, duration, {'file': os.path.basename(source.path)})
+        if self.tracer is not None:
+            self.tracer.Count('bytes prefetched', len(contents))
+        return contents
+
+    def Close(self):
+        """Close drops the files not taken and prints the time spent reading and waiting
+        """
+        with self.lock:
+            self.queue.clear()
+            for path in list(self.pending):
+                self.Drop(path)
+        self.executor.shutdown(wait=True)
+        if self.files:
+            print(f"Prefetched {self.files} files ({self.bytes_read/1024**2:.1f} MB) in {self.read_time:.2f}s of background "
+                  f"reads; waited {self.wait_time:.2f}s for {self.waits} of them.")
@@ -0,0 +1,223 @@
+import os
+import json
+import sqlite3
+import hashlib
+from datetime import date, datetime
+import numpy as np
+import pandas as pd
+
+
+class ResultStore:
+    """ Keeps the rows extracted by every run (cells, spots and dendrites), with the run metadata, in a
+    local SQLite database shared by any number of experiments, so results can be compared across
+    experiments with indexed queries instead of reloading every pickle.
+
+    Tables:
+    - runs: run_id, data ('cells' or 'dendrite'), root (experiment folder), run_date, started, config_hash,
+      finished (set by FinishRun once every row of the run was written, NULL while running or if interrupted)
+    - cells, spots, dendrites: run_id, sample (folder name), label (sample label), series, the index of the
+      rows (e.g. "Cell ID"), then one column per feature ("Vesicles", "Nr. Spots", "Dendrite Length"...),
+      added as new features appear
+    - index_columns: table_name, name of the columns of each table holding the index of the rows, which are
+      keys of the rows and not features
+
+    The data tables are indexed on label, series and run_id. Queries only return the latest finished run of
+    every experiment unless asked otherwise, so processing a folder again replaces its rows in the results once
+    it completes, and an interrupted run never hides a complete one.
+    """
+    FORMAT_VERSION = 3
+    TABLES = ('cells', 'spots', 'dendrites')
+    KEYS = ['run_id', 'sample', 'label', 'series']
+    TIMEOUT = 60 # seconds waiting for another process (e.g. batch jobs) to commit
+    STATISTICS = {'count': 'COUNT', 'mean': 'AVG', 'min': 'MIN', 'max': 'MAX'} # of Summary, as SQL functions
+
+    def __init__(self, filename):
+        self.filename = filename
+        self.connection = None
+        self.columns = {} # table -> set of its columns
+        self.index_columns = {} # table -> list of its index columns
+
+    def __getstate__(self):
+        # the processors are sent to the worker processes, which never write: the connection stays here
+        state = self.__dict__.copy()
+        state.update(connection=None, columns={}, index_columns={})
+        return state
+
+    def Connect(self):
+        if self.connection is not None:
+            return self.connection
+        directory = os.path.dirname(os.path.abspath(self.filename))
+        os.makedirs(directory, exist_ok=True)
+        self.connection = sqlite3.connect(self.filename, timeout=self.TIMEOUT)
+        with self.connection:
+            self.connection.execute("CREATE TABLE IF NOT EXISTS runs (run_id INTEGER PRIMARY KEY AUTOINCREMENT, "
+                                    "data TEXT, root TEXT, run_date TEXT, started TEXT, config_hash TEXT, finished TEXT)")
+            if 'finished' not in [row[1] for row in self.connection.execute("PRAGMA table_info(runs)")]:
+                # stores of an earlier version did not record it: their runs are taken as finished
+                self.connection.execute("ALTER TABLE runs ADD COLUMN finished TEXT")
+                self.connection.execute("UPDATE runs SET finished = started")
+            self.connection.execute("CREATE TABLE IF NOT EXISTS index_columns (table_name TEXT, name TEXT, "
+                                    "PRIMARY KEY (table_name, name))")
+            for table in self.TABLES:
+                self.connection.execute(f'CREATE TABLE IF NOT EXISTS "{table}" (run_id INTEGER REFERENCES runs(run_id), '
+                                        'sample TEXT, label TEXT, series TEXT)')
+                for column in ['label', 'series', 'run_id']:
+                    self.connection.execute(f'CREATE INDEX IF NOT EXISTS "{table}_{column}" ON "{table}" ({column})')
+            self.connection.execute(f"PRAGMA user_version = {self.FORMAT_VERSION}")
+        return self.connection
+
+    def Close(self):
+        if self.connection is not None:
+            self.connection.close()
+            self.connection = None
+
+    @staticmethod
+    def ConfigHash(config):
+        return hashlib.sha1(json.dumps(config, sort_keys=True, default=str).encode('utf-8')).hexdigest()
+
+    def BeginRun(self, data, root, config):
+        """BeginRun records a new run
+
+        Args:
+            data (str): 'cells' or 'dendrite'
+            root (str): experiment folder
+            config: json-serialisable configuration of the run (its hash is stored)
+
+        Returns:
+            [int]: run_id
+        """
+        connection = self.Connect()
+        with connection:
+            cursor = connection.execute("INSERT INTO runs (data, root, run_date, started, config_hash) VALUES (?, ?, ?, ?, ?)",
+                                        (data, os.path.abspath(root), date.today().isoformat(),
+                                         datetime.now().isoformat(timespec='seconds'), self.ConfigHash(config)))
+        return cursor.lastrowid
+
+    def FinishRun(self, run_id):
+        """FinishRun marks a run as complete: from now on, it is the latest run of its experiment folder (see Where)
+        """
+        connection = self.Connect()
+        with connection:
+            connection.execute("UPDATE runs SET finished = ? WHERE run_id = ?", (datetime.now().isoformat(timespec='seconds'), run_id))
+
+    def TableColumns(self, table):
+        if table not in self.columns:
+            rows = self.Connect().execute(f'PRAGMA table_info("{table}")').fetchall()
+            self.columns[table] = set(row[1] for row in rows)
+        return self.columns[table]
+
+    def IndexColumns(self, table):
+        if table not in self.index_columns:
+            rows = self.Connect().execute("SELECT name FROM index_columns WHERE table_name = ? ORDER BY rowid", (table,)).fetchall()
+            self.index_columns[table] = [row[0] for row in rows]
+        return self.index_columns[table]
+
+    def Keys(self, table):
+        """Keys returns the columns of a table which identify its rows: KEYS then the index columns
+        """
+        return self.KEYS + self.IndexColumns(table)
+
+    def Features(self, table):
+        """Features returns the feature columns of a table, sorted
+        """
+        return sorted(self.TableColumns(table) - set(self.Keys(table)))
+
+    def Add(self, table, run_id, sample, label, serie, frame):
+        """Add appends the rows of a serie, without committing them (see Commit)
+
+        Args:
+            table (str): 'cells', 'spots' or 'dendrites'
+            frame (pd.DataFrame): serie data; its named index levels (e.g. "Cell ID") are stored as index columns
+                (see Keys) and its numeric columns as features
+        """
+        if table not in self.TABLES:
+            raise ValueError(f"Unknown table {table}, expected one of {self.TABLES}")
+        if frame.empty:
+            return
+        index_columns = [name for name in frame.index.names if name is not None and name not in self.KEYS]
+        frame = frame.reset_index(level=index_columns) if index_columns else frame
+        columns = [column for column in frame.columns if column not in self.KEYS and column not in index_columns and
+                   pd.api.types.is_numeric_dtype(frame[column]) and not isinstance(frame[column].dtype, pd.CategoricalDtype)]
+        connection = self.Connect()
+        for column in index_columns:
+            if column not in self.IndexColumns(table):
+                connection.execute("INSERT OR IGNORE INTO index_columns (table_name, name) VALUES (?, ?)", (table, column))
+                self.index_columns[table].append(column)
+        columns = index_columns + columns
+        for column in columns:
+            if column not in self.TableColumns(table):
+                kind = 'INTEGER' if np.issubdtype(frame[column].dtype, np.integer) else \
+                    'REAL' if pd.api.types.is_numeric_dtype(frame[column]) else 'TEXT'
+                connection.execute(f'ALTER TABLE "{table}" ADD COLUMN "{column}" {kind}')
+                self.columns[table].add(column)
+        names = ', '.join(f'"{name}"' for name in self.KEYS + columns)
+        rows = zip(*[[run_id]*len(frame), [sample]*len(frame), [label]*len(frame), [serie]*len(frame)],
+                   *[frame[column].tolist() for column in columns])
+        connection.executemany(f'INSERT INTO "{table}" ({names}) VALUES ({", ".join("?"*(len(self.KEYS)+len(columns)))})', rows)
+
+    def Commit(self):
+        if self.connection is not None:
+            self.connection.commit()
+
+    def Runs(self):
+        """Runs returns the recorded runs (pd.DataFrame)
+        """
+        return pd.read_sql_query("SELECT * FROM runs ORDER BY run_id", self.Connect())
+
+    def Where(self, labels = None, series = None, runs = None, latest = True):
+        conditions, parameters = [], []
+        for column, values in [('t.label', labels), ('t.series', series), ('t.run_id', runs)]:
+            if values is not None:
+                values = list(values)
+                conditions.append(f"{column} IN ({', '.join('?'*len(values))})")
+                parameters += values
+        if latest and runs is None: # the last finished run of every experiment folder
+            conditions.append("t.run_id IN (SELECT MAX(run_id) FROM runs WHERE finished IS NOT NULL GROUP BY data, root)")
+        return (" WHERE " + " AND ".join(conditions)) if conditions else "", parameters
+
+    def Query(self, table, labels = None, series = None, runs = None, columns = None, latest = True):
+        """Query returns the stored rows of a table, with the experiment folder and date of their run
+
+        Args:
+            table (str): 'cells', 'spots' or 'dendrites'
+            labels (list, optional): sample labels. Defaults to None (all).
+            series (list, optional): series names. Defaults to None (all).
+            runs (list, optional): run_id values. Defaults to None (the latest finished run of every experiment if latest).
+            columns (list, optional): feature columns, returned after the keys (see Keys). Defaults to None (all).
+            latest (bool, optional): only the latest finished run of every experiment folder. Defaults to True.
+
+        Returns:
+            [pd.DataFrame]: one row per stored row
+        """
+        if table not in self.TABLES:
+            raise ValueError(f"Unknown table {table}, expected one of {self.TABLES}")
+        if columns is None:
+            selected = "t.*"
+        else:
+            keys = self.Keys(table)
+            selected = ", ".join(f't."{column}"' for column in keys + [column for column in columns if column not in keys])
+        where, parameters = self.Where(labels, series, runs, latest)
+        return pd.read_sql_query(f'SELECT r.root, r.run_date, {selected} FROM "{table}" t JOIN runs r ON r.run_id = t.run_id'
+                                 + where, self.Connect(), params=parameters)
+
+    def Summary(self, table, columns, by = ('label',), labels = None, series = None, runs = None, latest = True):
+        """Summary computes count, mean, min and max of columns per group in the database, without loading the rows
+
+        Args:
+            columns (list): feature columns (see Features)
+            by (tuple, optional): grouping columns, among root, run_date, run_id, sample, label and series.
+                Defaults to ('label',).
+
+        Returns:
+            [pd.DataFrame]: one row per group, columns (feature, statistic)
+        """
+        keys = {'root': 'r.root', 'run_date': 'r.run_date'}
+        groups = [keys.get(column, f't.{column}') for column in by]
+        aggregates = ", ".join(f'{function}(t."{column}")' for column in columns for function in self.STATISTICS.values())
+        where, parameters = self.Where(labels, series, runs, latest)
+        frame = pd.read_sql_query(f'SELECT {", ".join(groups)}, {aggregates} FROM "{table}" t JOIN runs r ON r.run_id = t.run_id'
+                                  f'{where} GROUP BY {", ".join(groups)} ORDER BY {", ".join(groups)}', self.Connect(), params=parameters)
+        frame = frame.set_index(frame.columns[:len(groups)].tolist())
+        frame.index.names = list(by)
+        frame.columns = pd.MultiIndex.from_product([columns, list(self.STATISTICS)])
+        return frame
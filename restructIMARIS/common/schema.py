@@ -0,0 +1,73 @@
+import numpy as np
+import pandas as pd
+
+
+class FrameSchema:
+    """ Compact in-memory types for the cells, spots and dendrite dataframes:
+    - 'Sample' and 'Series' are categoricals (one small integer code per row)
+    - count columns (number of vesicles, spots, filaments) use the smallest unsigned integer type
+      able to hold them
+    - every other numeric feature (intensity, volume, sphericity, length, ...) is float64 as read, so the
+      per-sample outputs (per-sample files, result store) are exact, and float32 once Downcast: each sample
+      is downcast as soon as it is written, so the combined frames (aggregation, plots, pickles and Parquet
+      datasets) never hold the float64 values of more than one sample
+    """
+    CATEGORICAL_COLUMNS = ['Sample', 'Series']
+
+    def __init__(self, counts = []):
+        """
+        Args:
+            counts ([list], optional): names of the count columns. Defaults to [].
+        """
+        self.counts = list(counts)
+
+    def Apply(self, frame):
+        """Apply converts, in place, the columns of frame to their compact type
+
+        Returns:
+            [pd.DataFrame]: frame
+        """
+        for column in frame.columns:
+            values = frame[column]
+            if column in self.CATEGORICAL_COLUMNS:
+                if not isinstance(values.dtype, pd.CategoricalDtype):
+                    frame[column] = values.astype('category')
+            elif not pd.api.types.is_numeric_dtype(values) or pd.api.types.is_bool_dtype(values):
+                continue
+            elif column in self.counts and not values.isna().any() and (values >= 0).all():
+                frame[column] = pd.to_numeric(values.astype(np.int64), downcast='unsigned')
+            else:
+                frame[column] = values.astype(np.float64)
+        return frame
+
+    @staticmethod
+    def Downcast(frame):
+        """Downcast returns frame with its float64 columns as float32 (frame is not modified)
+        """
+        columns = {column: np.float32 for column in frame.columns if frame[column].dtype == np.float64}
+        return frame.astype(columns) if columns else frame
+
+    @staticmethod
+    def Relabel(column, labels):
+        """Relabel replaces the values of a categorical column by mapping its categories, which only
+            costs one lookup per category instead of one per row.
+
+        Args:
+            column (pd.Series): categorical column (e.g. 'Sample')
+            labels (dict): old value -> new value; values missing from labels are kept
+
+        Returns:
+            [pd.Series]: relabelled categorical column, with its categories sorted
+        """
+        if not isinstance(column.dtype, pd.CategoricalDtype):
+            column = column.astype('category')
+        new_categories = [labels.get(category, category) for category in column.cat.categories]
+        if len(set(new_categories)) == len(new_categories):
+            column = column.cat.rename_categories(new_categories)
+        else: # several folders share the same label: merge their codes
+            unique_categories = sorted(set(new_categories))
+            code_map = np.asarray([unique_categories.index(category) for category in new_categories])
+            codes = np.where(column.cat.codes.values < 0, -1, code_map[column.cat.codes.values])
+            column = pd.Series(pd.Categorical.from_codes(codes, unique_categories),
+                               index=column.index, name=column.name)
+        return column.cat.reorder_categories(sorted(column.cat.categories))
@@ -0,0 +1,78 @@
+import os
+import json
+import hashlib
+import tempfile
+
+
+class StatisticsStore:
+    """ Persists, in a JSON file, one mergeable statistics state per (sample, series) together with the
+    fingerprint of the files it was computed from.
+
+    Summaries are then regenerated by merging the states: after adding, modifying or removing a series,
+    only that series has to be parsed again.
+    """
+    FORMAT_VERSION = 1
+    SKETCH_SIZE = 200 # centroids kept per feature and series, keeps the file small
+
+    def __init__(self, filename):
+        self.filename = filename
+        self.entries = {}
+        self.Load()
+
+    def Load(self):
+        if not os.path.isfile(self.filename):
+            return
+        try:
+            with open(self.filename) as json_file:
+                data = json.load(json_file)
+        except (OSError, ValueError):
+            print(f"Could not read {self.filename}, all the series will be processed again.")
+            return
+        if data.get('version') == self.FORMAT_VERSION:
+            self.entries = data['entries']
+
+    def Save(self):
+        directory = os.path.dirname(os.path.abspath(self.filename))
+        handle, temp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+        with os.fdopen(handle, 'w') as json_file:
+            json.dump({'version': self.FORMAT_VERSION, 'entries': self.entries}, json_file)
+        os.replace(temp_path, self.filename)
+
+    @staticmethod
+    def Key(sample_name, serie_name):
+        return sample_name + '/' + serie_name
+
+    @staticmethod
+    def Fingerprint(files, config):
+        """Fingerprint identifies the content a state was computed from: the size and modification time of
+            its source files and the configuration section used to extract them.
+
+        Args:
+            files (list): SeriesFile entries (path, size, mtime_ns) of the ExperimentIndex
+            config: json-serialisable configuration section
+        """
+        files = [[os.path.basename(path), size, mtime_ns] for path, size, mtime_ns in files]
+        fingerprint = json.dumps([files, config], sort_keys=True, default=str)
+        return hashlib.sha1(fingerprint.encode('utf-8')).hexdigest()
+
+    def Get(self, sample_name, serie_name, fingerprint):
+        """Get returns the stored state, or None if missing or computed from other files/config
+        """
+        entry = self.entries.get(self.Key(sample_name, serie_name))
+        if entry is None or entry['fingerprint'] != fingerprint:
+            return None
+        return entry['state']
+
+    def Put(self, sample_name, serie_name, fingerprint, state):
+        self.entries[self.Key(sample_name, serie_name)] = {'fingerprint': fingerprint, 'state': state}
+
+    def Retain(self, samples_series):
+        """Retain drops the states of the series which no longer exist
+
+        Args:
+            samples_series ([list]): (sample, [series]) pairs currently found
+        """
+        keys = set(self.Key(sample, serie) for sample, series in samples_series for serie in series)
+        for key in list(self.entries.keys()):
+            if key not in keys:
+                del self.entries[key]
@@ -0,0 +1,197 @@
+import numpy as np
+import pandas as pd
+
+
+class QuantileSketch:
+    """ Mergeable approximation of a distribution used to estimate medians and other quantiles
+    without keeping every value in memory.
+
+    The sketch holds at most `size` weighted centroids. Up to `size` values it is exact (every value
+    is its own centroid); beyond that, sorted centroids are merged into `size` groups of equal weight.
+    Two sketches are merged by pooling their centroids and compressing again.
+    """
+
+    def __init__(self, size = 1000):
+        self.size = size
+        self.means = np.empty(0)
+        self.weights = np.empty(0)
+
+    def Update(self, values):
+        values = np.asarray(values, dtype=np.float64)
+        values = values[~np.isnan(values)]
+        self.Add(values, np.ones(values.size))
+
+    def Merge(self, other):
+        self.Add(other.means, other.weights)
+        return self
+
+    def Add(self, means, weights):
+        if means.size == 0:
+            return
+        self.means = np.concatenate([self.means, means])
+        self.weights = np.concatenate([self.weights, weights])
+        if self.means.size > 2*self.size:
+            self.Compress()
+
+    def Compress(self):
+        if self.means.size <= self.size:
+            return
+        order = np.argsort(self.means, kind='mergesort')
+        means, weights = self.means[order], self.weights[order]
+        cumulative = np.cumsum(weights) - weights # weight before each centroid
+        groups = np.minimum((cumulative/cumulative[-1]*self.size).astype(np.int64) if cumulative[-1] > 0
+                            else np.zeros(means.size, dtype=np.int64), self.size-1)
+        group_weights = np.bincount(groups, weights=weights, minlength=self.size)
+        group_sums = np.bincount(groups, weights=weights*means, minlength=self.size)
+        keep = group_weights > 0
+        self.means = group_sums[keep]/group_weights[keep]
+        self.weights = group_weights[keep]
+
+    def Quantile(self, q):
+        """Quantile estimates the q-th quantile (0 <= q <= 1), interpolating linearly like pandas
+        """
+        if self.means.size == 0:
+            return np.nan
+        self.Compress()
+        order = np.argsort(self.means, kind='mergesort')
+        means, weights = self.means[order], self.weights[order]
+        # position of each centroid on the [0, n-1] rank axis (its middle for merged centroids)
+        ranks = np.cumsum(weights) - (weights+1)/2
+        return float(np.interp(q*(weights.sum()-1), ranks, means))
+
+    def ToDict(self):
+        return {'size': self.size, 'means': self.means.tolist(), 'weights': self.weights.tolist()}
+
+    @classmethod
+    def FromDict(cls, data):
+        sketch = cls(data['size'])
+        sketch.means = np.asarray(data['means'], dtype=np.float64)
+        sketch.weights = np.asarray(data['weights'], dtype=np.float64)
+        return sketch
+
+
+class OnlineStatistics:
+    """ Statistics of a feature updated one chunk (e.g. one series) at a time: count, mean, standard
+    deviation (ddof=1, as pandas), min, max and sum are exact; quantiles come from a QuantileSketch.
+
+    Two states can be merged (Chan et al. parallel algorithm), so statistics can be computed per
+    series and combined per sample.
+    """
+
+    def __init__(self, sketch_size = 1000):
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0 # sum of squared differences from the mean
+        self.min = np.nan
+        self.max = np.nan
+        self.sum = 0.0
+        self.sketch = QuantileSketch(sketch_size)
+
+    def Update(self, values):
+        values = np.asarray(values, dtype=np.float64)
+        values = values[~np.isnan(values)]
+        if values.size == 0:
+            return self
+        chunk = OnlineStatistics(self.sketch.size)
+        chunk.count = values.size
+        chunk.mean = float(values.mean())
+        chunk.m2 = float(((values-chunk.mean)**2).sum())
+        chunk.min = float(values.min())
+        chunk.max = float(values.max())
+        chunk.sum = float(values.sum())
+        chunk.sketch.Update(values)
+        return self.Merge(chunk)
+
+    def Merge(self, other):
+        if other.count == 0:
+            return self
+        if self.count == 0:
+            self.count, self.mean, self.m2 = other.count, other.mean, other.m2
+            self.min, self.max, self.sum = other.min, other.max, other.sum
+            self.sketch.Merge(other.sketch)
+            return self
+        count = self.count + other.count
+        delta = other.mean - self.mean
+        self.mean += delta*other.count/count
+        self.m2 += other.m2 + delta**2*self.count*other.count/count
+        self.count = count
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        self.sum += other.sum
+        self.sketch.Merge(other.sketch)
+        return self
+
+    def Std(self):
+        return np.sqrt(self.m2/(self.count-1)) if self.count > 1 else np.nan
+
+    def Describe(self, percentiles = [0.5]):
+        """Describe returns the statistics with the names used by pd.DataFrame.describe
+
+        Returns:
+            [dict]: statistic name -> value
+        """
+        description = {'count': float(self.count),
+                       'mean': self.mean if self.count else np.nan,
+                       'std': self.Std(),
+                       'min': self.min}
+        for percentile in percentiles:
+            description[f'{percentile*100:g}%'] = self.sketch.Quantile(percentile)
+        description['max'] = self.max
+        return description
+
+    def ToDict(self):
+        return {'count': self.count, 'mean': self.mean, 'm2': self.m2, 'min': self.min, 'max': self.max,
+                'sum': self.sum, 'sketch': self.sketch.ToDict()}
+
+    @classmethod
+    def FromDict(cls, data):
+        statistics = cls(data['sketch']['size'])
+        statistics.count, statistics.mean, statistics.m2 = data['count'], data['mean'], data['m2']
+        statistics.min, statistics.max, statistics.sum = data['min'], data['max'], data['sum']
+        statistics.sketch = QuantileSketch.FromDict(data['sketch'])
+        return statistics
+
+    @staticmethod
+    def MergeStates(states):
+        """MergeStates merges serialised states (see ToDict) of the same features
+
+        Args:
+            states ([list]): dicts feature -> OnlineStatistics.ToDict()
+
+        Returns:
+            [dict]: feature -> OnlineStatistics
+        """
+        merged = {}
+        for state in states:
+            for feature, feature_state in state.items():
+                statistics = OnlineStatistics.FromDict(feature_state)
+                if feature in merged:
+                    merged[feature].Merge(statistics)
+                else:
+                    merged[feature] = statistics
+        return merged
+
+    @staticmethod
+    def ToMetrics(statistics, percentiles = [0.5]):
+        """ToMetrics lays out per-sample statistics as groupby('Sample').describe() does
+
+        Args:
+            statistics (dict): sample label -> feature -> OnlineStatistics
+
+        Returns:
+            [pd.DataFrame]: one row per sample label (sorted), columns (feature, statistic)
+        """
+        labels = sorted(statistics.keys())
+        features = list(dict.fromkeys(feature for label in labels for feature in statistics[label]))
+        empty = OnlineStatistics().Describe(percentiles)
+        names = list(empty.keys())
+        rows = []
+        for label in labels:
+            descriptions = [statistics[label][feature].Describe(percentiles) if feature in statistics[label] else empty
+                            for feature in features]
+            rows.append([description[name] for description in descriptions for name in names])
+        # levels kept in the features order, as in describe (from_product/from_tuples would sort them)
+        columns = pd.MultiIndex(levels=[features, names],
+                                codes=[np.repeat(np.arange(len(features)), len(names)),
+                                       np.tile(np.arange(len(names)), len(features))])
+        return pd.DataFrame(rows, index=pd.Index(labels, name='Sample'), columns=columns)
@@ -0,0 +1,144 @@
+import os
+import json
+import time
+import threading
+from collections import defaultdict
+
+
+class _NullSpan:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        return False
+
+
+_NULL_SPAN = _NullSpan() # shared by every span of a disabled tracer
+
+
+class _Span:
+    __slots__ = ('tracer', 'name', 'attributes', 'start')
+
+    def __init__(self, tracer, name, attributes):
+        self.tracer = tracer
+        self.name = name
+        self.attributes = attributes
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *args):
+        self.tracer.Record(self.name, self.start, time.perf_counter() - self.start, self.attributes)
+        return False
+
+
+class _CollectingCall:
+    """ Picklable wrapper returned by Tracer.Collect: runs func with a fresh trace and returns the
+    spans and counters recorded meanwhile along with the result, so they survive the worker process.
+    """
+
+    def __init__(self, tracer, func):
+        self.tracer = tracer
+        self.func = func
+
+    def __call__(self, *args):
+        events, counters = self.tracer.events, self.tracer.counters
+        self.tracer.events, self.tracer.counters = [], defaultdict(int)
+        try:
+            result = self.func(*args)
+            return result, self.tracer.events, dict(self.tracer.counters)
+        finally:
+            self.tracer.events, self.tracer.counters = events, counters
+
+
+class Tracer:
+    """ Optional instrumentation of the processors: timed spans around the stages (identify, parse, filter,
+    concat, aggregate, write, plot) of every sample and serie, and counters (rows, bytes read, sheets parsed...).
+
+    Report saves the trace in the Chrome trace event format (open it in chrome://tracing or
+    https://ui.perfetto.dev) and prints a table of the time spent per stage. When the tracer is disabled,
+    Span returns a shared no-op context manager and Count returns straight away.
+    """
+
+    def __init__(self, enabled = False):
+        self.enabled = enabled
+        self.events = []
+        self.counters = defaultdict(int)
+        self.origin = time.perf_counter() # copied to the worker processes, so their spans share the time axis
+
+    def __getstate__(self):
+        # copies sent to the worker processes start empty, their records come back through Absorb
+        return {'enabled': self.enabled, 'origin': self.origin}
+
+    def __setstate__(self, state):
+        self.__init__(state['enabled'])
+        self.origin = state['origin']
+
+    def Span(self, name, **attributes):
+        """Span times the enclosed block: `with tracer.Span('parse', sample=sample, serie=serie):`
+        """
+        if not self.enabled:
+            return _NULL_SPAN
+        return _Span(self, name, attributes)
+
+    def Record(self, name, start, duration, attributes = None):
+        self.events.append({'name': name, 'ph': 'X', 'ts': round((start - self.origin)*1e6, 1),
+                            'dur': round(duration*1e6, 1), 'pid': os.getpid(), 'tid': threading.get_ident(),
+                            'args': attributes or {}})
+
+    def Count(self, name, value = 1):
+        if self.enabled:
+            self.counters[name] += value
+
+    def Collect(self, func):
+        """Collect wraps a function run by SeriesPool, see Absorb
+        """
+        return _CollectingCall(self, func) if self.enabled else func
+
+    def Absorb(self, output):
+        """Absorb merges the spans and counters returned by a Collect-wrapped call and returns its result:
+            map(tracer.Absorb, pool.IMap(tracer.Collect(func), jobs))
+        """
+        if not self.enabled:
+            return output
+        result, events, counters = output
+        self.events.extend(events)
+        for name, value in counters.items():
+            self.counters[name] += value
+        return result
+
+    def Summary(self):
+        """Summary aggregates the spans per stage
+
+        Returns:
+            [list]: (stage, calls, total seconds, max seconds), in order of first occurrence
+        """
+        stages = {}
+        for event in self.events:
+            calls, total, longest = stages.get(event['name'], (0, 0.0, 0.0))
+            duration = event['dur']/1e6
+            stages[event['name']] = (calls+1, total+duration, max(longest, duration))
+        return [(name, calls, total, longest) for name, (calls, total, longest) in stages.items()]
+
+    def Save(self, filename):
+        with open(filename, 'w') as json_file:
+            json.dump({'traceEvents': self.events, 'displayTimeUnit': 'ms',
+                       'otherData': {'counters': dict(self.counters)}}, json_file)
+
+    def PrintSummary(self):
+        print("==============")
+        print(f"{'stage':<12} {'calls':>7} {'total s':>9} {'mean ms':>9} {'max ms':>9}")
+        for name, calls, total, longest in self.Summary():
+            print(f"{name:<12} {calls:7d} {total:9.3f} {total/calls*1e3:9.1f} {longest*1e3:9.1f}")
+        for name, value in self.counters.items():
+            print(f"{name:<20} {value:>12,}")
+
+    def Report(self, filename):
+        """Report saves the trace to filename and prints the summary table (nothing when disabled)
+        """
+        if not self.enabled:
+            return
+        self.Save(filename)
+        self.PrintSummary()
+        print(f"Trace saved to {filename}")
@@ -0,0 +1,168 @@
+import os
+import time
+import statistics
+from .cache import SeriesCache
+from .experiment_index import ExperimentIndex
+from .tracing import Tracer
+
+
+class FolderWatcher:
+    """ Polls an experiment folder while IMARIS exports into it and calls refresh(changes) once series files
+    were added, modified or removed.
+
+    Files still being written change size or modification time from one poll to the next, so the
+    folder is only refreshed once it has been quiet (no series file added, removed or modified) for
+    settle seconds. A refresh which fails (e.g. a file which was incomplete nonetheless) is retried
+    once the files change again.
+
+    The latency of every refresh, from the moment the last changed file landed (its modification
+    time, or one poll before it was detected if earlier) to the end of the refresh, is printed and
+    kept in self.updates.
+    """
+
+    def __init__(self, directory, include_sample, refresh, interval = 2.0, settle = 5.0, tracer = None):
+        """
+        Args:
+            directory (str): experiment folder, containing one sub-folder per sample
+            include_sample (callable): include_sample(folder name) -> bool, selects the sample folders (see ExperimentIndex)
+            refresh (callable): refresh(changes) updates the outputs, changes being a dict
+                (sample, serie, role) -> SeriesFile, or None for the removed files
+            interval (float, optional): seconds between two polls. Defaults to 2.0.
+            settle (float, optional): seconds without any change before refreshing. Defaults to 5.0.
+            tracer (Tracer, optional): records a 'refresh' span per refresh. Defaults to None.
+        """
+        self.directory = directory
+        self.include_sample = include_sample
+        self.refresh = refresh
+        self.interval = interval
+        self.settle = settle
+        self.tracer = tracer or Tracer()
+        self.processed = {} # snapshot the outputs are up to date with
+        self.current = None # snapshot of the last poll
+        self.failed = None # snapshot of the last failed refresh
+        self.last_change = None # time.monotonic() of the last change seen
+        self.detected = None # time.time() of the first change seen since the last refresh
+        self.updates = [] # per refresh: number of changed files, processing and latency in seconds
+
+    def Snapshot(self):
+        """Snapshot lists the series files of the folder (see ExperimentIndex)
+
+        Returns:
+            [dict]: (sample, serie, role) -> SeriesFile (path, size, mtime_ns)
+        """
+        index = ExperimentIndex(self.directory, include_sample=self.include_sample)
+        return {(sample, serie, role): source for sample, series in index.samples.items()
+                for serie, files in series.items() for role, source in files.items()}
+
+    @staticmethod
+    def Changes(before, after):
+        changes = {key: source for key, source in after.items() if before.get(key) != source}
+        changes.update((key, None) for key in before if key not in after)
+        return changes
+
+    def Poll(self):
+        """Poll scans the folder once
+
+        Returns:
+            [dict]: changes (see refresh) to process now, empty while the folder is not settled
+        """
+        now, snapshot = time.monotonic(), self.Snapshot()
+        if snapshot != self.current:
+            if self.current is None: # files older than settle seconds were already complete when starting
+                newest = max((source.mtime_ns for source in snapshot.values()), default=0)/1e9
+                self.last_change = now - min(self.settle, max(0.0, time.time() - newest))
+            else:
+                self.last_change = now
+            self.current = snapshot
+        changes = self.Changes(self.processed, snapshot)
+        if not changes:
+            self.detected = None
+            return {}
+        if self.detected is None:
+            self.detected = time.time()
+        if now - self.last_change < self.settle or snapshot == self.failed:
+            return {}
+        return changes
+
+    def Update(self):
+        """Update polls the folder and refreshes the outputs if it changed and settled
+
+        Returns:
+            [dict]: the refresh record (files, processing, latency) or None if nothing was refreshed
+        """
+        changes = self.Poll()
+        if not changes:
+            return None
+        snapshot, start = self.current, time.perf_counter()
+        samples = sorted(set(sample for sample, _, _ in changes))
+        print("=====================================")
+        print(f"{len(changes)} series file(s) added, modified or removed in {', '.join(samples)}, updating...")
+        try:
+            with self.tracer.Span('refresh', files=len(changes)):
+                self.refresh(changes)
+        except Exception as exception:
+            print(f"Could not update the outputs: {exception}. Waiting for the files to change.")
+            self.failed = snapshot
+            return None
+        self.processed, self.failed = snapshot, None
+        # latency from the last write of the changed files to the updated outputs. A file was detected at most one
+        # interval after it landed: older modification times (files present before watching, copies) are not used
+        landed = max([source.mtime_ns/1e9 for source in changes.values() if source is not None] + [self.detected - self.interval])
+        self.detected = None
+        record = {'files': len(changes), 'processing': time.perf_counter() - start, 'latency': time.time() - landed}
+        self.updates.append(record)
+        print(f"Outputs updated in {record['processing']:.1f}s, {record['latency']:.1f}s after the last file landed.")
+        return record
+
+    def Run(self, duration = None):
+        """Run polls the folder until Ctrl+C (or for duration seconds) and prints the latencies
+
+        Returns:
+            [list]: refresh records (see Update)
+        """
+        stop = None if duration is None else time.monotonic() + duration
+        print(f"Watching {self.directory} every {self.interval:g}s (outputs updated {self.settle:g}s after the last change), "
+              "Ctrl+C to stop.")
+        try:
+            while stop is None or time.monotonic() < stop:
+                self.Update()
+                time.sleep(self.interval if stop is None else max(0.0, min(self.interval, stop - time.monotonic())))
+        except KeyboardInterrupt:
+            pass
+        self.PrintLatencies()
+        return self.updates
+
+    def PrintLatencies(self):
+        if not self.updates:
+            print("No update.")
+            return
+        latencies = [record['latency'] for record in self.updates]
+        print("==============")
+        print(f"{len(self.updates)} update(s), latency from file landing to updated outputs: "
+              f"median {statistics.median(latencies):.1f}s, max {max(latencies):.1f}s "
+              f"(including the {self.settle:g}s the files are left to settle)")
+
+
+def WatchProcessor(processor, interval = 2.0, settle = 5.0, duration = None):
+    """WatchProcessor keeps the outputs of an IMARISDataProcessor or IMARISDendriteSumary up to date: on every
+        change, summary.xlsx is regenerated from the stored per-serie statistics (only the changed series
+        are parsed, see UpdateSummary) and the per-sample files of the changed samples are rewritten
+        (see UpdateSamples), or deleted for the samples which no longer have any serie.
+
+        The series parsed for summary.xlsx are read back from the cache to rewrite the per-sample files,
+        so a cache is enabled under .restruct_cache in the folder if the processor has none.
+
+    Returns:
+        [list]: refresh records (see FolderWatcher.Update)
+    """
+    if processor.cache is None:
+        cache_dir = os.path.join(processor.directory, '.restruct_cache')
+        print(f"Caching the series under {cache_dir}, so every changed serie is parsed once.")
+        processor.cache = SeriesCache(cache_dir)
+
+    def Refresh(changes):
+        processor.UpdateSummary()
+        processor.UpdateSamples(sorted(set(sample for sample, _, _ in changes)))
+
+    watcher = FolderWatcher(processor.directory, processor.IsSampleFolder, Refresh, interval, settle, processor.tracer)
+    return watcher.Run(duration)
@@ -0,0 +1,222 @@
+import io
+import os
+import struct
+import numpy as np
+
+
+def OpenWorkbook(filename, contents = None):
+    """OpenWorkbook returns the reader of a series file: ImsReader for the native .ims files of IMARIS
+        (requires h5py), CsvExportReader for the folders of a CSV export, WorkbookReader for the .xls/.xlsx exports,
+        parsed from contents when the file was already read (see common.prefetch)
+    """
+    if os.path.isdir(filename):
+        from .csv_export import CsvExportReader
+        return CsvExportReader(filename)
+    if os.path.splitext(filename)[-1].lower() == '.ims':
+        from .ims import ImsReader
+        return ImsReader(filename)
+    return WorkbookReader(filename, contents)
+
+
+class WorkbookPlan:
+    """ Lists the exact (sheet, column) pairs which have to be loaded from a workbook.
+
+    Columns follow the pandas.read_excel conventions used across the processors:
+    - a column name (str) is looked up in the row right after the `skiprows` skipped rows,
+      and its data starts on the following row (read_excel(skiprows=n)[name])
+    - a column position (int) has no header, its data starts right after the skipped rows
+      (read_excel(skiprows=n, usecols=[position], header=None))
+    """
+
+    def __init__(self):
+        self.sheets = {} # sheet name -> {column: skiprows}
+
+    def Add(self, sheet, column, skiprows=1):
+        self.sheets.setdefault(sheet, {})[column] = skiprows
+        return self
+
+
+class WorkbookReader:
+    """ Opens a workbook once and loads only the sheets and columns listed in a WorkbookPlan.
+
+    Sheets are parsed on demand (one pass per sheet, unloaded right after) and every requested
+    column is returned as a typed numpy array:
+    - float64 for numeric columns (empty cells become NaN)
+    - int64 when every value is integral, as pandas does for .xls files
+    - object otherwise
+
+    CountRows gives the number of rows of a sheet without reading its cells, from the dimensions
+    stored in the file (DIMENSIONS record of .xls sheets, <dimension> element of .xlsx sheets), else
+    from the parsed sheet (xlrd's nrows).
+
+    The workbook is read from filename, or parsed from its contents (bytes) when given.
+    """
+    XLS_DIMENSIONS = (0x0200, 0x0000) # BIFF8 and BIFF2 record types
+    XLS_EOF = 0x000A
+
+    def __init__(self, filename, contents = None):
+        self.filename = filename
+        self.contents = contents
+        self.book = None
+        self.sheets_parsed = 0
+        self.is_xls = os.path.splitext(filename)[-1].lower() == '.xls'
+
+    def __enter__(self):
+        self.Open()
+        return self
+
+    def __exit__(self, *args):
+        self.Close()
+
+    def Open(self):
+        if self.book is not None:
+            return
+        if self.is_xls:
+            import xlrd
+            self.book = xlrd.open_workbook(self.filename, file_contents=self.contents, on_demand=True)
+        else:
+            import openpyxl
+            source = self.filename if self.contents is None else io.BytesIO(self.contents)
+            self.book = openpyxl.load_workbook(source, read_only=True, data_only=True)
+
+    def Close(self):
+        if self.book is None:
+            return
+        if self.is_xls:
+            self.book.release_resources()
+        else:
+            self.book.close()
+        self.book = None
+
+    def SheetNames(self):
+        self.Open()
+        return self.book.sheet_names() if self.is_xls else self.book.sheetnames
+
+    def CountRows(self, sheet):
+        """CountRows returns the number of rows of a sheet, up to the last used one. It falls back to
+            streaming through the rows when the file does not store the dimensions of the sheet.
+
+        Args:
+            sheet (str): sheet name
+
+        Returns:
+            [int]: number of rows, including the title and header rows
+        """
+        self.Open()
+        if sheet not in self.SheetNames():
+            raise ValueError(f"Worksheet named '{sheet}' not found in {self.filename}")
+        rows = self.DimensionRows(sheet)
+        if rows is None:
+            rows = self.StreamRows(sheet)
+        return rows
+
+    def DimensionRows(self, sheet):
+        """DimensionRows reads the number of rows of a sheet from its stored dimensions
+
+        Returns:
+            [int]: number of rows, None if the dimensions are not stored or could not be read
+        """
+        if not self.is_xls:
+            rows = self.book[sheet].max_row
+            return rows if rows is not None and rows > 1 else None # unsized sheets may declare "A1"
+        try:
+            rows = self.XlsDimensionRows(sheet)
+        except (AttributeError, IndexError, struct.error): # other xlrd internals, or an unexpected record
+            return None
+        return rows if isinstance(rows, int) and rows >= 0 else None
+
+    def XlsDimensionRows(self, sheet):
+        """XlsDimensionRows finds the DIMENSIONS record of an .xls sheet in the workbook stream kept by xlrd, from
+            the offset of the sheet (xlrd internals, see the version pinned in setup.py)
+        """
+        mem = self.book.mem
+        position = self.book._sh_abs_posn[self.SheetNames().index(sheet)]
+        while position + 4 <= len(mem):
+            record, length = struct.unpack('<HH', mem[position:position+4])
+            data = mem[position+4:position+4+length]
+            if record in self.XLS_DIMENSIONS and length:
+                if self.book.biff_version >= 80:
+                    return struct.unpack('<i', data[4:8])[0] # index of the last row + 1
+                return struct.unpack('<H', data[2:4])[0]
+            if record == self.XLS_EOF:
+                return None
+            position += 4 + length
+        return None
+
+    def StreamRows(self, sheet):
+        """StreamRows counts the rows of a sheet up to the last non-empty one, without keeping them
+        """
+        if self.is_xls:
+            rows = self.book.sheet_by_name(sheet).nrows
+            self.book.unload_sheet(sheet)
+        else:
+            rows = 0
+            for position, row in enumerate(self.book[sheet].iter_rows(values_only=True), start=1):
+                if any(value is not None and value != '' for value in row):
+                    rows = position
+        self.sheets_parsed += 1
+        return rows
+
+    def Read(self, plan):
+        """Read loads every (sheet, column) of the plan.
+
+        Args:
+            plan (WorkbookPlan): sheets and columns to load
+
+        Returns:
+            [dict]: (sheet, column) -> np.ndarray
+        """
+        self.Open()
+        data = {}
+        for sheet, columns in plan.sheets.items():
+            if sheet not in self.SheetNames():
+                raise ValueError(f"Worksheet named '{sheet}' not found in {self.filename}")
+            for column, values in self.ReadSheetColumns(sheet, columns).items():
+                data[(sheet, column)] = self.ToArray(values)
+        return data
+
+    def ReadSheetColumns(self, sheet, columns):
+        """ReadSheetColumns parses a single sheet and keeps only the requested columns
+
+        Args:
+            sheet (str): sheet name
+            columns (dict): column (name or position) -> number of skipped rows
+
+        Returns:
+            [dict]: column -> list of raw cell values
+        """
+        if self.is_xls:
+            xl_sheet = self.book.sheet_by_name(sheet)
+            header_row = lambda rowx: xl_sheet.row_values(rowx) if rowx < xl_sheet.nrows else []
+            column_values = lambda position, start: xl_sheet.col_values(position, start) if position < xl_sheet.ncols else [None]*max(0, xl_sheet.nrows-start)
+        else:
+            rows = [list(row) for row in self.book[sheet].iter_rows(values_only=True)]
+            header_row = lambda rowx: rows[rowx] if rowx < len(rows) else []
+            column_values = lambda position, start: [row[position] if position < len(row) else None for row in rows[start:]]
+
+        data = {}
+        for column, skiprows in columns.items():
+            if isinstance(column, str):
+                header = header_row(skiprows)
+                if column not in header:
+                    raise KeyError(f"Column '{column}' not found in sheet '{sheet}' of {self.filename}")
+                data[column] = column_values(header.index(column), skiprows+1)
+            else:
+                data[column] = column_values(column, skiprows)
+        if self.is_xls:
+            self.book.unload_sheet(sheet)
+        self.sheets_parsed += 1
+        return data
+
+    @staticmethod
+    def ToArray(values):
+        values = [np.nan if value is None or value == '' else value for value in values]
+        if any(isinstance(value, str) for value in values):
+            return np.asarray(values, dtype=object)
+        try:
+            array = np.asarray(values, dtype=np.float64)
+        except (TypeError, ValueError):
+            return np.asarray(values, dtype=object)
+        if array.size and not np.isnan(array).any() and np.array_equal(array, np.floor(array)):
+            return array.astype(np.int64)
+        return array
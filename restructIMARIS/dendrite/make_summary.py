@@ -1,11 +1,29 @@
 import pandas as pd
 import json
 import os
+import contextlib
 from datetime import date
-import seaborn as sns
-import matplotlib.pyplot as plt
+from ..common.parallel import SeriesPool
+from ..common.workbook import WorkbookPlan, OpenWorkbook
+from ..common.cache import SeriesCache
+from ..common.accumulator import FrameAccumulator
+from ..common.schema import FrameSchema
+from ..common.columnar import ColumnarStore
+from ..common.statistics import OnlineStatistics
+from ..common.state_store import StatisticsStore
+from ..common.plotting import BoxPlotRenderer, AggregateBoxPlot
+from ..common.tracing import Tracer
+from ..common.experiment_index import ExperimentIndex
+from ..common.output import OutputWriter
+from ..common.aggregation import MetricPlan
+from ..common.result_store import ResultStore
+from ..common.comparison import SampleComparison
+from ..common.prefetch import Prefetcher
 class IMARISDendriteSumary:
-    def __init__(self, directory, dir_config = None):
+    def __init__(self, directory, dir_config = None, parallel = False, workers = None,
+                 cache_dir = None, cache_size = SeriesCache.DEFAULT_MAX_BYTES, trace = False,
+                 output_formats = ('xlsx',), constant_memory = False, write_in_background = False, result_store = None,
+                 resamples = 0, prefetch_bytes = 0, approximate_resampling = False):
         if dir_config is None:
             self.config_filename_path = "." +os.sep
         else:
@@ -14,53 +32,101 @@ class IMARISDendriteSumary:
             self.config_filename_path,"config_dendrite.json"
         )
         self.directory = directory + os.sep
+        self.pool = SeriesPool(workers if parallel else 1)
+        self.cache = None if cache_dir is None else SeriesCache(cache_dir, cache_size)
+        self.tracer = Tracer(trace) # see common.tracing, self.tracer.Report(filename) at the end of the run
+        # per-sample files: formats ('xlsx', 'csv', 'parquet'), row by row xlsx, background thread (see common.output)
+        self.writer = OutputWriter(output_formats, constant_memory, write_in_background, tracer=self.tracer)
+        self.index = None # ExperimentIndex of the directory, built by IdentifySamples
+        # SQLite file where the dendrites of every run are appended, to query them across experiments (see common.result_store)
+        self.results = None if result_store is None else ResultStore(result_store)
+        self.run_id = None
+        # bootstrap resamples and permutations of the "comparison" sheet of summary.xlsx, 0: none (see common.comparison)
+        self.comparison = SampleComparison(resamples, approximate=approximate_resampling) if resamples else None
+        # bytes of upcoming series files read ahead while the current one is parsed, 0: none (see Prefetch)
+        self.prefetch_bytes = prefetch_bytes
+        self.prefetcher = None
+        self.schema = FrameSchema(counts=['Overall'])
         self.ReadConfigFile()
 
 
     def ReadConfigFile(self):
         with open(self.config_filename_path) as json_data_file:
             data=json.load(json_data_file)
+        self.config = data
         self.sample_labels = data['SampleLabels']
         self.sheets = data['Sheets']
         self.overall = data["OverallSheet"]
+        # statistics selected per sheet, plus the total of filaments (see common.aggregation)
+        self.metric_plan = MetricPlan.FromConfig(self.sheets).Add('Overall', ['sum'])
 
-    def ProcessData(self):
-        self.samples = self.IdentifySamples()
-        self.samples_df = pd.DataFrame()
+    def ProcessData(self, save_to_pickle = True, save_to_columnar = False):
+        """ProcessData extracts the data of every series of every sample
+
+        Args:
+            save_to_pickle (bool, optional): Save dataframe containing all the samples data. Defaults to True.
+            save_to_columnar (bool, optional): Save dataframe containing all the samples data as a Parquet dataset
+                partitioned by sample (requires pyarrow). Defaults to False.
+
+        Returns:
+            [pd.DataFrame]: samples data
+        """
+        with self.tracer.Span('identify'):
+            self.samples = self.IdentifySamples()
+            samples_series = [(sample, self.IdentifySeries(sample)) for sample in self.samples]
+        if self.results is not None:
+            self.run_id = self.results.BeginRun('dendrite', self.directory, self.config)
+        samples_df = FrameAccumulator(trailing=['Sample'], categorical=True)
+        jobs = [(sample, serie) for sample, series in samples_series for serie in series]
+        with self.Prefetch(jobs):
+            # in the same order as jobs; lazily when writing in the background, so parsing overlaps with writing
+            pool_map = self.pool.IMap if self.writer.background else self.pool.Map
+            series_results = map(self.tracer.Absorb, pool_map(self.tracer.Collect(self.ExtractExcelData), jobs))
         
-        for sample in self.samples:
-            sample_data = self.GetSampleData(sample)
-            sample_col_df  = pd.DataFrame(
-                    {'Sample':
-                       [sample]*sample_data.shape[0]},index=sample_data.index.values)
-            sample_data = pd.concat([sample_data,sample_col_df],axis=1,sort=False)
-            sample_data.reset_index(drop=True, inplace=True)
-            
-            self.samples_df = pd.concat([self.samples_df,sample_data],axis=0,sort=False)        
+            for sample, series in samples_series:
+                series_data = [(serie, next(series_results)) for serie in series]
+                self.StoreSample(sample, series_data)
+                sample_data = self.GetSampleData(sample, series_data)
+                samples_df.Add(self.schema.Downcast(sample_data), Sample=sample) # only the per-sample outputs keep the float64 values read
+        self.writer.Flush() # all the per-sample files are written
+        if self.results is not None:
+            self.results.FinishRun(self.run_id)
+        with self.tracer.Span('concat'):
+            self.samples_df = samples_df.Build()
             self.samples_df.reset_index(drop=True, inplace=True)
-        self.samples_df['Sample']=self.samples_df.apply(self.ReplaceSampleLabels,axis=1)
+        if not self.samples_df.empty:
+            self.ReplaceSampleLabels(self.samples_df)
         
-        self.samples_df.to_pickle(self.directory+'dendrites_data_'+ date.today().strftime("%Y%m%d")+ ".pkl")
+        if save_to_pickle:
+            with self.tracer.Span('write', output='pickle'):
+                self.samples_df.to_pickle(self.directory+'dendrites_data_'+ date.today().strftime("%Y%m%d")+ ".pkl")
+        if save_to_columnar:
+            with self.tracer.Span('write', output='parquet'):
+                ColumnarStore.Save(self.samples_df, self.directory+'dendrites_data_'+ date.today().strftime("%Y%m%d")+ ".parquet")
         return self.samples_df
 
-    def ReplaceSampleLabels(self,datarow):
-        return self.sample_labels[datarow['Sample']]
+    def ReplaceSampleLabels(self,dataframe):
+        """ReplaceSampleLabels replaces, in place, the sample folder names by their labels (see config file)
+        """
+        dataframe['Sample'] = self.schema.Relabel(dataframe['Sample'], self.sample_labels)
+
     def IdentifySamples(self):
-        """IdentifySamples finds all the samples (each sample has its own folder)  
+        """IdentifySamples finds all the samples (each sample has its own folder) and indexes their series files
+            (see ExperimentIndex)
         
         Returns:
             [list]: contains sample names
         """
-
-        list_samples =[]
-        entries = os.listdir(self.directory) # all files/folder within provided directory
-        for entry in entries:
-            if os.path.isdir(self.directory+entry) and 'Sample' in entry: # if it is a folder and contains "Sample"
-                list_samples.append(entry) # added to the list of samples
-        list_samples.sort() # sort them 
+        self.index = ExperimentIndex(self.directory, include_sample=self.IsSampleFolder)
+        list_samples = self.index.Samples() # sorted
+        self.index.ReportIncomplete([ExperimentIndex.DEFAULT_ROLE])
         self.samples_name = list_samples
         self.VerifySampleNames()
         return list_samples        
+
+    @staticmethod
+    def IsSampleFolder(name):
+        return 'Sample' in name # if it is a folder and contains "Sample"
     
     def VerifySampleNames(self):
         if not self.sample_labels:
@@ -76,28 +142,38 @@ class IMARISDendriteSumary:
         Returns:
             [list]: contains the list of series existing for a given sample
         """
-        list_series = []
-        entries = os.listdir(os.path.join(self.directory,sample_name))
-        for entry in entries:
-            splitted = os.path.splitext(entry) 
-            if splitted[-1]==".xls": # we are expecting per series to exist a "spots" excel
-                list_series.append(splitted[0].split('_')[0])
-        list_series.sort()
-        return list_series  
+        return self.index.Series(sample_name, [ExperimentIndex.DEFAULT_ROLE])
+
+    def SerieFile(self, sample_name, serie_name):
+        """SerieFile returns the "Series[XX].xls" (or native "Series[XX].ims") file of the index (SeriesFile: path, size and mtime_ns)
+        """
+        source = self.index.File(sample_name, serie_name, ExperimentIndex.DEFAULT_ROLE)
+        if source is None:
+            raise Exception(f"No file for serie {serie_name} of sample {sample_name}.")
+        return source
 
-    def GetSampleData(self, sample_name):
+    def GetSampleData(self, sample_name, series_data = None):
+        """GetSampleData concatenates the data of all the series of a sample and saves it to excel.
+
+        Args:
+            sample_name (str): sample folder name
+            series_data ([list], optional): (serie, dataframe) pairs already extracted, e.g. by the worker pool.
+                Defaults to None, in which case the series are extracted here.
+
+        Returns:
+            [pd.DataFrame]: sample data
+        """
         print("Processing {}".format(sample_name))
-        sample_data = pd.DataFrame() # dataframe which will contain all the sample data
-        filename = os.path.join(self.directory, sample_name)
-        series = self.IdentifySeries(sample_name)
-        for serie in series:
+        sample_data = FrameAccumulator(trailing=['Series'], categorical=True) # will contain all the sample data
+        if series_data is None:
+            series_data = [(serie, None) for serie in self.IdentifySeries(sample_name)]
+        for serie, series_df in series_data:
             print("Loading {} ...".format(serie))
-            series_df = self.ExtractExcelData(sample_name,serie)
-            series_col_df  = pd.DataFrame(
-                    {'Series':
-                       [serie]*series_df.shape[0]},index=series_df.index.values)
-            series_df = pd.concat([series_df,series_col_df],axis=1,sort=False)
-            sample_data = pd.concat([sample_data,series_df],axis=0,sort=False)
+            if series_df is None:
+                series_df = self.ExtractExcelData(sample_name,serie)
+            sample_data.Add(series_df, Series=serie)
+        with self.tracer.Span('concat', sample=sample_name):
+            sample_data = sample_data.Build()
         self.SaveSampleDataToExcel(sample_data,sample_name)
         # writer = pd.ExcelWriter(self.directory+sample_name+'.xlsx',mode='w')
         # sample_data.to_excel(writer)
@@ -106,75 +182,209 @@ class IMARISDendriteSumary:
     
 
 
+    def StoreSample(self, sample_name, series_data):
+        """StoreSample appends the dendrites of every serie of a sample to the result store, if any
+
+        Args:
+            series_data (list): (serie, dataframe) pairs
+        """
+        if self.results is None:
+            return
+        with self.tracer.Span('write', sample=sample_name, output='store'):
+            for serie, series_df in series_data:
+                self.results.Add('dendrites', self.run_id, sample_name, self.sample_labels[sample_name], serie, series_df)
+            self.results.Commit()
+
+    def UpdateSamples(self, samples):
+        """UpdateSamples rewrites the per-sample files of the given samples only, e.g. after some of their series
+            changed (see common.watch). Uses the index of the last IdentifySamples; the series are read from
+            the cache when enabled, so only the new or modified ones are parsed.
+
+        Args:
+            samples (list): sample folder names; the files of those without any serie (e.g. removed) are deleted
+        """
+        for sample in samples:
+            series = self.IdentifySeries(sample)
+            if not series:
+                for filename in self.writer.Remove(self.directory+sample, ["series", "summary"]):
+                    print("Removed {}".format(filename))
+                continue
+            jobs = [(sample, serie) for serie in series]
+            with self.Prefetch(jobs):
+                series_results = self.pool.Map(self.tracer.Collect(self.ExtractExcelData), jobs)
+            self.GetSampleData(sample, list(zip(series, map(self.tracer.Absorb, series_results))))
+        self.writer.Flush()
+
+    def CacheConfig(self):
+        """CacheConfig returns the configuration which drives the extraction of a series file (see SeriesCache)
+        """
+        return [list(self.sheets.keys()), self.overall]
+
+    @contextlib.contextmanager
+    def Prefetch(self, jobs):
+        """Prefetch reads ahead, within the block, the files of the series of jobs which are not in the cache
+            (see common.prefetch). Nothing is prefetched when disabled or when the series are parsed by worker processes.
+        """
+        if not self.prefetch_bytes or (self.pool.workers > 1 and len(jobs) > 1):
+            yield
+            return
+        sources = [self.SerieFile(sample, serie) for sample, serie in jobs]
+        if self.cache is not None:
+            sources = [source for source in sources if not self.cache.Has(source.path, self.CacheConfig(), stat=source[1:])]
+        self.prefetcher = Prefetcher(self.prefetch_bytes, tracer=self.tracer)
+        try:
+            self.prefetcher.Schedule(sources)
+            yield
+        finally:
+            self.prefetcher.Close()
+            self.prefetcher = None
+
     def ExtractExcelData(self,sample_name,series_name):
-        filename = os.path.join(self.directory, sample_name, series_name+".xls")
-        xls = pd.ExcelFile(filename)
-        series_df = pd.DataFrame()
-        number_filaments = self.ExistFilaments(xls)
-        if number_filaments == 0:
-            return series_df
-        
-        for sheet in self.sheets.keys():
-            sheet_series = pd.read_excel(xls,
-                                sheet_name=sheet,
-                                skiprows=2,usecols=[0],header=None)
-            series_df = pd.concat([series_df, sheet_series],axis=1,sort=False)
-        name_cols = list(self.sheets.keys()) + ["Overall"]
-        number_filaments_series = pd.Series([number_filaments] + [0]*(series_df.shape[0]-1))
-        series_df = pd.concat([series_df,number_filaments_series],axis=1,sort=False)
-        series_df.set_axis([name for name in name_cols], axis=1, inplace=True)
-        
-        return series_df
+        source = self.SerieFile(sample_name, series_name)
+        self.tracer.Count('series')
+        with self.tracer.Span('parse', sample=sample_name, serie=series_name):
+            if self.cache is None:
+                return self.ReadDendriteWorkbook(source)
+            return self.cache.Fetch(source.path, self.CacheConfig(),
+                                    lambda filename: self.ReadDendriteWorkbook(source), stat=source[1:])
+
+    def ReadDendriteWorkbook(self, source):
+        self.tracer.Count('bytes read', source.size)
+        contents = None if self.prefetcher is None else self.prefetcher.Take(source)
+        with OpenWorkbook(source.path, contents) as workbook:
+            number_filaments = self.ExistFilaments(workbook)
+            if number_filaments == 0:
+                self.tracer.Count('sheets parsed', workbook.sheets_parsed)
+                return pd.DataFrame()
+            plan = WorkbookPlan()
+            for sheet in self.sheets.keys():
+                plan.Add(sheet, 0, skiprows=2)
+            columns = workbook.Read(plan)
+        self.tracer.Count('sheets parsed', workbook.sheets_parsed)
 
-    def ExistFilaments(self,xls_file):
+        series_df = pd.DataFrame({sheet: pd.Series(columns[(sheet, 0)])
+                                    for sheet in self.sheets.keys()})
+        series_df["Overall"] = pd.Series([number_filaments] + [0]*(series_df.shape[0]-1))
+        self.tracer.Count('dendrites read', len(series_df))
+        return self.schema.Apply(series_df)
+
+    def ExistFilaments(self,workbook):
         overall = list(self.overall.keys())[0]
-        sheet_series = pd.read_excel(xls_file,sheet_name=overall,
-                                skiprows=2,usecols=[0,1],header=None)
-        number_of_filaments = sheet_series[sheet_series[0]==self.overall[overall]][1].values[0]
+        data = workbook.Read(WorkbookPlan().Add(overall, 0, skiprows=2).Add(overall, 1, skiprows=2))
+        number_of_filaments = data[(overall, 1)][data[(overall, 0)]==self.overall[overall]][0]
         return number_of_filaments
         
     def SaveSampleDataToExcel(self, sample_data,sample_name):
+        """SaveSampleDataToExcel saves the series data and the per-serie summary of a sample (xlsx by default,
+            see OutputWriter)
+        """
         print("Saving to {}".format(self.directory+sample_name+'.xlsx'))
-        writer = pd.ExcelWriter(self.directory+sample_name+'.xlsx',mode='w')
-        sample_data.to_excel(writer,sheet_name="series")
-        metrics_df = sample_data.groupby('Series').describe()
-        # metrics_df = metrics_df
-        output_metrics = pd.DataFrame()
-        row = 0;
-        cols_selection = []
-        for sheet,out_metrics in self.sheets.items():
-            metrics_df[sheet,'sum'] = sample_data.groupby('Series')[sheet].sum()
-            sheet_vec = [sheet]*(len(out_metrics))
-            l = list(zip(sheet_vec,out_metrics))
-            cols_selection = cols_selection + l
-        
-        metrics_df['Overall', 'sum'] = sample_data.groupby('Series')['Overall'].sum()
-        cols_selection = cols_selection + [('Overall', 'sum')]
-        metrics_df[cols_selection].to_excel(writer,sheet_name="summary")
-        writer.save()
+        with self.tracer.Span('aggregate', sample=sample_name):
+            metrics_df = self.metric_plan.Aggregate(sample_data, 'Series')
+        self.writer.Write(self.directory+sample_name, {"series": sample_data, "summary": metrics_df})
         return                                
     def SaveToExcel(self, dendrites_data_):
+        with self.tracer.Span('aggregate'):
+            metrics_df = self.metric_plan.Aggregate(dendrites_data_, 'Sample')
+        comparison = None
+        if self.comparison is not None:
+            with self.tracer.Span('compare', resamples=self.comparison.resamples):
+                features = list(self.sheets.keys())
+                comparison = (self.comparison.Intervals(dendrites_data_, 'Sample', features),
+                              self.comparison.Tests(dendrites_data_, 'Sample', features))
+        self.WriteSummary(metrics_df, comparison)
+
+    def WriteSummary(self, metrics_df, comparison = None):
+        """WriteSummary saves to summary.xlsx the metrics selected in the config file
+        
+        Args:
+            metrics_df (pd.DataFrame): per sample (rows), describe statistics and sum of each column
+            comparison (tuple, optional): bootstrap intervals and permutation tests of the means of the sheets
+                (see common.comparison), written to a "comparison" sheet. Defaults to None.
+        """
         print("Saving to {}".format(self.directory+'summary.xlsx'))
+        cols_selection = self.metric_plan.Columns()
+        with self.tracer.Span('write', output='summary'), pd.ExcelWriter(self.directory+'summary.xlsx',mode='w') as writer:
+            metrics_df[cols_selection].unstack(1).to_excel(writer)
+            if comparison is not None:
+                SampleComparison.WriteSheet(writer, *comparison)
+
+    def ExtractSerieState(self, sample_name, serie_name):
+        """ExtractSerieState parses a serie and reduces each of its columns to a mergeable OnlineStatistics state
+        """
+        series_df = self.ExtractExcelData(sample_name, serie_name)
+        with self.tracer.Span('aggregate', sample=sample_name, serie=serie_name):
+            return {column: OnlineStatistics(StatisticsStore.SKETCH_SIZE).Update(series_df[column].values).ToDict()
+                    for column in series_df.columns}
 
-        metrics_df = dendrites_data_.groupby('Sample').describe()
-        output_metrics = pd.DataFrame()
-        row = 0;
-        cols_selection = []
-        for sheet,out_metrics in self.sheets.items():
-            metrics_df[sheet,'sum'] = dendrites_data_.groupby('Sample')[sheet].sum()
-            sheet_vec = [sheet]*(len(out_metrics))
-            l = list(zip(sheet_vec,out_metrics))
-            cols_selection = cols_selection + l
-        metrics_df['Overall', 'sum'] = dendrites_data_.groupby('Sample')['Overall'].sum()
-        cols_selection = cols_selection + [('Overall', 'sum')]
-        writer = pd.ExcelWriter(self.directory+'summary.xlsx',mode='w')
-        metrics_df[cols_selection].unstack(1).to_excel(writer)
-        writer.save()
+    def UpdateSummary(self, state_filename = None):
+        """UpdateSummary regenerates summary.xlsx from per-serie statistics states stored next to the data: only
+            the series which are new or were modified since the last update are parsed, the states of the series
+            which disappeared are dropped and the remaining ones are merged per sample.
+        
+        Args:
+            state_filename (str, optional): file storing the states. Defaults to [directory]/.restruct_state_dendrite.json.
+        
+        Returns:
+            [pd.DataFrame]: describe statistics and sums per sample
+        """
+        if state_filename is None:
+            state_filename = os.path.join(self.directory, '.restruct_state_dendrite.json')
+        store = StatisticsStore(state_filename)
+        with self.tracer.Span('identify'):
+            self.samples = self.IdentifySamples()
+            samples_series = [(sample, self.IdentifySeries(sample)) for sample in self.samples]
+        store.Retain(samples_series)
+
+        config = [list(self.sheets.keys()), self.overall]
+        fingerprints = {}
+        jobs = []
+        for sample, series in samples_series:
+            for serie in series:
+                fingerprints[(sample, serie)] = StatisticsStore.Fingerprint([self.SerieFile(sample, serie)], config)
+                if store.Get(sample, serie, fingerprints[(sample, serie)]) is None:
+                    jobs.append((sample, serie))
+        print(f"{len(jobs)} new or modified series out of {len(fingerprints)}.")
+        with self.Prefetch(jobs):
+            states = map(self.tracer.Absorb, self.pool.IMap(self.tracer.Collect(self.ExtractSerieState), jobs))
+            for (sample, serie), state in zip(jobs, states):
+                store.Put(sample, serie, fingerprints[(sample, serie)], state)
+        with self.tracer.Span('write', output='states'):
+            store.Save()
+
+        samples_states = {} # sample label -> list of per-serie states
+        for sample, series in samples_series:
+            for serie in series:
+                state = store.Get(sample, serie, fingerprints[(sample, serie)])
+                if state:
+                    samples_states.setdefault(self.sample_labels[sample], []).append(state)
+        if not samples_states:
+            return pd.DataFrame()
+
+        with self.tracer.Span('aggregate'):
+            statistics = {label: OnlineStatistics.MergeStates(states) for label, states in samples_states.items()}
+            metrics_df = OnlineStatistics.ToMetrics(statistics, percentiles=self.metric_plan.Quantiles())
+            for column in list(self.sheets.keys()) + ['Overall']:
+                metrics_df[column, 'sum'] = [statistics[label][column].sum for label in metrics_df.index]
+        self.WriteSummary(metrics_df)
+        return metrics_df
     
-    def GenerateBoxPlot(self,dataframe, feature, x_range = [], swarmplot=True, visualize = False):
+    def GenerateBoxPlot(self,dataframe, feature, x_range = [], swarmplot=True, visualize = False, point_budget = None):
+        """GenerateBoxPlot plots feature per sample
+
+        Args:
+            point_budget (int, optional): if the data has more rows, the boxes are computed from per-sample
+                statistics (see common.plotting.AggregateBoxPlot). Defaults to None (seaborn).
+        """
+        import matplotlib.pyplot as plt # plotting libraries are only loaded when plots are made
+        import seaborn as sns
         print("Saving boxplot for {}".format(feature))
         f, ax = plt.subplots() # Figure size is set here, you can adjust it
-        sns.boxplot(x=feature, y="Sample", data=dataframe, palette=sns.light_palette((210, 90, 60), input="husl"))
+        palette = sns.light_palette((210, 90, 60), input="husl")
+        if point_budget is not None and len(dataframe) > point_budget:
+            AggregateBoxPlot(point_budget).Draw(ax, dataframe, feature, colors=palette, strip=False)
+        else:
+            sns.boxplot(x=feature, y="Sample", data=dataframe, palette=palette)
         ax.xaxis.grid(True)
         ax.set(ylabel="")
         plt.tight_layout()
@@ -182,8 +392,28 @@ class IMARISDendriteSumary:
             plt.show()
         else:
             f.savefig(self.directory+feature+date.today().strftime('%Y%m%d')+".pdf")
+            plt.close(f)
         return
 
+    def GenerateBoxPlots(self, dataframe, features, workers = None, point_budget = None):
+        """GenerateBoxPlots saves the box plots of several features to PDF, rendered without display
+            on a pool of worker processes (see common.plotting.BoxPlotRenderer)
+
+        Args:
+            dataframe (pd.DataFrame): samples data
+            features ([list]): columns to plot
+            workers (int, optional): number of worker processes. Defaults to None (one per core).
+            point_budget (int, optional): see GenerateBoxPlot. Defaults to None.
+
+        Returns:
+            [dict]: feature -> rendering time in seconds
+        """
+        features = list(features)
+        with self.tracer.Span('plot', features=len(features)):
+            timings = BoxPlotRenderer(workers).Render(self, dataframe, features, point_budget=point_budget)
+        self.tracer.Count('plots', len(features))
+        return timings
+
 
 
         
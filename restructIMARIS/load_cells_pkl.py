@@ -1,20 +1,32 @@
-from cells.restruct_data import IMARISDataProcessor
-import sys        
-import easygui
+POINT_BUDGET = None # if set (e.g. 20000), datasets with more rows are plotted from per-sample statistics with a rasterised strip layer; None: every point is drawn by seaborn
+STRIP_LAYER = 'points' # strip layer above POINT_BUDGET rows: 'points' (at most POINT_BUDGET points) or 'density' (per-sample histogram of every value)
+
+import sys
 import os
+if __package__ in (None, ''): # run as a script from the restructIMARIS folder: import it as a package from its parent folder
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from restructIMARIS.cells.restruct_data import IMARISDataProcessor
+from restructIMARIS.common.columnar import ColumnarStore
 import pandas as pd
 if __name__ == "__main__":
     if  len(sys.argv)>1:
-        cells_data = sys.argv[1]
+        file_path = sys.argv[1].rstrip(os.sep) # cells_xxx_.pkl file or cells_xxx_.parquet folder
     else: 
+        import easygui # the GUI is only loaded when no folder is given
         file_path= easygui.fileopenbox(msg="Select cells_xxx_.pkl file.")
     directory =  os.path.dirname(file_path)+os.sep
     processor = IMARISDataProcessor(directory)
     
+    if os.path.isdir(file_path): # columnar dataset: only read the plotted feature
+        for feature in processor.CELLS_SHEET_COLUMN.keys():
+            samples_data = ColumnarStore.Load(file_path, columns=[feature])
+            processor.GenerateBoxPlot(samples_data,feature,visualize=False, point_budget=POINT_BUDGET, strip_layer=STRIP_LAYER)
+        sys.exit()
+
     samples_data = pd.read_pickle(file_path)
     if samples_data.empty: 
+        import easygui
         easygui.msgbox("No data. Are you sur you provided the correct path?", "Error")
         sys.exit()
    
-    for feature in processor.CELLS_SHEET_COLUMN.keys():
-         processor.GenerateBoxPlot(samples_data,feature,visualize=False)
+    processor.GenerateBoxPlots(samples_data, processor.CELLS_SHEET_COLUMN.keys(), point_budget=POINT_BUDGET, strip_layer=STRIP_LAYER)
@@ -1,24 +1,34 @@
-from dendrite.make_summary import IMARISDendriteSumary
-import sys        
-import easygui
+POINT_BUDGET = None # if set (e.g. 20000), datasets with more rows are plotted from per-sample statistics; None: the boxes are drawn by seaborn
+
+import sys
 import os
+if __package__ in (None, ''): # run as a script from the restructIMARIS folder: import it as a package from its parent folder
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from restructIMARIS.dendrite.make_summary import IMARISDendriteSumary
+from restructIMARIS.common.columnar import ColumnarStore
 import pandas as pd
-import numpy as np
 
 if __name__ == "__main__":
     if  len(sys.argv)>1:
-        cells_data = sys.argv[1]
+        file_path = sys.argv[1].rstrip(os.sep) # dendrites_xxx_.pkl file or dendrites_xxx_.parquet folder
     else: 
+        import easygui # the GUI is only loaded when no folder is given
         file_path= easygui.fileopenbox(msg="Select dendrite_xxx_.pkl file.")
     directory =  os.path.dirname(file_path)+os.sep
     processor = IMARISDendriteSumary(directory)
     
+    if os.path.isdir(file_path): # columnar dataset: only read the plotted feature
+        for feature in ColumnarStore.NumericColumns(file_path):
+            samples_data = ColumnarStore.Load(file_path, columns=[feature])
+            processor.GenerateBoxPlot(samples_data,feature,visualize=False, point_budget=POINT_BUDGET)
+        sys.exit()
+
     samples_data = pd.read_pickle(file_path)
     if samples_data.empty: 
+        import easygui
         easygui.msgbox("No data. Are you sur you provided the correct path?", "Error")
         sys.exit()
    
-    for feature in samples_data.columns.values:
-        if (np.issubdtype(samples_data[feature].dtype, np.number)):
-            processor.GenerateBoxPlot(samples_data,feature,visualize=False)
-         
+    features = [feature for feature in samples_data.columns.values
+                if pd.api.types.is_numeric_dtype(samples_data[feature].dtype)]
+    processor.GenerateBoxPlots(samples_data, features, point_budget=POINT_BUDGET)
@@ -1,23 +1,56 @@
 VISUALIZE = False # if True, it just shows the plot; if false, the plot is saved to PDF
+PARALLEL = False # if True, the series files are parsed on a pool of worker processes (one per core)
+CACHE = False # if True, the data extracted from each series file is cached under .restruct_cache in the folder so reruns only parse new/modified files
+INCREMENTAL = False # if True, only summary.xlsx is updated, from stored per-series statistics (only new/modified series are parsed; no plots)
+COLUMNAR = False # if True, the results are also saved as Parquet datasets partitioned by sample (requires pyarrow)
+PLOT_WORKERS = None # number of processes rendering the plots when VISUALIZE is False (None: one per core, 1: no pool)
+POINT_BUDGET = None # if set (e.g. 20000), datasets with more rows are plotted from per-sample statistics; None: the boxes are drawn by seaborn
+TRACE = False # if True, the time spent in every stage is printed and saved to restruct_trace_dendrite.json (chrome://tracing format)
+OUTPUT_FORMATS = ['xlsx'] # formats of the per-sample files: any of 'xlsx', 'csv' and 'parquet' (requires pyarrow)
+CONSTANT_MEMORY = False # if True, the per-sample xlsx files are streamed to disk row by row (requires xlsxwriter)
+BACKGROUND_WRITER = False # if True, the per-sample files are written on a background thread while the next sample is processed
+WATCH = False # if True, summary.xlsx and the per-sample files are kept up to date while IMARIS exports the series (Ctrl+C to stop; no plots)
+RESULT_STORE = None # SQLite file (e.g. 'results.sqlite') where the rows of every run are appended, to compare experiments (see common.result_store)
+RESAMPLES = 0 # if > 0, summary.xlsx gets a "comparison" sheet: bootstrap confidence intervals of the means per sample and permutation tests between samples, with this many resamples (e.g. 10000)
+APPROXIMATE_RESAMPLING = False # if True, the samples of more than 2000 cells are resampled by strata: much faster, but the intervals and p-values are a normal approximation (labelled approx.)
+PREFETCH_BYTES = 0 # if set (e.g. 256*1024**2), up to this many bytes of upcoming series files are read while the current one is parsed (when PARALLEL is False), which hides the transfers of a network share
 
-import sys        
-import easygui
-from dendrite.make_summary import IMARISDendriteSumary
+import sys
 import os
-import numpy as np
+if __package__ in (None, ''): # run as a script from the restructIMARIS folder: import it as a package from its parent folder
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from restructIMARIS.dendrite.make_summary import IMARISDendriteSumary
+import pandas as pd
 
 if __name__ == "__main__":
     if  len(sys.argv)>1:
         directory = sys.argv[1]
     else: 
+        import easygui # the GUI is only loaded when no folder is given
         directory= easygui.diropenbox()+os.sep
-    processor = IMARISDendriteSumary(directory)
-    samples_data = processor.ProcessData()
+    processor = IMARISDendriteSumary(directory, parallel=PARALLEL,
+                    cache_dir=os.path.join(directory, '.restruct_cache') if CACHE else None, trace=TRACE,
+                    output_formats=OUTPUT_FORMATS, constant_memory=CONSTANT_MEMORY, write_in_background=BACKGROUND_WRITER,
+                    result_store=RESULT_STORE, resamples=RESAMPLES, prefetch_bytes=PREFETCH_BYTES,
+                    approximate_resampling=APPROXIMATE_RESAMPLING)
+    trace_file = os.path.join(directory, 'restruct_trace_dendrite.json')
+    if WATCH:
+        from restructIMARIS.common.watch import WatchProcessor
+        WatchProcessor(processor)
+        processor.tracer.Report(trace_file)
+        sys.exit()
+    if INCREMENTAL:
+        processor.UpdateSummary()
+        processor.tracer.Report(trace_file)
+        sys.exit()
+    samples_data = processor.ProcessData(save_to_columnar=COLUMNAR)
 
     processor.SaveToExcel(samples_data)
-    for feature in samples_data.columns.values:
-        if (np.issubdtype(samples_data[feature].dtype, np.number)):
-            processor.GenerateBoxPlot(samples_data,feature,visualize=False)
-         
-
-    
+    features = [feature for feature in samples_data.columns.values
+                if pd.api.types.is_numeric_dtype(samples_data[feature].dtype)]
+    if VISUALIZE:
+        for feature in features:
+            processor.GenerateBoxPlot(samples_data,feature,visualize=True, point_budget=POINT_BUDGET)
+    else:
+        processor.GenerateBoxPlots(samples_data, features, workers=PLOT_WORKERS, point_budget=POINT_BUDGET)
+    processor.tracer.Report(trace_file)
@@ -0,0 +1,35 @@
+import os
+import sys
+import json
+import pytest
+
+PARENT_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+if PARENT_DIR not in sys.path: # restructIMARIS is imported as a package, installed or not
+    sys.path.insert(0, PARENT_DIR)
+
+
+@pytest.fixture
+def experiment(tmp_path):
+    """Small synthetic experiment whose sample labels do not sort as their folders (SampleA is 'WT', SampleB 'KO')
+
+    Returns:
+        [function]: kind ('cells' or 'dendrite'), file format, configuration entries to replace
+            -> (data folder, configuration folder)
+    """
+    from restructIMARIS.benchmarks.synthetic import SyntheticExperiment, ReadConfig
+
+    def Make(kind, file_format = 'xls', **entries):
+        config_name = f'config_{kind}.json'
+        config = ReadConfig(config_name)
+        config['SampleLabels'] = {'SampleA': 'WT', 'SampleB': 'KO'}
+        config.update(entries)
+        with open(tmp_path / config_name, 'w') as json_file:
+            json.dump(config, json_file)
+        generator = SyntheticExperiment(**{f'{kind}_config': config}, file_format=file_format)
+        root = tmp_path / kind
+        if kind == 'cells':
+            generator.WriteCells(str(root), 2, 2, 30)
+        else:
+            generator.WriteDendrite(str(root), 2, 2, 30)
+        return str(root) + os.sep, str(tmp_path)
+    return Make
@@ -0,0 +1,28 @@
+import os
+import numpy as np
+import pandas as pd
+from restructIMARIS.common.cache import SeriesCache
+
+
+def test_folder_scanned_only_to_evict(tmp_path):
+    frame = pd.DataFrame({'Volume': np.arange(1000, dtype=np.float64)})
+    cache = SeriesCache(str(tmp_path))
+    cache.Put('first', frame)
+    entry_size = cache.total_bytes
+    assert entry_size == os.path.getsize(cache.EntryPath('first'))
+    cache.Put('first', frame) # replacing an entry does not count it twice
+    assert cache.total_bytes == entry_size
+
+    os.utime(cache.EntryPath('first'), (0, 0))
+    cache = SeriesCache(str(tmp_path), max_bytes=int(entry_size * 4.5))
+    assert cache.total_bytes == entry_size
+    scans = []
+    entries = cache.Entries
+    cache.Entries = lambda: scans.append(1) or entries()
+    for key in range(2, 6):
+        cache.Put(str(key), frame)
+    assert len(scans) == 1 # only once above max_bytes
+    assert cache.total_bytes <= cache.max_bytes * cache.EVICT_TO
+    assert cache.total_bytes == sum(entry.stat().st_size for entry in os.scandir(tmp_path))
+    assert not os.path.exists(cache.EntryPath('first')) # least recently used
+    assert os.path.exists(cache.EntryPath('5'))
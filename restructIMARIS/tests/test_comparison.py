@@ -0,0 +1,32 @@
+import numpy as np
+import pandas as pd
+from restructIMARIS.common.comparison import SampleComparison
+
+
+def IsResampled(sums):
+    # sums of whole values: the resamples take whole rows, no normal term
+    return np.allclose(sums, np.round(sums), rtol=0, atol=1e-6)
+
+
+def test_exact_resampling_of_large_samples():
+    first, second = np.arange(3000, dtype=np.float64), np.arange(2500, dtype=np.float64)*2
+    assert first.size > SampleComparison.EXACT_ROWS
+    comparison = SampleComparison(resamples=200)
+    rng = np.random.default_rng(0)
+    assert IsResampled(comparison.BootstrapMeans(first, rng)*first.size)
+    differences = comparison.PermutationDifferences(first, second, rng)
+    total = first.sum() + second.sum()
+    sums = (differences + total/second.size)/(1/first.size + 1/second.size) # sum of the values permuted into first
+    assert IsResampled(sums)
+    approximate = SampleComparison(resamples=200, approximate=True)
+    assert not IsResampled(approximate.BootstrapMeans(first, rng)*first.size)
+
+
+def test_approximate_results_are_labelled():
+    frame = pd.DataFrame({'Sample': ['A']*10 + ['B']*10, 'Volume': np.arange(20.0)})
+    for approximate, suffix in [(False, ''), (True, ' (approx.)')]:
+        comparison = SampleComparison(resamples=50, approximate=approximate)
+        intervals = comparison.Intervals(frame, 'Sample', ['Volume'])
+        tests = comparison.Tests(frame, 'Sample', ['Volume'])
+        assert list(intervals['Volume'].columns) == ['mean', 'CI low' + suffix, 'CI high' + suffix]
+        assert list(tests['Volume'].columns) == ['difference', 'p-value' + suffix, 'p-value (Holm)' + suffix]
@@ -0,0 +1,29 @@
+import numpy as np
+import pytest
+from restructIMARIS.common.csv_export import CsvExportReader
+from restructIMARIS.common.workbook import WorkbookPlan
+
+
+def WriteExport(tmp_path, preamble):
+    folder = tmp_path / 'Series1_cells'
+    folder.mkdir()
+    (folder / 'Series1_cells_Diameter.csv').write_text(preamble + 'Diameter,Unit,ID\n1.5,um,0\n2.5,um,1\n\n')
+    return str(folder)
+
+
+@pytest.mark.parametrize('preamble', [' \n====================\n', 'Diameter, in um\n', ' \nExported, 2024\n=====\n'])
+def test_rows_counted_from_the_title_block(tmp_path, preamble):
+    with CsvExportReader(WriteExport(tmp_path, preamble)) as workbook:
+        data = workbook.Read(WorkbookPlan().Add('Diameter', 'Diameter').Add('Diameter', 'ID')
+                             .Add('Diameter', 0, skiprows=2).Add('Diameter', 2, skiprows=2))
+        assert workbook.CountRows('Diameter') == 4
+    assert data[('Diameter', 'Diameter')].tolist() == data[('Diameter', 0)].tolist() == [1.5, 2.5]
+    assert data[('Diameter', 'ID')].dtype == np.int64 and data[('Diameter', 2)].tolist() == [0, 1]
+
+
+def test_header_matched_by_name(tmp_path):
+    folder = WriteExport(tmp_path, 'Diameter\nExported by IMARIS\n') # two title lines
+    with CsvExportReader(folder) as workbook:
+        assert workbook.Read(WorkbookPlan().Add('Diameter', 'Diameter'))[('Diameter', 'Diameter')].tolist() == [1.5, 2.5]
+        with pytest.raises(KeyError, match="'Volume'"):
+            workbook.Read(WorkbookPlan().Add('Diameter', 'Diameter').Add('Diameter', 'Volume'))
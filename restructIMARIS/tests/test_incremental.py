@@ -0,0 +1,28 @@
+import numpy as np
+from restructIMARIS.common.aggregation import MetricPlan
+from restructIMARIS.cells.restruct_data import IMARISDataProcessor
+from restructIMARIS.dendrite.make_summary import IMARISDendriteSumary
+
+
+def test_plan_quantiles():
+    plan = MetricPlan().Add('Length', ['mean', '75%', '25%']).Add('Diameter', ['90%', '25%', 'sum'])
+    assert plan.Quantiles() == [0.25, 0.75, 0.9]
+
+
+def test_dendrite_update_summary_configured_percentiles(experiment):
+    directory, config_dir = experiment('dendrite', Sheets={'Dendrite Length': ['mean', '10%', '90%'],
+                                                           'Dendrite Mean Diameter': ['50%']})
+    processor = IMARISDendriteSumary(directory, dir_config=config_dir)
+    metrics = processor.UpdateSummary()
+    assert list(metrics.index) == ['KO', 'WT']
+    exact = processor.metric_plan.Aggregate(processor.ProcessData(save_to_pickle=False), 'Sample')
+    for column in [('Dendrite Length', '10%'), ('Dendrite Length', '90%'), ('Dendrite Mean Diameter', '50%')]:
+        # the series are small enough for the sketches to be exact
+        np.testing.assert_allclose(metrics[column].to_numpy(), exact[column].to_numpy())
+
+
+def test_cells_update_summary(experiment):
+    directory, config_dir = experiment('cells')
+    metrics = IMARISDataProcessor(directory, dir_config=config_dir).UpdateSummary()
+    assert list(metrics.index) == ['KO', 'WT']
+    assert ('Intensity_Mean', '50%') in metrics.columns
@@ -0,0 +1,29 @@
+import numpy as np
+import pandas as pd
+import pytest
+from restructIMARIS.cli import BuildParser
+from restructIMARIS.common.plotting import AggregateBoxPlot, UseHeadlessBackend
+
+
+def test_seaborn_plots_by_default():
+    args = BuildParser().parse_args(['cells', 'plot', 'cells_data.pkl'])
+    assert args.point_budget is None and args.strip_layer == 'points'
+
+
+def test_density_layer_counts_every_value():
+    dataframe = pd.DataFrame({'Sample': ['WT'] * 1000 + ['KO'] * 10,
+                              'Volume': np.r_[np.linspace(0, 1, 1000), np.full(10, 0.5)]})
+    plot = AggregateBoxPlot(100, layer='density')
+    values, starts, labels = plot.Prepare(dataframe, 'Volume')
+    density, edges = plot.Density(values, starts, bins=10)
+    assert labels == ['WT', 'KO'] and density.shape == (2, 10)
+    assert (edges[0], edges[-1]) == (0, 1)
+    assert np.allclose(density[0], 1) and density[1].tolist() == [0] * 5 + [1] + [0] * 4
+    UseHeadlessBackend()
+    import matplotlib.pyplot as plt
+    f, ax = plt.subplots()
+    plot.Draw(ax, dataframe, 'Volume')
+    assert len(ax.images) == 2 and not ax.collections # one band per sample, no points
+    plt.close(f)
+    with pytest.raises(Exception):
+        AggregateBoxPlot(100, layer='violin')
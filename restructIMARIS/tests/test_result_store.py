@@ -0,0 +1,65 @@
+import pandas as pd
+from restructIMARIS import cli
+from restructIMARIS.common.result_store import ResultStore
+
+
+def Serie(cells):
+    frame = pd.DataFrame({'Vesicles': range(cells), 'Volume': [1.5]*cells}, index=pd.RangeIndex(cells, name='Cell ID'))
+    frame['Sample'] = pd.Categorical(['SampleA']*cells) # not stored
+    return frame
+
+
+def test_index_stored_as_key(tmp_path):
+    store = ResultStore(str(tmp_path / 'results.sqlite'))
+    run_id = store.BeginRun('cells', str(tmp_path), {})
+    store.Add('cells', run_id, 'SampleA', 'WT', 'Series01', Serie(3))
+    store.FinishRun(run_id)
+    assert store.Keys('cells') == ResultStore.KEYS + ['Cell ID']
+    assert store.Features('cells') == ['Vesicles', 'Volume']
+    rows = store.Query('cells')
+    assert list(rows.columns) == ['root', 'run_date'] + ResultStore.KEYS + ['Cell ID', 'Vesicles', 'Volume']
+    assert rows['Cell ID'].tolist() == [0, 1, 2]
+    assert list(store.Query('cells', columns=['Volume']).columns) == ['root', 'run_date'] + ResultStore.KEYS + ['Cell ID', 'Volume']
+    assert store.Summary('cells', store.Features('cells')).columns.get_level_values(0).unique().tolist() == ['Vesicles', 'Volume']
+    store.Close()
+    # the index columns are read back by a new connection
+    assert ResultStore(str(tmp_path / 'results.sqlite')).Features('cells') == ['Vesicles', 'Volume']
+
+
+def test_cli_query_columns(experiment, tmp_path, capsys):
+    directory, config_dir = experiment('cells')
+    store = str(tmp_path / 'results.sqlite')
+    assert cli.main(['cells', 'ingest', directory, '--config-dir', config_dir, '--result-store', store]) == 0
+    output = str(tmp_path / 'rows.csv')
+    assert cli.main(['cells', 'query', store, '--output', output]) == 0
+    rows = pd.read_csv(str(tmp_path / 'rows_cells.csv'))
+    assert list(rows.columns) == ['root', 'run_date'] + ResultStore.KEYS + ['Cell ID', 'Intensity_Mean', 'Intensity_Sum',
+                                                                            'Sphericity', 'Vesicles', 'Volume']
+    capsys.readouterr()
+    assert cli.main(['cells', 'query', store]) == 0
+    assert 'Cell ID' not in capsys.readouterr().out
+
+
+def test_latest_skips_unfinished_runs(tmp_path):
+    store = ResultStore(str(tmp_path / 'results.sqlite'))
+    complete = store.BeginRun('cells', str(tmp_path), {})
+    store.Add('cells', complete, 'SampleA', 'WT', 'Series01', Serie(3))
+    store.FinishRun(complete)
+    interrupted = store.BeginRun('cells', str(tmp_path), {})
+    store.Add('cells', interrupted, 'SampleA', 'WT', 'Series01', Serie(1))
+    store.Commit()
+    assert store.Query('cells')['run_id'].tolist() == [complete]*3
+    assert sorted(set(store.Query('cells', latest=False)['run_id'])) == [complete, interrupted]
+    store.FinishRun(interrupted)
+    assert store.Query('cells')['run_id'].tolist() == [interrupted]
+
+
+def test_runs_of_earlier_stores_are_finished(tmp_path):
+    import sqlite3
+    filename = str(tmp_path / 'results.sqlite')
+    with sqlite3.connect(filename) as connection: # as written by the first version
+        connection.execute("CREATE TABLE runs (run_id INTEGER PRIMARY KEY AUTOINCREMENT, data TEXT, root TEXT, "
+                           "run_date TEXT, started TEXT, config_hash TEXT)")
+        connection.execute("INSERT INTO runs (data, root, started) VALUES ('cells', 'x', '2020-01-01T00:00:00')")
+    connection.close()
+    assert ResultStore(filename).Runs()['finished'].tolist() == ['2020-01-01T00:00:00']
@@ -0,0 +1,43 @@
+import glob
+import numpy as np
+import pandas as pd
+from restructIMARIS.common.schema import FrameSchema
+from restructIMARIS.cells.restruct_data import IMARISDataProcessor
+from restructIMARIS.dendrite.make_summary import IMARISDendriteSumary
+
+
+def test_apply_and_downcast():
+    frame = FrameSchema(counts=['Vesicles']).Apply(pd.DataFrame({'Vesicles': [1.0, 2.0], 'Volume': [0.1, 0.2], 'Sample': ['A', 'B']}))
+    assert frame['Vesicles'].dtype == np.uint8 and frame['Volume'].dtype == np.float64
+    assert isinstance(frame['Sample'].dtype, pd.CategoricalDtype)
+    compact = FrameSchema.Downcast(frame)
+    assert compact['Volume'].dtype == np.float32 and frame['Volume'].dtype == np.float64
+    assert compact['Vesicles'].dtype == np.uint8
+
+
+def test_cells_exports_exact_values(experiment):
+    directory, config_dir = experiment('cells')
+    processor = IMARISDataProcessor(directory, dir_config=config_dir, output_formats=['xlsx', 'csv'])
+    cells, _ = processor.ExtractSamplesData(save_to_pickle=True)
+    assert cells['Volume'].dtype == np.float32 # in memory
+    saved = pd.read_pickle(glob.glob(directory + 'cells_data_*.pkl')[0])
+    assert saved['Volume'].dtype == np.float32 # downcast sample by sample, as the frame in memory
+    for sample, label in [('SampleA', 'WT'), ('SampleB', 'KO')]:
+        csv = pd.read_csv(directory + sample + '_cell_data.csv', float_precision='round_trip')['Volume'].to_numpy()
+        excel = pd.read_excel(directory + sample + '.xlsx', sheet_name='cell_data')['Volume'].to_numpy()
+        assert csv.dtype == np.float64 and (csv != csv.astype(np.float32)).any() # not rounded to float32
+        np.testing.assert_allclose(excel, csv, rtol=1e-15) # xlsx cells hold 16 significant digits
+        np.testing.assert_array_equal(saved.loc[saved['Sample'] == label, 'Volume'].to_numpy(), csv.astype(np.float32))
+
+
+def test_dendrite_exports_exact_values(experiment):
+    directory, config_dir = experiment('dendrite')
+    dendrites = IMARISDendriteSumary(directory, dir_config=config_dir, output_formats=['xlsx', 'csv']).ProcessData(save_to_pickle=True)
+    assert dendrites['Dendrite Length'].dtype == np.float32
+    saved = pd.read_pickle(glob.glob(directory + 'dendrites_data_*.pkl')[0])
+    assert saved['Dendrite Length'].dtype == np.float32
+    csv = pd.read_csv(directory + 'SampleA_series.csv', float_precision='round_trip')['Dendrite Length'].to_numpy()
+    excel = pd.read_excel(directory + 'SampleA.xlsx', sheet_name='series')['Dendrite Length'].to_numpy()
+    assert (csv != csv.astype(np.float32)).any()
+    np.testing.assert_allclose(excel, csv, rtol=1e-15)
+    np.testing.assert_array_equal(saved.loc[saved['Sample'] == 'WT', 'Dendrite Length'].to_numpy(), csv.astype(np.float32))
@@ -0,0 +1,11 @@
+import pytest
+from restructIMARIS.benchmarks.startup import IMPORTS, LAZY_MODULES, MeasureImport
+
+
+@pytest.mark.parametrize('module', IMPORTS)
+def test_imports_stay_lazy(module):
+    # in a fresh interpreter, as the modules imported by the other tests stay loaded
+    result = MeasureImport(module)
+    loaded = result['loaded']
+    assert loaded == [], f"importing {module} loads {', '.join(loaded)} (expected none of {LAZY_MODULES})"
+    assert result['top_level'] == [], f"importing {module} makes {', '.join(result['top_level'])} top-level modules"
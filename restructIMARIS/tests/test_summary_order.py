@@ -0,0 +1,60 @@
+import numpy as np
+import pandas as pd
+from restructIMARIS.common.accumulator import FrameAccumulator
+from restructIMARIS.common.aggregation import MetricPlan
+from restructIMARIS.common.comparison import SampleComparison
+from restructIMARIS.cells.restruct_data import IMARISDataProcessor
+from restructIMARIS.dendrite.make_summary import IMARISDendriteSumary
+from restructIMARIS.benchmarks.synthetic import PACKAGE_DIR
+
+
+def UnsortedFrame():
+    accumulator = FrameAccumulator(leading=['Sample'], categorical=True)
+    for sample, values in [('WT', [1.0, 2.0, 3.0]), ('KO', [4.0, 5.0]), ('Het', [6.0])]:
+        accumulator.Add(pd.DataFrame({'Volume': values}), Sample=sample)
+    return accumulator.Build()
+
+
+def test_aggregate_sorts_groups():
+    metrics = MetricPlan().Add('Volume', ['count', 'mean', '50%', 'sum']).Aggregate(UnsortedFrame(), 'Sample')
+    assert list(metrics.index) == ['Het', 'KO', 'WT']
+    assert metrics[('Volume', 'count')].tolist() == [1, 2, 3]
+    assert metrics[('Volume', '50%')].tolist() == [6.0, 4.5, 2.0]
+    assert metrics[('Volume', 'sum')].tolist() == [6.0, 9.0, 6.0]
+
+
+def test_comparison_sorts_groups():
+    groups = SampleComparison.Groups(UnsortedFrame(), 'Sample', 'Volume')
+    assert list(groups) == ['Het', 'KO', 'WT']
+    np.testing.assert_array_equal(groups['KO'], [4.0, 5.0])
+
+
+def test_cells_summary_sorted_by_label(experiment):
+    directory, config_dir = experiment('cells')
+    processor = IMARISDataProcessor(directory, dir_config=config_dir, resamples=10)
+    cells, spots = processor.ExtractSamplesData(save_to_excel=False)
+    assert cells['Sample'].iloc[0] == 'WT' # discovered first
+    metrics = processor.ExtractMetricsForSamples(cells, spots)
+    assert list(metrics.index) == ['KO', 'WT']
+    summary = pd.read_excel(directory + 'summary.xlsx', sheet_name=None, index_col=0)
+    assert list(summary['summary'].index) == ['KO', 'WT']
+    comparison = pd.read_excel(directory + 'summary.xlsx', sheet_name='comparison', header=None)
+    assert comparison.iloc[3:5, 0].tolist() == ['KO', 'WT'] # below the feature, statistic and index name rows
+
+
+def test_dendrite_summary_sorted_by_label(experiment):
+    directory, config_dir = experiment('dendrite')
+    processor = IMARISDendriteSumary(directory, dir_config=config_dir)
+    dendrites = processor.ProcessData(save_to_pickle=False)
+    processor.SaveToExcel(dendrites)
+    summary = pd.read_excel(directory + 'summary.xlsx', header=None) # one row per sheet, statistic and sample
+    assert summary.iloc[1:3, 2].tolist() == ['KO', 'WT']
+
+
+def test_determine_mbp():
+    processor = IMARISDataProcessor('.', dir_config=PACKAGE_DIR)
+    table = pd.DataFrame({'Vesicles': [10, 3], 'Nr. Spots': [4, 6]}, index=['KO', 'WT'])
+    pd.testing.assert_series_equal(processor.DetermineMBP(table), pd.Series([250.0, 50.0], index=['KO', 'WT']),
+                                   check_names=False)
+    assert processor.DetermineMBP(table.loc['WT']) == 50.0
+    assert list(table.columns) == ['Vesicles', 'Nr. Spots']
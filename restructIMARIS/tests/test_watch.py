@@ -0,0 +1,32 @@
+import os
+import shutil
+import pandas as pd
+from restructIMARIS.common.watch import WatchProcessor
+from restructIMARIS.dendrite.make_summary import IMARISDendriteSumary
+
+
+def test_watch_parses_every_serie_once(experiment):
+    directory, config_dir = experiment('dendrite')
+    processor = IMARISDendriteSumary(directory, dir_config=config_dir)
+    read = processor.ReadDendriteWorkbook
+    parsed = []
+    processor.ReadDendriteWorkbook = lambda source: parsed.append(source.path) or read(source)
+    updates = WatchProcessor(processor, interval=0.05, settle=0, duration=0.3)
+    assert len(updates) == 1
+    assert len(parsed) == 4 and len(set(parsed)) == 4 # 2 samples x 2 series
+    assert os.path.isdir(os.path.join(directory, '.restruct_cache'))
+    assert all(os.path.isfile(os.path.join(directory, name)) for name in ['summary.xlsx', 'SampleA.xlsx', 'SampleB.xlsx'])
+
+
+def test_removed_sample_outputs_are_deleted(experiment):
+    directory, config_dir = experiment('dendrite')
+    processor = IMARISDendriteSumary(directory, dir_config=config_dir, output_formats=['xlsx', 'csv'])
+    processor.UpdateSummary()
+    processor.UpdateSamples(['SampleA', 'SampleB'])
+    assert os.path.isfile(os.path.join(directory, 'SampleB_series.csv'))
+    shutil.rmtree(os.path.join(directory, 'SampleB'))
+    metrics = processor.UpdateSummary()
+    processor.UpdateSamples(['SampleB'])
+    assert list(metrics.index) == ['WT']
+    assert sorted(name for name in os.listdir(directory) if name.startswith('Sample')) == \
+        ['SampleA', 'SampleA.xlsx', 'SampleA_series.csv', 'SampleA_summary.csv']
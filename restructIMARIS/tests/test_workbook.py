@@ -0,0 +1,21 @@
+import glob
+import struct
+import pytest
+from restructIMARIS.common.workbook import WorkbookReader
+
+
+@pytest.mark.parametrize('error', [AttributeError("'Book' object has no attribute '_sh_abs_posn'"), # other xlrd version
+                                   struct.error("unpack requires a buffer of 4 bytes")]) # truncated record
+def test_rows_counted_without_xlrd_internals(experiment, monkeypatch, error):
+    directory, _ = experiment('cells')
+    filename = sorted(glob.glob(directory + '*/*_cells.xls'))[0]
+    with WorkbookReader(filename) as workbook:
+        assert workbook.CountRows('Cell Volume') == 32 # title, header and 30 cells
+
+    def Unreadable(self, sheet):
+        raise error
+    monkeypatch.setattr(WorkbookReader, 'XlsDimensionRows', Unreadable)
+    with WorkbookReader(filename) as workbook:
+        assert workbook.DimensionRows('Cell Volume') is None
+        assert workbook.CountRows('Cell Volume') == 32 # from the parsed sheet
+        assert workbook.sheets_parsed == 1
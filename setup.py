@@ -5,7 +5,9 @@ setup (
    version = '1.0',
    author = 'Sofia Assis',
    url  = 'https://github.com/ninja-asa',
-   packages = ['restructIMARIS'],
+   packages = ['restructIMARIS', 'restructIMARIS.cells', 'restructIMARIS.dendrite',
+               'restructIMARIS.common', 'restructIMARIS.benchmarks'],
+   package_data = {'restructIMARIS': ['*.json']},
    setup_requires=['wheel'],
    install_requires = [
        'wheel',
@@ -13,6 +15,14 @@ setup (
        'seaborn',
        'easygui',
        'openpyxl',
-       'xlrd'
-   ]
+       'xlrd>=2.0,<2.1', # WorkbookReader.CountRows reads xlrd internals
+       'xlsxwriter'
+   ],
+   extras_require = {
+       'columnar': ['pyarrow'],
+       'ims': ['h5py']
+   },
+   entry_points = {
+       'console_scripts': ['restruct-imaris = restructIMARIS.cli:main']
+   }
 )
\ No newline at end of file